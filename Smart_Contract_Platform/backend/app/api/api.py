@@ -12,3 +12,4 @@ api_router.include_router(notifications.router)
 api_router.include_router(audits.router)
 api_router.include_router(dashboard.router)
 api_router.include_router(ai_review.router)
+api_router.include_router(ai_review.jobs_router)
@@ -1,30 +1,123 @@
 """
 AI合同审查API路由
 """
+import asyncio
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_current_user, require_roles, CurrentUser
-from app.db.session import get_db
-from app.schemas.ai_review import ReviewResult, ReviewRequest
-from app.crud.crud_contract import contract_get
-from app.services.ai_review import get_ai_review_service
+from app.db.session import get_db, SessionLocal
+from app.schemas.ai_review import ReviewRequest, ReviewJobOut, ReviewResult, BatchReviewRequest, ReviewBatchOut, BatchJobItem
+from app.core.config import settings
+from app.models.ai_review import AIReviewJob, AIReviewBatch
+from app.crud.crud_contract import contract_get, contracts_for_review
+from app.crud.crud_ai_review import review_job_create, review_job_get, review_batch_create, review_batch_get, review_batch_jobs
 from app.crud.crud_audit import audit_add
+from app.services.review_jobs import get_review_job_runner, group_identical_clauses, fail_stale_jobs
+from app.services.review_cache import get_review_cache
+from app.services.singleflight import review_flights, section_flights
 
 router = APIRouter(prefix="/contracts", tags=["ai-review"])
+jobs_router = APIRouter(prefix="/ai-review", tags=["ai-review"])
 
+REVIEW_ROLES = ("OWNER_CONTRACT", "OWNER_LEGAL", "ADMIN")
 
-@router.post("/{contract_id}/ai-review", response_model=ReviewResult)
+
+def to_job_out(job: AIReviewJob) -> ReviewJobOut:
+    return ReviewJobOut(
+        id=job.id,
+        contract_id=job.contract_id,
+        status=job.status,
+        progress=job.progress,
+        stage=job.stage,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_by=job.created_by,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def to_batch_out(batch: AIReviewBatch, jobs: list[AIReviewJob], skipped: list[int] | None = None) -> ReviewBatchOut:
+    items = []
+    for job in jobs:
+        score = json.loads(job.result).get("compliance_score") if job.result else None
+        items.append(BatchJobItem(
+            job_id=job.id, contract_id=job.contract_id, status=job.status,
+            compliance_score=score, error=job.error,
+        ))
+    return ReviewBatchOut(
+        id=batch.id,
+        status=batch.status,
+        total=batch.total,
+        unique_clauses=batch.unique_clauses,
+        succeeded=batch.succeeded,
+        failed=batch.failed,
+        skipped=skipped or [],
+        created_by=batch.created_by,
+        created_at=batch.created_at,
+        finished_at=batch.finished_at,
+        jobs=items,
+    )
+
+
+@router.post("/ai-review/batch", response_model=ReviewBatchOut, status_code=202)
+def batch_review_contracts(
+    payload: BatchReviewRequest,
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))
+):
+    """
+    批量提交AI审查
+    
+    按合同ID列表或合同状态选出合同，条款内容相同的合同只审查一次；
+    立即返回批次，通过 GET /ai-review/batches/{batch_id} 查询进度。
+    """
+    if not payload.contract_ids and not payload.status:
+        raise HTTPException(400, "请指定合同ID列表或合同状态")
+    
+    rows = contracts_for_review(db, payload.contract_ids or None, payload.status)
+    if payload.contract_ids:
+        missing = set(payload.contract_ids) - {cid for cid, _ in rows}
+        if missing:
+            raise HTTPException(404, f"合同不存在: {sorted(missing)}")
+    items = [(cid, clauses) for cid, clauses in rows if clauses and clauses.strip()]
+    skipped = [cid for cid, clauses in rows if not (clauses and clauses.strip())]
+    if not items:
+        raise HTTPException(400, "没有可审查的合同（合同不存在或条款为空）")
+    if len(items) > settings.ai_review_batch_max_contracts:
+        raise HTTPException(400, f"单次最多批量审查 {settings.ai_review_batch_max_contracts} 份合同")
+    
+    groups = group_identical_clauses(items)
+    batch, jobs = review_batch_create(db, [cid for cid, _ in items], u.username, unique_clauses=len(groups))
+    job_ids = {job.contract_id: job.id for job in jobs}
+    get_review_job_runner().submit_batch(
+        batch.id,
+        [(clauses, [(job_ids[cid], cid) for cid in contract_ids]) for clauses, contract_ids in groups],
+        u.username,
+        use_cache=not payload.bypass_cache,
+        chunked=payload.chunked,
+    )
+    return to_batch_out(batch, jobs, skipped)
+
+
+@router.post("/{contract_id}/ai-review", response_model=ReviewJobOut, status_code=202)
 def review_contract(
     contract_id: int,
     payload: ReviewRequest | None = None,
     db: Session = Depends(get_db),
-    u: CurrentUser = Depends(require_roles("OWNER_CONTRACT", "OWNER_LEGAL", "ADMIN"))
+    u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))
 ):
     """
-    AI审查合同条款
+    提交AI审查任务
     
-    如果payload.clauses不为空，则审查自定义条款；否则审查合同中的条款
+    如果payload.clauses不为空，则审查自定义条款；否则审查合同中的条款。
+    相同条款的审查结果会被缓存，payload.bypass_cache 为 true 时强制重新审查。
+    合同按"第X条"分段并发审查，修改条款后只重新审查变化的分段；payload.chunked 可显式开启或关闭分段。
+    立即返回任务，通过 GET /ai-review/jobs/{job_id} 查询进度和结果。
     """
     # 获取合同信息
     contract = contract_get(db, contract_id)
@@ -37,29 +130,107 @@ def review_contract(
     if not clauses_to_review or not clauses_to_review.strip():
         raise HTTPException(400, "合同条款为空，无法进行审查")
     
+    job = review_job_create(db, contract_id, u.username)
+    use_cache = not (payload and payload.bypass_cache)
+    chunked = payload.chunked if payload else None
+    get_review_job_runner().submit(
+        job.id, contract_id, clauses_to_review, u.username, use_cache=use_cache, chunked=chunked
+    )
+    return to_job_out(job)
+
+
+def _audit_review(actor: str, contract_id: int, result: dict) -> None:
+    db = SessionLocal()
     try:
-        # 获取AI审查服务
-        ai_service = get_ai_review_service()
-        
-        # 执行审查
-        result = ai_service.review_contract(clauses_to_review)
-        
-        # 记录审计日志
-        try:
-            audit_add(
-                db,
-                u.username,
-                "AI_REVIEW",
-                "Contract",
-                str(contract_id),
-                f"AI审查合同条款，合规性评分: {result.get('compliance_score', 0.0)}",
-                commit=True
-            )
-        except Exception:
-            # 审计日志记录失败不影响审查结果返回
-            pass
-        
-        return ReviewResult(**result)
-    except Exception as e:
-        raise HTTPException(500, f"AI审查失败: {str(e)}")
+        audit_add(
+            db, actor, "AI_REVIEW", "Contract", str(contract_id),
+            f"AI审查合同条款，合规性评分: {result.get('compliance_score', 0.0)}",
+        )
+    finally:
+        db.close()
+
+
+@router.get("/{contract_id}/ai-review/stream")
+def stream_review_contract(
+    contract_id: int,
+    bypass_cache: bool = False,
+    chunked: bool | None = None,
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))
+):
+    """
+    流式AI审查（Server-Sent Events）
+    
+    模型输出的同时推送事件：status（阶段）、delta（原始输出片段）、section（分段完成）、
+    issue（每个完整的问题项）、result（最终审查结果，之后连接关闭）。
+    不传 chunked 时只有超过分段阈值的长合同才分段，其余合同整份流式审查。
+    审查在后台任务执行器中进行，与审查任务共用 AI_REVIEW_MAX_WORKERS 并发上限。
+    """
+    contract = contract_get(db, contract_id)
+    if not contract:
+        raise HTTPException(404, "合同不存在")
+    clauses = contract.clauses
+    if not clauses or not clauses.strip():
+        raise HTTPException(400, "合同条款为空，无法进行审查")
+    
+    runner = get_review_job_runner()
+    actor = u.username
+    
+    async def events():
+        async for event, data in runner.stream_review(clauses, use_cache=not bypass_cache, chunked=chunked):
+            if event == "result":
+                data = ReviewResult(**data).model_dump()
+                await asyncio.to_thread(_audit_review, actor, contract_id, data)
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@jobs_router.get("/cache/stats")
+def get_review_cache_stats(u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))):
+    """AI审查缓存的命中率、节省的耗时和 token（process 为本进程，total 为所有进程累计）
 
+    process.coalesced 为本进程中等待相同条款的进行中审查、未重复调用模型的次数。
+    """
+    stats = get_review_cache().stats()
+    stats["process"]["coalesced"] = review_flights.shared + section_flights.shared
+    return stats
+
+
+@jobs_router.get("/metrics")
+def get_llm_metrics(u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))):
+    """本进程模型调用的次数、失败/重试次数、当前并发数和耗时分位数"""
+    from app.services.ai_review import get_ai_review_service
+    return get_ai_review_service().http.metrics.snapshot()
+
+
+@jobs_router.get("/batches/{batch_id}", response_model=ReviewBatchOut)
+def get_review_batch(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))
+):
+    """查询批量审查进度及各合同的审查状态"""
+    fail_stale_jobs(batch_id=batch_id)
+    batch = review_batch_get(db, batch_id)
+    if not batch:
+        raise HTTPException(404, "批量审查不存在")
+    return to_batch_out(batch, review_batch_jobs(db, batch_id))
+
+
+@jobs_router.get("/jobs/{job_id}", response_model=ReviewJobOut)
+def get_review_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(require_roles(*REVIEW_ROLES))
+):
+    """查询AI审查任务的状态、进度和结果"""
+    fail_stale_jobs(job_id=job_id)
+    job = review_job_get(db, job_id)
+    if not job:
+        raise HTTPException(404, "审查任务不存在")
+    return to_job_out(job)
@@ -1,16 +1,31 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
-from app.core.deps import require_roles
+from app.core.deps import require_roles, PageParams
 from app.crud.crud_audit import audit_list
 from app.schemas.audit import AuditOut
 
 router = APIRouter(prefix="/audits", tags=["audits"])
 
 @router.get("", response_model=list[AuditOut])
-def list_audits(entity_type: str | None = None, entity_id: str | None = None, db: Session = Depends(get_db), _=Depends(require_roles("ADMIN","AUDITOR","OWNER_CONTRACT","OWNER_FINANCE","OWNER_LEGAL","OWNER_LEADER"))):
-    items = audit_list(db, entity_type=entity_type, entity_id=entity_id)
+def list_audits(
+    response: Response,
+    entity_type: str | None = None,
+    entity_id: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    _=Depends(require_roles("ADMIN","AUDITOR","OWNER_CONTRACT","OWNER_FINANCE","OWNER_LEGAL","OWNER_LEADER"))
+):
+    items, next_cursor = audit_list(
+        db, entity_type=entity_type, entity_id=entity_id,
+        created_from=created_from, created_to=created_to,
+        limit=page.limit, after=page.after,
+    )
+    page.set_next_cursor(response, next_cursor)
     # 修复：直接访问属性而不是使用 __dict__
     return [
         AuditOut(
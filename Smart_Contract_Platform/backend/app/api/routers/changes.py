@@ -1,36 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
-import random
 
-from app.core.deps import get_current_user, require_roles, CurrentUser
+from app.core.deps import get_current_user, require_roles, CurrentUser, PageParams
 from app.db.session import get_db
 from app.schemas.change import ChangeCreate, ChangeOut, ChangeTaskOut, TaskAction, ChangeWithTaskOut
 from app.models.change import ChangeRequest
 from app.crud.crud_change import change_create, change_get, change_list, task_get, tasks_for_change, pending_tasks_for_user
 from app.crud.crud_contract import contract_get, contract_update
-from app.crud.crud_user import user_get_by_username
 from app.services.workflow import build_change_tasks, next_pending_task, is_all_approved
 from app.crud.crud_notification import notify_create
 from app.crud.crud_audit import audit_add
+from app.crud.crud_sequence import next_code
 
 router = APIRouter(prefix="/changes", tags=["changes"])
 
-def gen_code(prefix: str, db: Session) -> str:
-    """生成唯一的变更单号，如果重复则重试"""
-    yyyy = datetime.utcnow().strftime("%Y")
-    max_attempts = 10
-    for _ in range(max_attempts):
-        rnd = random.randint(1, 999)
-        code = f"{prefix}-{yyyy}-{rnd:03d}"
-        # 检查是否已存在
-        existing = db.query(ChangeRequest).filter(ChangeRequest.code == code).first()
-        if not existing:
-            return code
-    # 如果10次都重复（极不可能），使用时间戳
-    import time
-    return f"{prefix}-{yyyy}-{int(time.time()) % 10000:04d}"
-
 @router.post("", response_model=ChangeOut)
 def create_change(payload: ChangeCreate, db: Session = Depends(get_db), u: CurrentUser = Depends(require_roles("CONTRACTOR", "ADMIN"))):
     # 验证必填字段
@@ -53,7 +37,7 @@ def create_change(payload: ChangeCreate, db: Session = Depends(get_db), u: Curre
         raise HTTPException(403, "无权操作此合同的变更申请")
     try:
         ch = ChangeRequest(
-            code=gen_code("BQ", db),
+            code=next_code(db, "BQ"),
             contract_id=payload.contract_id,
             amount=payload.amount,
             reason=payload.reason,
@@ -114,15 +98,26 @@ def create_change(payload: ChangeCreate, db: Session = Depends(get_db), u: Curre
             raise HTTPException(500, f"创建变更申请失败: {error_msg}")
 
 @router.get("", response_model=list[ChangeOut])
-def list_changes(db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
-    items = change_list(db)
-    res=[]
-    for ch in items:
-        c = contract_get(db, ch.contract_id)
-        if not c:
-            continue
-        # 修复：直接访问属性而不是使用 __dict__
-        change_out = ChangeOut(
+def list_changes(
+    response: Response,
+    status: str | None = None,
+    contract_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(get_current_user)
+):
+    # 可见性、状态、合同、时间过滤都在 SQL 中完成（承包方只看本单位合同下的变更）
+    items, next_cursor = change_list(
+        db, role=u.role, company=u.company, status=status, contract_id=contract_id,
+        created_from=created_from, created_to=created_to,
+        limit=page.limit, after=page.after,
+    )
+    page.set_next_cursor(response, next_cursor)
+    # 修复：直接访问属性而不是使用 __dict__
+    return [
+        ChangeOut(
             id=ch.id,
             code=ch.code,
             contract_id=ch.contract_id,
@@ -134,12 +129,8 @@ def list_changes(db: Session = Depends(get_db), u: CurrentUser = Depends(get_cur
             created_by=ch.created_by,
             created_at=ch.created_at,
         )
-        if u.role in ("ADMIN","AUDITOR","OWNER_CONTRACT","OWNER_FINANCE","OWNER_LEGAL","OWNER_LEADER","SUPERVISOR"):
-            res.append(change_out)
-        elif u.role == "CONTRACTOR":
-            if u.company is None or c.contractor_org == u.company:
-                res.append(change_out)
-    return res
+        for ch in items
+    ]
 
 @router.get("/{change_id}", response_model=ChangeOut)
 def get_change(change_id: int, db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
@@ -185,14 +176,10 @@ def get_tasks(change_id: int, db: Session = Depends(get_db), u: CurrentUser = De
 @router.get("/pending/my", response_model=list[ChangeWithTaskOut])
 def get_my_pending_changes(db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
     """获取当前用户待审核的变更申请"""
-    user = user_get_by_username(db, u.username)
-    if not user:
-        raise HTTPException(404, "user not found")
-    
-    tasks = pending_tasks_for_user(db, u.role, user.level)
+    tasks = pending_tasks_for_user(db, u.role, u.level)
     result = []
     for task in tasks:
-        ch = change_get(db, task.change_id)
+        ch = task.change  # 已随任务一起加载
         if ch:
             # 修复：直接访问属性而不是使用 __dict__
             result.append(ChangeWithTaskOut(
@@ -234,8 +221,7 @@ def approve_task(task_id: int, payload: TaskAction, db: Session = Depends(get_db
     
     # 级别检查：如果任务需要特定级别，检查用户级别
     if t.required_level is not None and u.role != "ADMIN":
-        user = user_get_by_username(db, u.username)
-        if not user or user.level != t.required_level:
+        if u.level != t.required_level:
             raise HTTPException(403, f"需要级别 {t.required_level}，当前用户级别不匹配")
     
     if t.status != "PENDING":
@@ -343,8 +329,7 @@ def reject_task(task_id: int, payload: TaskAction, db: Session = Depends(get_db)
     
     # 级别检查：如果任务需要特定级别，检查用户级别
     if t.required_level is not None and u.role != "ADMIN":
-        user = user_get_by_username(db, u.username)
-        if not user or user.level != t.required_level:
+        if u.level != t.required_level:
             raise HTTPException(403, f"需要级别 {t.required_level}，当前用户级别不匹配")
     
     if t.status != "PENDING":
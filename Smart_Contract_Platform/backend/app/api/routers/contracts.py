@@ -1,19 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.core.deps import get_current_user, require_roles, CurrentUser
+from app.core.deps import get_current_user, require_roles, CurrentUser, PageParams
 from app.db.session import get_db
 from app.schemas.contract import ContractCreate, ContractOut, ContractUpdate, ContractReject
 from app.models.contract import Contract
-from app.crud.crud_contract import contract_create, contract_get, contract_list, contract_get_by_no, contract_update
+from app.crud.crud_contract import contract_create, contract_get, contract_list, contract_get_by_no, contract_update, FULL_VIEW_ROLES
 from app.crud.crud_audit import audit_add
 from app.services.rules import performance_bond, enforce_contract_price_equals_tender
 
 router = APIRouter(prefix="/contracts", tags=["contracts"])
 
 def can_view(u: CurrentUser, c: Contract) -> bool:
-    if u.role in ("ADMIN", "AUDITOR", "OWNER_CONTRACT", "OWNER_FINANCE", "OWNER_LEGAL", "OWNER_LEADER", "SUPERVISOR"):
+    if u.role in FULL_VIEW_ROLES:
         return True
     if u.role == "CONTRACTOR":
         return u.company is None or c.contractor_org == u.company
@@ -75,45 +75,53 @@ def create_contract(payload: ContractCreate, db: Session = Depends(get_db), u: C
 
 @router.get("", response_model=list[ContractOut])
 def list_contracts(
+    response: Response,
     search: str | None = None,
     contract_no: str | None = None,
     contract_name: str | None = None,
     status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
     u: CurrentUser = Depends(get_current_user)
 ):
-    items = contract_list(db, search=search, contract_no=contract_no, contract_name=contract_name)
-    res = []
-    for c in items:
-        if can_view(u, c):
-            if status is None or c.status == status:
-                # 修复：直接访问属性而不是使用 __dict__
-                res.append(ContractOut(
-                    id=c.id,
-                    contract_no=c.contract_no,
-                    contract_name=c.contract_name,
-                    project_name=c.project_name,
-                    owner_org=c.owner_org,
-                    contractor_org=c.contractor_org,
-                    tender_price=c.tender_price,
-                    contract_price=c.contract_price,
-                    performance_bond=c.performance_bond,
-                    approved_budget=c.approved_budget,
-                    completion_ratio=c.completion_ratio,
-                    paid_total=c.paid_total,
-                    clauses=c.clauses,
-                    start_date=c.start_date,
-                    end_date=c.end_date,
-                    status=c.status,
-                    created_by=c.created_by,
-                    created_at=c.created_at,
-                ))
-    return res
+    items, next_cursor = contract_list(
+        db, search=search, contract_no=contract_no, contract_name=contract_name,
+        role=u.role, company=u.company, status=status,
+        created_from=created_from, created_to=created_to,
+        limit=page.limit, after=page.after,
+    )
+    page.set_next_cursor(response, next_cursor)
+    # 修复：直接访问属性而不是使用 __dict__
+    return [
+        ContractOut(
+            id=c.id,
+            contract_no=c.contract_no,
+            contract_name=c.contract_name,
+            project_name=c.project_name,
+            owner_org=c.owner_org,
+            contractor_org=c.contractor_org,
+            tender_price=c.tender_price,
+            contract_price=c.contract_price,
+            performance_bond=c.performance_bond,
+            approved_budget=c.approved_budget,
+            completion_ratio=c.completion_ratio,
+            paid_total=c.paid_total,
+            clauses=c.clauses,
+            start_date=c.start_date,
+            end_date=c.end_date,
+            status=c.status,
+            created_by=c.created_by,
+            created_at=c.created_at,
+        )
+        for c in items
+    ]
 
 @router.get("/pending/legal", response_model=list[ContractOut])
 def get_pending_legal_review(db: Session = Depends(get_db), u: CurrentUser = Depends(require_roles("OWNER_LEGAL", "ADMIN"))):
     """获取待法务审核的合同列表"""
-    items = contract_list(db)
+    items, _ = contract_list(db, status="APPROVING", limit=None)  # 待办队列需要完整列表
     # 修复：直接访问属性而不是使用 __dict__
     return [
         ContractOut(
@@ -136,7 +144,7 @@ def get_pending_legal_review(db: Session = Depends(get_db), u: CurrentUser = Dep
             created_by=c.created_by,
             created_at=c.created_at,
         )
-        for c in items if c.status == "APPROVING"
+        for c in items
     ]
 
 @router.get("/{contract_id}", response_model=ContractOut)
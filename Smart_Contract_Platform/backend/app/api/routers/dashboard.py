@@ -9,43 +9,16 @@ from app.models.contract import Contract
 from app.models.change import ChangeRequest, ChangeApprovalTask
 from app.models.payment import PaymentRequest
 from app.models.audit import AuditLog
-from app.models.quantity import QuantityRecord
-from app.crud.crud_contract import contract_list
-from app.crud.crud_change import change_list, pending_tasks_for_user
-from app.crud.crud_payment import payment_list
-from app.crud.crud_user import user_get_by_username
-from app.crud.crud_audit import audit_list
+from app.crud.crud_contract import contract_visibility
+from app.crud.crud_change import pending_tasks_for_user
+from app.crud.crud_dashboard import (
+    status_counts, count, latest, blocked_payment_count, paid_amount_sum,
+    audit_count, active_contracts_with_quantity_count,
+)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
-def can_view_contract(u: CurrentUser, c: Contract) -> bool:
-    """判断用户是否可以查看合同"""
-    if u.role in ("ADMIN", "AUDITOR", "OWNER_CONTRACT", "OWNER_STAFF", "OWNER_FINANCE", "OWNER_LEGAL", "OWNER_LEADER", "SUPERVISOR"):
-        return True
-    if u.role == "CONTRACTOR":
-        return u.company is None or c.contractor_org == u.company
-    return False
-
-
-def can_view_change(u: CurrentUser, ch: ChangeRequest, contract: Contract) -> bool:
-    """判断用户是否可以查看变更申请"""
-    if u.role in ("ADMIN", "AUDITOR", "OWNER_CONTRACT", "OWNER_STAFF", "OWNER_FINANCE", "OWNER_LEGAL", "OWNER_LEADER", "SUPERVISOR"):
-        return True
-    if u.role == "CONTRACTOR":
-        return u.company is None or contract.contractor_org == u.company
-    return False
-
-
-def can_view_payment(u: CurrentUser, p: PaymentRequest, contract: Contract) -> bool:
-    """判断用户是否可以查看支付申请"""
-    if u.role in ("ADMIN", "AUDITOR", "OWNER_CONTRACT", "OWNER_FINANCE", "OWNER_LEGAL", "OWNER_LEADER", "SUPERVISOR"):
-        return True
-    if u.role == "CONTRACTOR":
-        return u.company is None or contract.contractor_org == u.company
-    return False
-
-
 @router.get("/stats", response_model=DashboardStats)
 def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
     """根据用户角色返回仪表盘统计数据"""
@@ -57,9 +30,10 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 合同管理员仪表盘
     if u.role == "OWNER_CONTRACT":
-        contracts = [c for c in contract_list(db) if c.created_by == u.username]
-        draft_count = len([c for c in contracts if c.status == "DRAFT"])
-        total_count = len(contracts)
+        mine = Contract.created_by == u.username
+        contract_counts = status_counts(db, Contract, mine)
+        draft_count = contract_counts.get("DRAFT", 0)
+        total_count = sum(contract_counts.values())
         
         stats = [
             StatCard(title="草稿合同", value=draft_count, color="info"),
@@ -68,7 +42,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
         ]
         
         # 待提交的合同
-        pending_contracts = [c for c in contracts if c.status == "DRAFT"][:5]
+        pending_contracts = latest(db, Contract, 5, mine, Contract.status == "DRAFT")
         pending_items = [
             PendingItem(
                 id=c.id,
@@ -81,7 +55,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
         ]
         
         # 最近创建的合同
-        recent_contracts = sorted(contracts, key=lambda x: x.created_at, reverse=True)[:5]
+        recent_contracts = latest(db, Contract, 5, mine)
         recent_items = [
             RecentItem(
                 id=c.id,
@@ -99,12 +73,11 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 法务仪表盘
     elif u.role == "OWNER_LEGAL":
-        all_contracts = contract_list(db)
-        pending_contracts = [c for c in all_contracts if c.status == "APPROVING"]
-        pending_count = len(pending_contracts)
+        contract_counts = status_counts(db, Contract)
+        pending_count = contract_counts.get("APPROVING", 0)
         
         # 统计已审核的合同（ACTIVE状态）
-        reviewed_count = len([c for c in all_contracts if c.status == "ACTIVE"])
+        reviewed_count = contract_counts.get("ACTIVE", 0)
         
         stats = [
             StatCard(title="待审核合同", value=pending_count, color="warning"),
@@ -120,7 +93,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                 link=f"/contracts/{c.id}",
                 created_at=c.created_at
             )
-            for c in pending_contracts[:5]
+            for c in latest(db, Contract, 5, Contract.status == "APPROVING")
         ]
         
         quick_actions = [
@@ -129,19 +102,17 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 财务仪表盘
     elif u.role == "OWNER_FINANCE":
-        all_payments = payment_list(db)
-        finance_review_payments = [p for p in all_payments if p.status == "FINANCE_REVIEW"]
-        blocked_payments = [p for p in finance_review_payments if p.is_blocked]
+        finance_review_count = count(db, PaymentRequest, PaymentRequest.status == "FINANCE_REVIEW")
+        blocked_count = blocked_payment_count(db)
         
         # 计算本月支付总额
         now = datetime.utcnow()
         month_start = datetime(now.year, now.month, 1)
-        month_payments = [p for p in all_payments if p.status == "PAID" and p.created_at >= month_start]
-        month_total = sum(p.amount for p in month_payments)
+        month_total = paid_amount_sum(db, since=month_start)
         
         stats = [
-            StatCard(title="待财务审核", value=len(finance_review_payments), color="warning"),
-            StatCard(title="超额拦截", value=len(blocked_payments), color="danger"),
+            StatCard(title="待财务审核", value=finance_review_count, color="warning"),
+            StatCard(title="超额拦截", value=blocked_count, color="danger"),
             StatCard(title="本月支付总额", value=f"{month_total:,.0f}", unit="元", color="success"),
         ]
         
@@ -154,7 +125,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                 link=f"/payments",
                 created_at=p.created_at
             )
-            for p in finance_review_payments[:5]
+            for p in latest(db, PaymentRequest, 5, PaymentRequest.status == "FINANCE_REVIEW")
         ]
         
         quick_actions = [
@@ -163,38 +134,36 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 领导仪表盘（按级别）
     elif u.role == "OWNER_LEADER":
-        user = user_get_by_username(db, u.username)
-        if user:
-            tasks = pending_tasks_for_user(db, u.role, user.level)
-            pending_count = len(tasks)
-            
-            stats = [
-                StatCard(title="待审批变更申请", value=pending_count, color="warning"),
-            ]
-            
-            # 待审批变更申请列表
-            pending_items = []
-            for task in tasks[:5]:
-                ch = db.query(ChangeRequest).filter(ChangeRequest.id == task.change_id).first()
-                if ch:
-                    level_name = {
-                        "SECTION_CHIEF": "科长",
-                        "DIRECTOR": "处长",
-                        "BUREAU_CHIEF": "局长"
-                    }.get(task.required_level or "", "无要求")
-                    pending_items.append(
-                        PendingItem(
-                            id=ch.id,
-                            title=f"变更申请：{ch.code}",
-                            description=f"金额：{ch.amount:,.0f} 元，所需级别：{level_name}",
-                            link=f"/changes",
-                            created_at=ch.created_at
-                        )
+        tasks = pending_tasks_for_user(db, u.role, u.level)
+        pending_count = len(tasks)
+        
+        stats = [
+            StatCard(title="待审批变更申请", value=pending_count, color="warning"),
+        ]
+        
+        # 待审批变更申请列表
+        pending_items = []
+        for task in tasks[:5]:
+            ch = task.change  # 已随任务一起加载
+            if ch:
+                level_name = {
+                    "SECTION_CHIEF": "科长",
+                    "DIRECTOR": "处长",
+                    "BUREAU_CHIEF": "局长"
+                }.get(task.required_level or "", "无要求")
+                pending_items.append(
+                    PendingItem(
+                        id=ch.id,
+                        title=f"变更申请：{ch.code}",
+                        description=f"金额：{ch.amount:,.0f} 元，所需级别：{level_name}",
+                        link=f"/changes",
+                        created_at=ch.created_at
                     )
-            
-            quick_actions = [
-                {"label": "前往审核", "link": "/finance", "type": "primary"}
-            ]
+                )
+        
+        quick_actions = [
+            {"label": "前往审核", "link": "/finance", "type": "primary"}
+        ]
     
     # 科员仪表盘
     elif u.role == "OWNER_STAFF":
@@ -208,7 +177,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
         # 待审批变更申请列表
         pending_items = []
         for task in tasks[:5]:
-            ch = db.query(ChangeRequest).filter(ChangeRequest.id == task.change_id).first()
+            ch = task.change  # 已随任务一起加载
             if ch:
                 pending_items.append(
                     PendingItem(
@@ -226,32 +195,19 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 承包方仪表盘
     elif u.role == "CONTRACTOR":
-        all_contracts = contract_list(db)
-        my_contracts = [c for c in all_contracts if can_view_contract(u, c)]
-        
-        all_changes = change_list(db)
-        my_changes = []
-        for ch in all_changes:
-            c = db.query(Contract).filter(Contract.id == ch.contract_id).first()
-            if c and can_view_change(u, ch, c):
-                my_changes.append(ch)
-        
-        all_payments = payment_list(db)
-        my_payments = []
-        for p in all_payments:
-            c = db.query(Contract).filter(Contract.id == p.contract_id).first()
-            if c and can_view_payment(u, p, c):
-                my_payments.append(p)
+        # 可见性过滤下推到 SQL：固定次数的查询，与变更/支付总数无关
+        my_changes = contract_visibility(ChangeRequest, u.role, u.company)
+        my_payments = contract_visibility(PaymentRequest, u.role, u.company)
         
         stats = [
-            StatCard(title="我的合同", value=len(my_contracts), color="primary"),
-            StatCard(title="我的变更申请", value=len(my_changes), color="info"),
-            StatCard(title="我的支付申请", value=len(my_payments), color="success"),
+            StatCard(title="我的合同", value=count(db, Contract, *contract_visibility(Contract, u.role, u.company)), color="primary"),
+            StatCard(title="我的变更申请", value=count(db, ChangeRequest, *my_changes), color="info"),
+            StatCard(title="我的支付申请", value=count(db, PaymentRequest, *my_payments), color="success"),
         ]
         
         # 待处理的变更和支付申请
-        pending_changes = [ch for ch in my_changes if ch.status in ("SUBMITTED", "APPROVING")][:3]
-        pending_payments = [p for p in my_payments if p.status in ("FINANCE_REVIEW", "SUBMITTED")][:3]
+        pending_changes = latest(db, ChangeRequest, 3, *my_changes, ChangeRequest.status.in_(("SUBMITTED", "APPROVING")))
+        pending_payments = latest(db, PaymentRequest, 3, *my_payments, PaymentRequest.status.in_(("FINANCE_REVIEW", "SUBMITTED")))
         
         pending_items = []
         for ch in pending_changes:
@@ -282,22 +238,15 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 监理仪表盘
     elif u.role == "SUPERVISOR":
-        all_contracts = contract_list(db)
-        active_contracts = [c for c in all_contracts if c.status == "ACTIVE"]
-        
         # 统计需要录入完工比例的合同（ACTIVE状态且完工比例为0或很小）
-        need_input = [c for c in active_contracts if c.completion_ratio < 0.01]
+        need_input = (Contract.status == "ACTIVE", Contract.completion_ratio < 0.01)
         
         # 统计已录入完工比例的合同
-        contracts_with_quantity = []
-        for c in active_contracts:
-            quantities = db.query(QuantityRecord).filter(QuantityRecord.contract_id == c.id).all()
-            if quantities:
-                contracts_with_quantity.append(c)
+        with_quantity_count = active_contracts_with_quantity_count(db)
         
         stats = [
-            StatCard(title="需录入完工比例", value=len(need_input), color="warning"),
-            StatCard(title="已录入完工比例", value=len(contracts_with_quantity), color="success"),
+            StatCard(title="需录入完工比例", value=count(db, Contract, *need_input), color="warning"),
+            StatCard(title="已录入完工比例", value=with_quantity_count, color="success"),
         ]
         
         # 需要录入完工比例的合同列表
@@ -309,7 +258,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                 link=f"/contracts/{c.id}",
                 created_at=c.created_at
             )
-            for c in need_input[:5]
+            for c in latest(db, Contract, 5, *need_input)
         ]
         
         quick_actions = [
@@ -318,13 +267,11 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 审计仪表盘
     elif u.role == "AUDITOR":
-        all_audits = audit_list(db)
-        total_count = len(all_audits)
+        total_count = audit_count(db)
         
         # 今日操作数
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_audits = [a for a in all_audits if a.created_at >= today_start]
-        today_count = len(today_audits)
+        today_count = audit_count(db, since=today_start)
         
         stats = [
             StatCard(title="审计日志总数", value=total_count, color="primary"),
@@ -340,7 +287,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                 link=f"/audits",
                 created_at=a.created_at
             )
-            for a in all_audits[:5]
+            for a in latest(db, AuditLog, 5)
         ]
         
         quick_actions = [
@@ -349,51 +296,34 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
     
     # 管理员仪表盘
     elif u.role == "ADMIN":
-        all_contracts = contract_list(db)
-        all_changes = change_list(db)
-        all_payments = payment_list(db)
-        all_audits = audit_list(db)
-        
-        # 合同统计
-        draft_contracts = [c for c in all_contracts if c.status == "DRAFT"]
-        approving_contracts = [c for c in all_contracts if c.status == "APPROVING"]
-        active_contracts = [c for c in all_contracts if c.status == "ACTIVE"]
-        archived_contracts = [c for c in all_contracts if c.status == "ARCHIVED"]
-        
-        # 变更统计
-        approving_changes = [ch for ch in all_changes if ch.status == "APPROVING"]
-        approved_changes = [ch for ch in all_changes if ch.status == "APPROVED"]
-        rejected_changes = [ch for ch in all_changes if ch.status == "REJECTED"]
-        
-        # 支付统计
-        finance_review_payments = [p for p in all_payments if p.status == "FINANCE_REVIEW"]
-        paid_payments = [p for p in all_payments if p.status == "PAID"]
-        blocked_payments = [p for p in finance_review_payments if p.is_blocked]
-        total_paid = sum(p.amount for p in paid_payments)
+        # 合同/变更/支付统计（每张表一次 GROUP BY）
+        contract_counts = status_counts(db, Contract)
+        change_counts = status_counts(db, ChangeRequest)
+        payment_counts = status_counts(db, PaymentRequest)
+        total_paid = paid_amount_sum(db)
         
         # 审计日志统计
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_audits = [a for a in all_audits if a.created_at >= today_start]
         
         stats = [
-            StatCard(title="合同总数", value=len(all_contracts), color="primary"),
-            StatCard(title="草稿合同", value=len(draft_contracts), color="info"),
-            StatCard(title="待审核合同", value=len(approving_contracts), color="warning"),
-            StatCard(title="生效合同", value=len(active_contracts), color="success"),
-            StatCard(title="变更总数", value=len(all_changes), color="info"),
-            StatCard(title="待审批变更", value=len(approving_changes), color="warning"),
-            StatCard(title="已审批变更", value=len(approved_changes), color="success"),
-            StatCard(title="支付总数", value=len(all_payments), color="primary"),
-            StatCard(title="待财务审核", value=len(finance_review_payments), color="warning"),
-            StatCard(title="超额拦截", value=len(blocked_payments), color="danger"),
+            StatCard(title="合同总数", value=sum(contract_counts.values()), color="primary"),
+            StatCard(title="草稿合同", value=contract_counts.get("DRAFT", 0), color="info"),
+            StatCard(title="待审核合同", value=contract_counts.get("APPROVING", 0), color="warning"),
+            StatCard(title="生效合同", value=contract_counts.get("ACTIVE", 0), color="success"),
+            StatCard(title="变更总数", value=sum(change_counts.values()), color="info"),
+            StatCard(title="待审批变更", value=change_counts.get("APPROVING", 0), color="warning"),
+            StatCard(title="已审批变更", value=change_counts.get("APPROVED", 0), color="success"),
+            StatCard(title="支付总数", value=sum(payment_counts.values()), color="primary"),
+            StatCard(title="待财务审核", value=payment_counts.get("FINANCE_REVIEW", 0), color="warning"),
+            StatCard(title="超额拦截", value=blocked_payment_count(db), color="danger"),
             StatCard(title="累计支付", value=f"{total_paid:,.0f}", unit="元", color="success"),
-            StatCard(title="审计日志总数", value=len(all_audits), color="info"),
-            StatCard(title="今日操作数", value=len(today_audits), color="info"),
+            StatCard(title="审计日志总数", value=audit_count(db), color="info"),
+            StatCard(title="今日操作数", value=audit_count(db, since=today_start), color="info"),
         ]
         
         # 待处理事项
         pending_items = []
-        for c in approving_contracts[:3]:
+        for c in latest(db, Contract, 3, Contract.status == "APPROVING"):
             pending_items.append(
                 PendingItem(
                     id=c.id,
@@ -403,7 +333,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                     created_at=c.created_at
                 )
             )
-        for ch in approving_changes[:3]:
+        for ch in latest(db, ChangeRequest, 3, ChangeRequest.status == "APPROVING"):
             pending_items.append(
                 PendingItem(
                     id=ch.id,
@@ -413,7 +343,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                     created_at=ch.created_at
                 )
             )
-        for p in finance_review_payments[:3]:
+        for p in latest(db, PaymentRequest, 3, PaymentRequest.status == "FINANCE_REVIEW"):
             blocked_text = "（已拦截）" if p.is_blocked else ""
             pending_items.append(
                 PendingItem(
@@ -428,8 +358,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
         # 最近数据
         recent_items = []
         # 最近创建的合同
-        recent_contracts = sorted(all_contracts, key=lambda x: x.created_at, reverse=True)[:3]
-        for c in recent_contracts:
+        for c in latest(db, Contract, 3):
             recent_items.append(
                 RecentItem(
                     id=c.id,
@@ -440,8 +369,7 @@ def get_dashboard_stats(db: Session = Depends(get_db), u: CurrentUser = Depends(
                 )
             )
         # 最近的审计日志
-        recent_audits = sorted(all_audits, key=lambda x: x.created_at, reverse=True)[:3]
-        for a in recent_audits:
+        for a in latest(db, AuditLog, 3):
             recent_items.append(
                 RecentItem(
                     id=a.id,
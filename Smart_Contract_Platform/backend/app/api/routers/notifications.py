@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_current_user, CurrentUser
+from app.core.deps import get_current_user, CurrentUser, PageParams
 from app.db.session import get_db
 from app.crud.crud_notification import notify_list_for_user, notify_get
 from app.schemas.notification import NotificationOut
@@ -9,8 +10,21 @@ from app.schemas.notification import NotificationOut
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 @router.get("", response_model=list[NotificationOut])
-def list_my(db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
-    items = notify_list_for_user(db, u.username)
+def list_my(
+    response: Response,
+    is_read: bool | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(get_current_user)
+):
+    items, next_cursor = notify_list_for_user(
+        db, u.username, is_read=is_read,
+        created_from=created_from, created_to=created_to,
+        limit=page.limit, after=page.after,
+    )
+    page.set_next_cursor(response, next_cursor)
     return [NotificationOut(id=n.id, title=n.title, content=n.content, is_read=n.is_read, created_at=n.created_at) for n in items]
 
 @router.post("/{nid}/read")
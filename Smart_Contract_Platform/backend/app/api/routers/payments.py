@@ -1,10 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
-import random
-import time
 
-from app.core.deps import get_current_user, require_roles, CurrentUser
+from app.core.deps import get_current_user, require_roles, CurrentUser, PageParams
 from app.db.session import get_db
 from app.schemas.payment import PaymentCreate, PaymentOut, PaymentCalcOut, PaymentReject
 from app.models.payment import PaymentRequest
@@ -13,6 +11,7 @@ from app.crud.crud_contract import contract_get, contract_update
 from app.services.rules import calc_payment
 from app.crud.crud_notification import notify_create
 from app.crud.crud_audit import audit_add
+from app.crud.crud_sequence import next_code
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
@@ -34,20 +33,6 @@ def to_payment_out(p: PaymentRequest) -> PaymentOut:
         created_at=p.created_at,
     )
 
-def gen_code(prefix: str, db: Session) -> str:
-    """生成唯一的支付单号，如果重复则重试"""
-    yyyy = datetime.utcnow().strftime("%Y")
-    max_attempts = 10
-    for _ in range(max_attempts):
-        rnd = random.randint(1, 999)
-        code = f"{prefix}-{yyyy}-{rnd:03d}"
-        # 检查是否已存在
-        existing = db.query(PaymentRequest).filter(PaymentRequest.code == code).first()
-        if not existing:
-            return code
-    # 如果10次都重复（极不可能），使用时间戳
-    return f"{prefix}-{yyyy}-{int(time.time()) % 10000:04d}"
-
 @router.post("", response_model=PaymentOut)
 def create_payment(payload: PaymentCreate, db: Session = Depends(get_db), u: CurrentUser = Depends(require_roles("CONTRACTOR", "ADMIN"))):
     # 验证必填字段
@@ -66,7 +51,7 @@ def create_payment(payload: PaymentCreate, db: Session = Depends(get_db), u: Cur
 
     try:
         p = PaymentRequest(
-            code=gen_code("ZF", db),
+            code=next_code(db, "ZF"),
             contract_id=payload.contract_id,
             amount=payload.amount,
             purpose=payload.purpose,
@@ -99,34 +84,24 @@ def create_payment(payload: PaymentCreate, db: Session = Depends(get_db), u: Cur
             raise HTTPException(status_code=500, detail=f"创建支付申请失败: {error_msg}")
 
 @router.get("", response_model=list[PaymentOut])
-def list_payments(db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
-    items = payment_list(db)
-    res=[]
-    for p in items:
-        c = contract_get(db, p.contract_id)
-        if not c:
-            continue
-        # 修复：直接访问属性而不是使用 __dict__
-        payment_out = PaymentOut(
-            id=p.id,
-            code=p.code,
-            contract_id=p.contract_id,
-            amount=p.amount,
-            purpose=p.purpose,
-            progress_desc=p.progress_desc,
-            period=p.period,
-            status=p.status,
-            is_blocked=p.is_blocked,
-            reject_reason=p.reject_reason,
-            created_by=p.created_by,
-            created_at=p.created_at,
-        )
-        if u.role in ("ADMIN","AUDITOR","OWNER_CONTRACT","OWNER_FINANCE","OWNER_LEGAL","OWNER_LEADER","SUPERVISOR"):
-            res.append(to_payment_out(p))
-        elif u.role == "CONTRACTOR":
-            if u.company is None or c.contractor_org == u.company:
-                res.append(to_payment_out(p))
-    return res
+def list_payments(
+    response: Response,
+    status: str | None = None,
+    contract_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    u: CurrentUser = Depends(get_current_user)
+):
+    # 可见性、状态、合同、时间过滤都在 SQL 中完成（承包方只看本单位合同下的支付申请）
+    items, next_cursor = payment_list(
+        db, role=u.role, company=u.company, status=status, contract_id=contract_id,
+        created_from=created_from, created_to=created_to,
+        limit=page.limit, after=page.after,
+    )
+    page.set_next_cursor(response, next_cursor)
+    return [to_payment_out(p) for p in items]
 
 @router.get("/{payment_id}", response_model=PaymentOut)
 def get_payment(payment_id: int, db: Session = Depends(get_db), u: CurrentUser = Depends(get_current_user)):
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,17 +8,73 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-change-me"
     access_token_exp_minutes: int = 60 * 24
     sqlalchemy_database_uri: str = "sqlite:///./demo.db"
+    # 已认证用户缓存（get_current_user）
+    user_cache_ttl_seconds: int = 60
+    user_cache_max_size: int = 1024
     cors_origins: list[str] = ["http://localhost:5173", "http://127.0.0.1:5173"]
     
     # DeepSeek API配置
     deepseek_api_key: str = ""
     deepseek_api_base: str = "https://api.deepseek.com"
     deepseek_model: str = "deepseek-chat"  # 或 "deepseek-reasoner"
+    deepseek_timeout_seconds: float = 60.0
+    deepseek_max_in_flight: int = 8  # 每个进程同时进行的模型调用数上限（在审查任务执行器的事件循环中）
+    deepseek_max_retries: int = 3  # 429/5xx/网络错误的重试次数
+    deepseek_retry_base_delay: float = 0.5  # 指数退避的初始等待秒数
     
     # RAG知识库配置
     knowledge_base_dir: str = "knowledge_base"
     chroma_db_path: str = "knowledge_base/chroma_db"
     pdfs_dir: str = "knowledge_base/pdfs"
+    # 嵌入服务的 unix socket 路径（见 app/services/embedding_server.py）；为空时每个进程各自加载嵌入模型
+    embedding_server_socket: str = ""
+    embedding_batch_max_size: int = 64  # 嵌入服务单批最多合并的文本数
+    embedding_batch_max_wait_ms: float = 10  # 有并发请求时凑批的最长等待时间
+    # 向量库后端：chroma，或 numpy（内存映射的向量矩阵，各 worker 共用页缓存，见 app/services/vector_index.py）
+    rag_vector_backend: str = "chroma"
+    rag_numpy_index_dir: str = "knowledge_base/vector_index"
+    rag_numpy_dtype: str = "float16"  # float16 占用减半，检索时按块转为 float32 计算
+    # 查询向量和检索结果的 LRU 缓存容量（各自的条目数，每个进程）
+    rag_query_cache_size: int = 2048
+    # 检索方式：vector（向量）、lexical（BM25 关键词）、hybrid（两路按 RRF 融合）
+    rag_retrieval_mode: str = "hybrid"
+    rag_hybrid_candidates: int = 20  # 融合前每一路取的候选数
+    rag_rrf_k: int = 60
+    # 重排序（见 app/services/reranker.py）：多取 rag_rerank_candidates 个候选，由 cross-encoder 选出最相关的 top_k 个
+    rag_rerank: bool = False
+    rag_rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rag_rerank_candidates: int = 20
+    rag_rerank_batch_size: int = 16
+    rag_rerank_budget_ms: float = 150  # 超出预算时跳过重排序，使用检索顺序
+    # 知识库导入：每批向量化和写入的文档块数、提取PDF文本的进程数（0 表示CPU核数）
+    kb_ingest_batch_size: int = 64
+    kb_ingest_workers: int = 0
+    kb_ingest_pages_per_task: int = 50  # 大PDF按页段拆成多个任务并行提取
+    # 已导入文件清单（增量同步）
+    kb_manifest_path: str = "knowledge_base/manifest.json"
+    
+    # 应用启动后在后台预加载向量库和嵌入模型（默认在第一次AI审查时才加载）
+    ai_review_warmup: bool = False
+    # AI审查后台任务并发数（每个进程）
+    ai_review_max_workers: int = 4
+    # AI审查结果缓存
+    ai_review_cache_ttl_hours: float = 24 * 7
+    ai_review_cache_max_entries: int = 5000
+    ai_review_cache_hit_flush_seconds: float = 30  # 命中次数在进程内累积，每隔该秒数批量写入
+    # 分段审查：有"第X条"的合同按条切分，相邻的条组成不超过该字数的分段（至少四分之一），分段并发审查
+    ai_review_chunk_threshold_chars: int = 8000
+    ai_review_section_concurrency: int = 4
+    # 单次批量审查的合同数上限
+    ai_review_batch_max_contracts: int = 1000
+    # 相同条款并发审查时的跨进程锁超时（秒），应大于单次审查的最长耗时
+    ai_review_lock_ttl_seconds: float = 300
+    # 执行中的任务每隔 heartbeat 秒写一次心跳；未完成且超过 stale 秒没有心跳的任务（worker 重启或崩溃）标记为失败
+    ai_review_job_heartbeat_seconds: float = 30
+    ai_review_job_stale_seconds: float = 180
+    # 审查提示词的 token 预算（按模型名，找不到时用 "default"）：法律条款去重后按预算放入，合同条款不裁剪
+    ai_review_prompt_token_budget: Dict[str, int] = {"default": 12000}
+    # 模型回复的 max_tokens（按模型名）：长合同的问题列表较长，4000 时常被截断
+    ai_review_max_output_tokens: Dict[str, int] = {"default": 4000, "deepseek-chat": 8000, "deepseek-reasoner": 32000}
 
     class Config:
         env_file = ".env"
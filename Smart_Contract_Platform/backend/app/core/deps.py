@@ -1,19 +1,22 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose.exceptions import JWTError
 from sqlalchemy.orm import Session
 
 from app.core.security import decode_token
 from app.db.session import get_db
-from app.crud.crud_user import user_get_by_username
+from app.crud.crud_user import user_get_active_cached
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, decode_cursor
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 class CurrentUser:
-    def __init__(self, username: str, role: str, company: str | None):
+    def __init__(self, username: str, role: str, company: str | None, level: str | None = None, user_id: int | None = None):
         self.username = username
         self.role = role
         self.company = company
+        self.level = level  # 领导级别，审批时直接使用，无需再查用户表
+        self.user_id = user_id
 
 def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> CurrentUser:
     try:
@@ -25,10 +28,10 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = user_get_by_username(db, username)
-    if not user or not user.is_active:
+    user = user_get_active_cached(db, username)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
-    return CurrentUser(username=user.username, role=user.role, company=user.company)
+    return CurrentUser(username=user.username, role=user.role, company=user.company, level=user.level, user_id=user.id)
 
 def require_roles(*roles: str):
     def _guard(u: CurrentUser = Depends(get_current_user)) -> CurrentUser:
@@ -36,3 +39,29 @@ def require_roles(*roles: str):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return u
     return _guard
+
+MAX_PAGE_SIZE = 200
+
+class PageParams:
+    """列表接口的游标分页参数
+
+    默认每页 DEFAULT_PAGE_SIZE 条，下一页游标通过响应头 X-Next-Cursor 返回，响应体仍是数组。
+    paged=false 时返回全部记录（显式选择，用于结果有界的查询，如某个合同下的变更）。
+    """
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = None,
+        paged: bool = True,
+    ):
+        self.limit: int | None = limit if paged else None
+        self.after: Cursor | None = None
+        if cursor:
+            try:
+                self.after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    def set_next_cursor(self, response: Response, next_cursor: str | None) -> None:
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
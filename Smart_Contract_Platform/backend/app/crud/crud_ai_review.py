@@ -0,0 +1,155 @@
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.ai_review import AIReviewBatch, AIReviewJob, AIReviewCacheEntry, AIReviewLock
+from app.models.audit import AuditLog
+
+def review_job_create(db: Session, contract_id: int, created_by: str) -> AIReviewJob:
+    job = AIReviewJob(contract_id=contract_id, created_by=created_by, status="PENDING", progress=0, stage="排队中")
+    db.add(job); db.commit(); db.refresh(job)
+    return job
+
+def review_job_get(db: Session, job_id: int) -> AIReviewJob | None:
+    return db.query(AIReviewJob).filter(AIReviewJob.id == job_id).first()
+
+def review_job_update(db: Session, job_id: int, commit: bool = True, **fields) -> None:
+    db.query(AIReviewJob).filter(AIReviewJob.id == job_id).update(fields, synchronize_session=False)
+    if commit:
+        db.commit()
+
+def review_jobs_heartbeat(db: Session, job_ids: list[int], now: datetime) -> None:
+    db.query(AIReviewJob).filter(AIReviewJob.id.in_(job_ids)).update({"heartbeat_at": now}, synchronize_session=False)
+    db.commit()
+
+def review_jobs_fail_stale(db: Session, stale_before: datetime, job_id: int | None = None, batch_id: int | None = None) -> int:
+    """把心跳（没有心跳时按创建时间）早于 stale_before 的未完成任务标记为失败，返回标记的任务数
+
+    执行任务的 worker 重启或崩溃后任务不会再有结果，标记为失败后客户端不再无限轮询。
+    涉及的批次若已没有未完成的任务，按各任务的最终状态重新统计并结束批次。
+    可只检查单个任务（job_id）或单个批次（batch_id）。
+    """
+    unfinished = AIReviewJob.status.in_(("PENDING", "RUNNING"))
+    query = db.query(AIReviewJob).filter(
+        unfinished, func.coalesce(AIReviewJob.heartbeat_at, AIReviewJob.created_at) < stale_before
+    )
+    if job_id is not None:
+        query = query.filter(AIReviewJob.id == job_id)
+    if batch_id is not None:
+        query = query.filter(AIReviewJob.batch_id == batch_id)
+    batch_ids = {row.batch_id for row in query.with_entities(AIReviewJob.batch_id).distinct() if row.batch_id is not None}
+    now = datetime.utcnow()
+    failed = query.update({
+        "status": "FAILED", "progress": 100, "stage": "审查失败",
+        "error": "审查任务中断（执行任务的进程已退出），请重新提交", "finished_at": now,
+    }, synchronize_session=False)
+    for bid in batch_ids:
+        if db.query(AIReviewJob.id).filter(AIReviewJob.batch_id == bid, unfinished).first() is not None:
+            continue
+        counts = dict(db.query(AIReviewJob.status, func.count(AIReviewJob.id)).filter(AIReviewJob.batch_id == bid).group_by(AIReviewJob.status).all())
+        db.query(AIReviewBatch).filter(AIReviewBatch.id == bid).update({
+            "status": "FINISHED", "succeeded": counts.get("SUCCEEDED", 0), "failed": counts.get("FAILED", 0), "finished_at": now,
+        }, synchronize_session=False)
+    db.commit()
+    return failed
+
+def review_cache_get(db: Session, key: str, fresh_after: datetime) -> AIReviewCacheEntry | None:
+    """读取未过期的缓存项（只读；命中次数由调用方累积后用 review_cache_touch 批量写入）"""
+    return db.query(AIReviewCacheEntry).filter(
+        AIReviewCacheEntry.key == key,
+        AIReviewCacheEntry.created_at >= fresh_after,
+    ).first()
+
+def review_cache_touch(db: Session, hits: dict[str, tuple[int, datetime]]) -> None:
+    """批量累加命中次数并更新最近使用时间，hits 为 {key: (命中次数, 最近使用时间)}（一个事务）"""
+    for key, (count, last_used_at) in hits.items():
+        db.query(AIReviewCacheEntry).filter(AIReviewCacheEntry.key == key).update(
+            {"hit_count": AIReviewCacheEntry.hit_count + count, "last_used_at": last_used_at},
+            synchronize_session=False,
+        )
+    db.commit()
+
+def review_cache_put(db: Session, key: str, result: str, elapsed_ms: int, total_tokens: int) -> None:
+    now = datetime.utcnow()
+    db.merge(AIReviewCacheEntry(
+        key=key, result=result, elapsed_ms=elapsed_ms, total_tokens=total_tokens,
+        hit_count=0, created_at=now, last_used_at=now,
+    ))
+    db.commit()
+
+def review_cache_evict(db: Session, expired_before: datetime, max_entries: int) -> int:
+    """删除过期项，并按最近使用时间淘汰超出容量的部分，返回删除条数"""
+    deleted = db.query(AIReviewCacheEntry).filter(AIReviewCacheEntry.created_at < expired_before).delete(synchronize_session=False)
+    keep = select(AIReviewCacheEntry.key).order_by(AIReviewCacheEntry.last_used_at.desc()).limit(max_entries)
+    deleted += db.query(AIReviewCacheEntry).filter(AIReviewCacheEntry.key.not_in(keep)).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def review_cache_totals(db: Session) -> dict:
+    """缓存表的累计统计（所有 worker 共享）"""
+    entries, hits, saved_ms, saved_tokens = db.query(
+        func.count(AIReviewCacheEntry.key),
+        func.coalesce(func.sum(AIReviewCacheEntry.hit_count), 0),
+        func.coalesce(func.sum(AIReviewCacheEntry.hit_count * AIReviewCacheEntry.elapsed_ms), 0),
+        func.coalesce(func.sum(AIReviewCacheEntry.hit_count * AIReviewCacheEntry.total_tokens), 0),
+    ).one()
+    return {"entries": entries, "hits": hits, "saved_ms": saved_ms, "saved_tokens": saved_tokens}
+
+def review_batch_create(db: Session, contract_ids: list[int], created_by: str, unique_clauses: int) -> tuple[AIReviewBatch, list[AIReviewJob]]:
+    """创建批次及其下每份合同的任务（一个事务）"""
+    batch = AIReviewBatch(status="PENDING", total=len(contract_ids), unique_clauses=unique_clauses, created_by=created_by)
+    db.add(batch)
+    db.flush()
+    jobs = [
+        AIReviewJob(contract_id=cid, batch_id=batch.id, created_by=created_by, status="PENDING", progress=0, stage="排队中")
+        for cid in contract_ids
+    ]
+    db.add_all(jobs)
+    db.commit()
+    return batch, jobs
+
+def review_batch_get(db: Session, batch_id: int) -> AIReviewBatch | None:
+    return db.query(AIReviewBatch).filter(AIReviewBatch.id == batch_id).first()
+
+def review_batch_jobs(db: Session, batch_id: int) -> list[AIReviewJob]:
+    return db.query(AIReviewJob).filter(AIReviewJob.batch_id == batch_id).order_by(AIReviewJob.id.asc()).all()
+
+def review_batch_start(db: Session, batch_id: int, started_at: datetime) -> None:
+    db.query(AIReviewBatch).filter(AIReviewBatch.id == batch_id).update({"status": "RUNNING"}, synchronize_session=False)
+    db.query(AIReviewJob).filter(AIReviewJob.batch_id == batch_id).update(
+        {"status": "RUNNING", "progress": 5, "stage": "批量审查中", "started_at": started_at}, synchronize_session=False
+    )
+    db.commit()
+
+def review_batch_record(db: Session, batch_id: int, job_rows: list[dict], audit_rows: list[dict], finished: bool = False) -> None:
+    """批量写入一组已完成任务的结果和审计日志，并累加批次计数（一个事务）"""
+    if job_rows:
+        db.execute(update(AIReviewJob), job_rows)
+        db.execute(insert(AuditLog), audit_rows)
+    failed = sum(1 for row in job_rows if row["status"] == "FAILED")
+    values = {
+        "succeeded": AIReviewBatch.succeeded + (len(job_rows) - failed),
+        "failed": AIReviewBatch.failed + failed,
+    }
+    if finished:
+        values.update(status="FINISHED", finished_at=datetime.utcnow())
+    db.query(AIReviewBatch).filter(AIReviewBatch.id == batch_id).update(values, synchronize_session=False)
+    db.commit()
+
+def review_lock_acquire(db: Session, key: str, owner: str, now: datetime, expires_at: datetime) -> bool:
+    """尝试获取审查锁：先清理已过期的锁，再插入；主键冲突说明锁被其他进程持有"""
+    db.query(AIReviewLock).filter(AIReviewLock.key == key, AIReviewLock.expires_at < now).delete(synchronize_session=False)
+    db.add(AIReviewLock(key=key, owner=owner, acquired_at=now, expires_at=expires_at))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+def review_lock_release(db: Session, key: str, owner: str) -> None:
+    db.query(AIReviewLock).filter(AIReviewLock.key == key, AIReviewLock.owner == owner).delete(synchronize_session=False)
+    db.commit()
+
+def review_lock_held(db: Session, key: str, now: datetime) -> bool:
+    return db.query(AIReviewLock.key).filter(AIReviewLock.key == key, AIReviewLock.expires_at >= now).first() is not None
@@ -1,15 +1,27 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.audit import AuditLog
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, created_between, keyset_paginate
 
 def audit_add(db: Session, actor: str, action: str, entity_type: str, entity_id: str, detail: str, commit: bool = True):
     db.add(AuditLog(actor=actor, action=action, entity_type=entity_type, entity_id=str(entity_id), detail=detail))
     if commit:
         db.commit()
 
-def audit_list(db: Session, entity_type: str | None = None, entity_id: str | None = None):
+def audit_list(
+    db: Session,
+    entity_type: str | None = None,
+    entity_id: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    after: Cursor | None = None,
+) -> tuple[list[AuditLog], str | None]:
+    """审计日志列表，返回 (本页记录, 下一页游标)"""
     q = db.query(AuditLog)
     if entity_type:
         q = q.filter(AuditLog.entity_type == entity_type)
     if entity_id:
         q = q.filter(AuditLog.entity_id == str(entity_id))
-    return q.order_by(AuditLog.created_at.desc()).all()
+    q = created_between(q, AuditLog, created_from, created_to)
+    return keyset_paginate(q, AuditLog, limit, after)
@@ -1,5 +1,9 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+from sqlalchemy import exists
+from sqlalchemy.orm import Session, aliased, contains_eager
 from app.models.change import ChangeRequest, ChangeApprovalTask
+from app.crud.crud_contract import contract_visibility
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, created_between, keyset_paginate
 
 def change_create(db: Session, obj: ChangeRequest, commit: bool = True) -> ChangeRequest:
     db.add(obj)
@@ -11,8 +15,27 @@ def change_create(db: Session, obj: ChangeRequest, commit: bool = True) -> Chang
 def change_get(db: Session, change_id: int) -> ChangeRequest | None:
     return db.query(ChangeRequest).filter(ChangeRequest.id == change_id).first()
 
-def change_list(db: Session):
-    return db.query(ChangeRequest).order_by(ChangeRequest.created_at.desc()).all()
+def change_list(
+    db: Session,
+    role: str | None = None,
+    company: str | None = None,
+    status: str | None = None,
+    contract_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    after: Cursor | None = None,
+) -> tuple[list[ChangeRequest], str | None]:
+    """变更申请列表，返回 (本页记录, 下一页游标)"""
+    query = db.query(ChangeRequest)
+    if role is not None:
+        query = query.filter(*contract_visibility(ChangeRequest, role, company))
+    if status:
+        query = query.filter(ChangeRequest.status == status)
+    if contract_id is not None:
+        query = query.filter(ChangeRequest.contract_id == contract_id)
+    query = created_between(query, ChangeRequest, created_from, created_to)
+    return keyset_paginate(query, ChangeRequest, limit, after)
 
 def task_get(db: Session, task_id: int) -> ChangeApprovalTask | None:
     return db.query(ChangeApprovalTask).filter(ChangeApprovalTask.id == task_id).first()
@@ -26,12 +49,12 @@ def pending_tasks_for_user(db: Session, user_role: str, user_level: str | None):
     只返回当前应该审批的任务，即：
     1. 该任务的状态是 PENDING
     2. 该任务之前的所有步骤都已经 APPROVED（或者该任务是第一步 step_order=1）
-    """
-    from app.models.change import ChangeRequest
-    from sqlalchemy import and_, case
     
+    条件 2 用 NOT EXISTS 在数据库中判断，一次查询完成；关联的变更申请通过
+    contains_eager 随任务一起加载，调用方访问 task.change 不会再触发查询。
+    """
     # 查询状态为PENDING的任务，且角色匹配
-    query = db.query(ChangeApprovalTask).join(ChangeRequest).filter(
+    query = db.query(ChangeApprovalTask).join(ChangeApprovalTask.change).filter(
         ChangeApprovalTask.status == "PENDING",
         ChangeApprovalTask.assignee_role == user_role,
         ChangeRequest.status == "APPROVING"
@@ -49,41 +72,17 @@ def pending_tasks_for_user(db: Session, user_role: str, user_level: str | None):
         # 用户没有级别：只能审核不需要级别的任务（如OWNER_CONTRACT角色的任务）
         query = query.filter(ChangeApprovalTask.required_level.is_(None))
     
-    # 获取所有匹配的任务
-    all_tasks = query.order_by(ChangeApprovalTask.step_order.asc()).all()
-    
-    # 过滤：只返回当前应该审批的任务（前面的步骤都已通过）
-    # 先收集所有相关变更申请的ID，批量查询所有任务
-    change_ids = {task.change_id for task in all_tasks}
-    change_tasks_map = {}  # change_id -> list of tasks (ordered by step_order)
-    
-    if change_ids:
-        # 批量查询所有相关变更申请的任务
-        all_change_tasks = db.query(ChangeApprovalTask).filter(
-            ChangeApprovalTask.change_id.in_(change_ids)
-        ).order_by(ChangeApprovalTask.change_id, ChangeApprovalTask.step_order).all()
-        
-        # 按变更申请ID分组
-        for task in all_change_tasks:
-            if task.change_id not in change_tasks_map:
-                change_tasks_map[task.change_id] = []
-            change_tasks_map[task.change_id].append(task)
-    
-    # 过滤：只返回当前应该审批的任务（前面的步骤都已通过）
-    result = []
-    for task in all_tasks:
-        all_tasks_for_change = change_tasks_map.get(task.change_id, [])
-        
-        # 检查前面的步骤是否都已通过
-        can_approve = True
-        for t in all_tasks_for_change:
-            if t.step_order < task.step_order:
-                # 前面的步骤必须已通过
-                if t.status != "APPROVED":
-                    can_approve = False
-                    break
-        
-        if can_approve:
-            result.append(task)
+    # 前面的步骤都已通过：不存在 step_order 更小且未 APPROVED 的同单任务
+    earlier = aliased(ChangeApprovalTask)
+    blocked_by_earlier_step = exists().where(
+        earlier.change_id == ChangeApprovalTask.change_id,
+        earlier.step_order < ChangeApprovalTask.step_order,
+        earlier.status != "APPROVED",
+    )
+    query = query.filter(~blocked_by_earlier_step)
     
-    return result
+    return (
+        query.options(contains_eager(ChangeApprovalTask.change))
+        .order_by(ChangeApprovalTask.step_order.asc())
+        .all()
+    )
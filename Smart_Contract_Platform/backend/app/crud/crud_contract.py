@@ -1,5 +1,29 @@
+from sqlalchemy import select, false
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.contract import Contract
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, created_between, keyset_paginate
+
+# 可以查看全部合同（及其变更、支付申请）的角色
+FULL_VIEW_ROLES = ("ADMIN", "AUDITOR", "OWNER_CONTRACT", "OWNER_FINANCE", "OWNER_LEGAL", "OWNER_LEADER", "SUPERVISOR")
+
+def contract_visibility(model, role: str, company: str | None) -> tuple:
+    """按用户角色返回可见性过滤条件，供合同及其下属单据（变更、支付等）的查询复用
+
+    - 发包方/监理/审计/管理员：不过滤
+    - 承包方：只能看到 contractor_org 为本单位的合同；下属单据通过 contract_id
+      半连接到 contracts.contractor_org，过滤在数据库中完成，不再逐行查合同
+    - 其他角色：不可见
+    """
+    if role in FULL_VIEW_ROLES:
+        return ()
+    if role == "CONTRACTOR":
+        if company is None:
+            return ()
+        if model is Contract:
+            return (Contract.contractor_org == company,)
+        return (model.contract_id.in_(select(Contract.id).where(Contract.contractor_org == company)),)
+    return (false(),)
 
 def contract_create(db: Session, obj: Contract, commit: bool = True) -> Contract:
     db.add(obj)
@@ -11,11 +35,38 @@ def contract_create(db: Session, obj: Contract, commit: bool = True) -> Contract
 def contract_get(db: Session, contract_id: int) -> Contract | None:
     return db.query(Contract).filter(Contract.id == contract_id).first()
 
+def contracts_for_review(db: Session, contract_ids: list[int] | None = None, status: str | None = None) -> list[tuple[int, str | None]]:
+    """批量审查用：只取 (id, clauses)，按 id 排序"""
+    q = db.query(Contract.id, Contract.clauses)
+    if contract_ids is not None:
+        q = q.filter(Contract.id.in_(contract_ids))
+    if status:
+        q = q.filter(Contract.status == status)
+    return [(cid, clauses) for cid, clauses in q.order_by(Contract.id.asc()).all()]
+
 def contract_get_by_no(db: Session, contract_no: str) -> Contract | None:
     return db.query(Contract).filter(Contract.contract_no == contract_no).first()
 
-def contract_list(db: Session, search: str | None = None, contract_no: str | None = None, contract_name: str | None = None):
+def contract_list(
+    db: Session,
+    search: str | None = None,
+    contract_no: str | None = None,
+    contract_name: str | None = None,
+    role: str | None = None,
+    company: str | None = None,
+    status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    after: Cursor | None = None,
+) -> tuple[list[Contract], str | None]:
+    """合同列表，返回 (本页记录, 下一页游标)"""
     query = db.query(Contract)
+    if role is not None:
+        query = query.filter(*contract_visibility(Contract, role, company))
+    if status:
+        query = query.filter(Contract.status == status)
+    query = created_between(query, Contract, created_from, created_to)
     if search:
         # 单个搜索参数：同时搜索合同名称或合同号（OR 关系）
         query = query.filter(
@@ -27,7 +78,7 @@ def contract_list(db: Session, search: str | None = None, contract_no: str | Non
             query = query.filter(Contract.contract_no.contains(contract_no))
         if contract_name:
             query = query.filter(Contract.contract_name.contains(contract_name))
-    return query.order_by(Contract.created_at.desc()).all()
+    return keyset_paginate(query, Contract, limit, after)
 
 def contract_update(db: Session, c: Contract, commit: bool = True) -> Contract:
     db.add(c)
@@ -0,0 +1,65 @@
+"""仪表盘聚合查询
+
+所有统计卡片都通过 GROUP BY / COUNT / SUM 在数据库中完成，
+列表类数据（待处理、最近）使用 LIMIT 限定返回条数，避免整表加载到 Python。
+"""
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.contract import Contract
+from app.models.payment import PaymentRequest
+from app.models.audit import AuditLog
+from app.models.quantity import QuantityRecord
+
+
+def status_counts(db: Session, model, *criteria) -> dict[str, int]:
+    """按状态分组计数，返回 {status: count}"""
+    rows = (
+        db.query(model.status, func.count(model.id))
+        .filter(*criteria)
+        .group_by(model.status)
+        .all()
+    )
+    return {status: n for status, n in rows}
+
+
+def count(db: Session, model, *criteria) -> int:
+    """满足条件的记录数"""
+    return db.query(func.count(model.id)).filter(*criteria).scalar() or 0
+
+
+def latest(db: Session, model, limit: int, *criteria):
+    """按创建时间倒序取前 limit 条"""
+    return db.query(model).filter(*criteria).order_by(model.created_at.desc()).limit(limit).all()
+
+
+def blocked_payment_count(db: Session) -> int:
+    """财务审核中被超额拦截的支付申请数"""
+    return count(db, PaymentRequest, PaymentRequest.status == "FINANCE_REVIEW", PaymentRequest.is_blocked.is_(True))
+
+
+def paid_amount_sum(db: Session, since: datetime | None = None) -> float:
+    """已支付金额合计（可选：只统计 since 之后创建的申请）"""
+    q = db.query(func.coalesce(func.sum(PaymentRequest.amount), 0.0)).filter(PaymentRequest.status == "PAID")
+    if since is not None:
+        q = q.filter(PaymentRequest.created_at >= since)
+    return float(q.scalar() or 0.0)
+
+
+def audit_count(db: Session, since: datetime | None = None) -> int:
+    """审计日志条数（可选：只统计 since 之后的记录）"""
+    if since is None:
+        return count(db, AuditLog)
+    return count(db, AuditLog, AuditLog.created_at >= since)
+
+
+def active_contracts_with_quantity_count(db: Session) -> int:
+    """已录入过完工比例的生效合同数"""
+    return (
+        db.query(func.count(func.distinct(QuantityRecord.contract_id)))
+        .join(Contract, Contract.id == QuantityRecord.contract_id)
+        .filter(Contract.status == "ACTIVE")
+        .scalar()
+        or 0
+    )
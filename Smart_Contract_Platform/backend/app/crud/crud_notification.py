@@ -1,5 +1,7 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.notification import Notification
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, created_between, keyset_paginate
 
 def notify_create(db: Session, to_username: str, title: str, content: str, commit: bool = True) -> Notification:
     n = Notification(to_username=to_username, title=title, content=content, is_read=False)
@@ -9,8 +11,21 @@ def notify_create(db: Session, to_username: str, title: str, content: str, commi
         db.refresh(n)
     return n
 
-def notify_list_for_user(db: Session, username: str):
-    return db.query(Notification).filter(Notification.to_username == username).order_by(Notification.created_at.desc()).all()
+def notify_list_for_user(
+    db: Session,
+    username: str,
+    is_read: bool | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    after: Cursor | None = None,
+) -> tuple[list[Notification], str | None]:
+    """用户通知列表，返回 (本页记录, 下一页游标)"""
+    query = db.query(Notification).filter(Notification.to_username == username)
+    if is_read is not None:
+        query = query.filter(Notification.is_read.is_(is_read))
+    query = created_between(query, Notification, created_from, created_to)
+    return keyset_paginate(query, Notification, limit, after)
 
 def notify_get(db: Session, nid: int) -> Notification | None:
     return db.query(Notification).filter(Notification.id == nid).first()
@@ -1,5 +1,8 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.payment import PaymentRequest
+from app.crud.crud_contract import contract_visibility
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Cursor, created_between, keyset_paginate
 
 def payment_create(db: Session, obj: PaymentRequest) -> PaymentRequest:
     db.add(obj); db.commit(); db.refresh(obj); return obj
@@ -7,5 +10,24 @@ def payment_create(db: Session, obj: PaymentRequest) -> PaymentRequest:
 def payment_get(db: Session, payment_id: int) -> PaymentRequest | None:
     return db.query(PaymentRequest).filter(PaymentRequest.id == payment_id).first()
 
-def payment_list(db: Session):
-    return db.query(PaymentRequest).order_by(PaymentRequest.created_at.desc()).all()
+def payment_list(
+    db: Session,
+    role: str | None = None,
+    company: str | None = None,
+    status: str | None = None,
+    contract_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    after: Cursor | None = None,
+) -> tuple[list[PaymentRequest], str | None]:
+    """支付申请列表，返回 (本页记录, 下一页游标)"""
+    query = db.query(PaymentRequest)
+    if role is not None:
+        query = query.filter(*contract_visibility(PaymentRequest, role, company))
+    if status:
+        query = query.filter(PaymentRequest.status == status)
+    if contract_id is not None:
+        query = query.filter(PaymentRequest.contract_id == contract_id)
+    query = created_between(query, PaymentRequest, created_from, created_to)
+    return keyset_paginate(query, PaymentRequest, limit, after)
@@ -0,0 +1,42 @@
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.sequence import DocumentSequence
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def next_sequence_value(db: Session, prefix: str, year: int) -> int:
+    """原子地把 (prefix, year) 计数器加一并返回新值
+
+    SQLite / PostgreSQL 下是一条 INSERT ... ON CONFLICT DO UPDATE ... RETURNING，
+    一次往返完成；计数器行在当前事务提交前被锁定，多个 worker 并发创建时也不会拿到相同序号。
+    """
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(DocumentSequence).values(prefix=prefix, year=year, last_value=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DocumentSequence.prefix, DocumentSequence.year],
+            set_={"last_value": DocumentSequence.last_value + 1},
+        ).returning(DocumentSequence.last_value)
+        return db.execute(stmt).scalar_one()
+
+    # 其他数据库：先加锁自增，计数器行不存在时再插入
+    stmt = (
+        update(DocumentSequence)
+        .where(DocumentSequence.prefix == prefix, DocumentSequence.year == year)
+        .values(last_value=DocumentSequence.last_value + 1)
+    )
+    if db.execute(stmt).rowcount == 0:
+        db.add(DocumentSequence(prefix=prefix, year=year, last_value=1))
+        db.flush()
+        return 1
+    return db.execute(
+        select(DocumentSequence.last_value)
+        .where(DocumentSequence.prefix == prefix, DocumentSequence.year == year)
+    ).scalar_one()
+
+def next_code(db: Session, prefix: str, width: int = 6) -> str:
+    """生成单号，如 BQ-2025-000001；序号按前缀、按年递增"""
+    yyyy = datetime.utcnow().year
+    return f"{prefix}-{yyyy}-{next_sequence_value(db, prefix, yyyy):0{width}d}"
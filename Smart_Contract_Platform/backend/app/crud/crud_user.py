@@ -1,9 +1,66 @@
+from dataclasses import dataclass
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.models.user import User
 
+@dataclass(frozen=True)
+class CachedUser:
+    """缓存中的用户快照（不含密码哈希，跨会话共享时不会触发懒加载）"""
+    id: int
+    username: str
+    role: str
+    company: str | None
+    level: str | None
+
+# 已启用用户的缓存：username -> CachedUser
+# 本进程内的修改通过下方的 ORM 事件立即失效；其他进程的修改最长在 TTL 后生效
+_active_user_cache = TTLCache(maxsize=settings.user_cache_max_size, ttl=settings.user_cache_ttl_seconds)
+
 def user_get_by_username(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
+def user_get_active_cached(db: Session, username: str) -> CachedUser | None:
+    """按用户名获取已启用用户，命中缓存时不访问数据库"""
+    cached = _active_user_cache.get(username)
+    if cached is not None:
+        return cached
+    user = user_get_by_username(db, username)
+    if not user or not user.is_active:
+        return None
+    cached = CachedUser(id=user.id, username=user.username, role=user.role, company=user.company, level=user.level)
+    _active_user_cache.set(username, cached)
+    return cached
+
+def user_cache_invalidate(username: str | None = None) -> None:
+    """使用户缓存失效；不传用户名时清空全部"""
+    if username is None:
+        _active_user_cache.clear()
+    else:
+        _active_user_cache.pop(username)
+
+# 用户变更在事务提交后才使缓存失效：flush 时记下涉及的用户名，提交后清除，回滚时丢弃。
+# 若在 flush 时就清除，提交前其他请求可能把旧数据重新放进缓存，回滚的修改也会误清缓存
+_CHANGED_USERS = "changed_usernames"
+
+@event.listens_for(Session, "after_flush")
+def _record_user_changes(session: Session, flush_context):
+    changed = session.info.setdefault(_CHANGED_USERS, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.username.history
+            changed.update(name for name in (obj.username, *history.deleted) if name)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session):
+    for username in session.info.pop(_CHANGED_USERS, ()):
+        user_cache_invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session: Session):
+    session.info.pop(_CHANGED_USERS, None)
+
 def user_list(db: Session):
     return db.query(User).order_by(User.id.asc()).all()
 
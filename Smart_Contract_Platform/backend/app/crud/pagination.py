@@ -0,0 +1,64 @@
+"""列表查询的游标分页（keyset pagination）
+
+统一按 (created_at DESC, id DESC) 排序，游标是最后一条记录的 (created_at, id)，
+编码为不透明的 base64 字符串。翻页时用 WHERE 条件直接定位，不使用 OFFSET，
+因此无论翻到第几页，代价都与页大小成正比。
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+Cursor = tuple[datetime, int]
+
+# 不指定页大小时每页的条数；需要全部记录时调用方必须显式传 limit=None
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(created_at: datetime, obj_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), obj_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, obj_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(obj_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def created_between(query, model, created_from: datetime | None = None, created_to: datetime | None = None):
+    """按创建时间范围过滤（闭区间）"""
+    if created_from is not None:
+        query = query.filter(model.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(model.created_at <= created_to)
+    return query
+
+
+def keyset_paginate(
+    query, model, limit: int | None = DEFAULT_PAGE_SIZE, after: Cursor | None = None,
+) -> tuple[list, str | None]:
+    """按 (created_at, id) 倒序分页，返回 (本页记录, 下一页游标)
+
+    默认每页 DEFAULT_PAGE_SIZE 条；limit 为 None 时返回全部记录（只用于结果有界的查询，如某个合同下的记录），下一页游标为 None。
+    """
+    if after is not None:
+        created_at, obj_id = after
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < obj_id),
+        ))
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if limit is None:
+        return query.all(), None
+    # 多取一条用于判断是否还有下一页
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
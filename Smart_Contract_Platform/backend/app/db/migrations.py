@@ -0,0 +1,87 @@
+"""已有数据库的增量迁移
+
+init_db 会删表重建，只适用于开发环境。对已有数据的 demo.db / PostgreSQL，
+运行本脚本补齐模型中新增的表、可空列和索引，不影响已有数据：
+
+    python -m app.db.migrations
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.db.session import engine
+from app.db.base import Base
+import app.models  # noqa: F401  注册所有模型到 Base.metadata
+
+# 已被复合索引覆盖（复合索引的首列相同），可以删除的旧单列索引
+SUPERSEDED_INDEXES = (
+    "ix_contracts_contractor_org",
+    "ix_notifications_to_username",
+)
+
+
+def ensure_tables(bind: Engine = engine) -> list[str]:
+    """创建模型中定义但数据库中尚不存在的表，返回新建的表名"""
+    with bind.connect() as conn:
+        missing = [t for t in Base.metadata.sorted_tables if not bind.dialect.has_table(conn, t.name)]
+    Base.metadata.create_all(bind=bind, tables=missing)
+    return [t.name for t in missing]
+
+
+def ensure_columns(bind: Engine = engine) -> list[str]:
+    """为已有表补齐模型中新增的可空列，返回 "表.列" 列表"""
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not bind.dialect.has_table(conn, table.name):
+                continue
+            existing = {col["name"] for col in bind.dialect.get_columns(conn, table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def ensure_indexes(bind: Engine = engine) -> list[str]:
+    """创建模型中定义但数据库中尚不存在的索引，返回新建的索引名"""
+    created = []
+    with bind.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in Base.metadata.sorted_tables:
+            if not bind.dialect.has_table(conn, table.name):
+                continue
+            existing = {ix["name"] for ix in bind.dialect.get_indexes(conn, table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    created.append(index.name)
+        # 更新统计信息，让查询规划器使用新索引
+        conn.execute(text("ANALYZE"))
+    return created
+
+
+def main():
+    tables = ensure_tables()
+    if tables:
+        print("✅ 新建表：")
+        for name in tables:
+            print(f"  - {name}")
+    columns = ensure_columns()
+    if columns:
+        print("✅ 新增列：")
+        for name in columns:
+            print(f"  - {name}")
+    created = ensure_indexes()
+    if created:
+        print("✅ 新建索引：")
+        for name in created:
+            print(f"  - {name}")
+    else:
+        print("✅ 索引已是最新")
+
+
+if __name__ == "__main__":
+    main()
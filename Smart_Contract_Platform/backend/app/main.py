@@ -1,8 +1,12 @@
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.api import api_router
+from app.services.review_jobs import get_review_job_runner, fail_stale_jobs
+from app.services.review_cache import get_review_cache
 
 app = FastAPI(title=settings.app_name)
 
@@ -12,10 +16,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 列表接口的分页游标
 )
 
 app.include_router(api_router, prefix=settings.api_prefix)
 
+@app.on_event("startup")
+def warmup_ai_review():
+    if not settings.ai_review_warmup:
+        return
+    
+    def run():
+        from app.services.ai_review import warmup_ai_review
+        try:
+            print(f"AI审查预热完成，耗时 {warmup_ai_review():.1f}s")
+        except Exception as e:
+            print(f"警告：AI审查预热失败，将在第一次审查时重试: {e}")
+    
+    # 预热耗时数秒，不阻塞启动
+    threading.Thread(target=run, name="ai-review-warmup", daemon=True).start()
+
+@app.on_event("startup")
+def fail_stale_review_jobs():
+    # 上次运行遗留的未完成任务不会再有结果（其他仍在运行的 worker 的任务有心跳，不受影响）
+    try:
+        failed = fail_stale_jobs()
+    except Exception as e:
+        print(f"警告：清理未完成的AI审查任务失败: {e}")
+        return
+    if failed:
+        print(f"已将 {failed} 个中断的AI审查任务标记为失败")
+
+@app.on_event("shutdown")
+def stop_review_jobs():
+    get_review_job_runner().shutdown()
+    get_review_cache().flush()
+
 @app.get("/")
 def root():
     return {"name": settings.app_name, "docs": "/docs"}
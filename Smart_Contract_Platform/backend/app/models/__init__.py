@@ -5,3 +5,5 @@ from .payment import PaymentRequest
 from .quantity import QuantityRecord
 from .notification import Notification
 from .audit import AuditLog
+from .sequence import DocumentSequence
+from .ai_review import AIReviewBatch, AIReviewJob, AIReviewCacheEntry, AIReviewLock
@@ -0,0 +1,66 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class AIReviewBatch(Base):
+    """批量AI审查：一批合同的审查任务，各合同对应 ai_review_jobs 中 batch_id 相同的记录"""
+    __tablename__ = "ai_review_batches"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), default="PENDING")  # PENDING/RUNNING/FINISHED
+    total: Mapped[int] = mapped_column(Integer, default=0)  # 合同数
+    unique_clauses: Mapped[int] = mapped_column(Integer, default=0)  # 去重后的条款数（实际审查次数）
+    succeeded: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    created_by: Mapped[str] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class AIReviewJob(Base):
+    """AI审查后台任务，状态保存在数据库中，任意 worker 都能查询进度"""
+    __tablename__ = "ai_review_jobs"
+    __table_args__ = (
+        Index("ix_ai_review_jobs_contract_id_created_at", "contract_id", "created_at"),
+        Index("ix_ai_review_jobs_batch_id", "batch_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id"))
+    batch_id: Mapped[int | None] = mapped_column(ForeignKey("ai_review_batches.id"), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), default="PENDING")  # PENDING/RUNNING/SUCCEEDED/FAILED
+    progress: Mapped[int] = mapped_column(Integer, default=0)  # 0~100
+    stage: Mapped[str | None] = mapped_column(String(64), nullable=True)  # 当前阶段描述
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)  # ReviewResult 的 JSON
+    error: Mapped[str | None] = mapped_column(String(1000), nullable=True)
+    created_by: Mapped[str] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # 执行进程的最近心跳：未完成的任务长时间没有心跳说明 worker 已退出（见 review_jobs_fail_stale）
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class AIReviewCacheEntry(Base):
+    """AI审查结果缓存，按条款内容寻址（见 services/review_cache.py）"""
+    __tablename__ = "ai_review_cache"
+    __table_args__ = (
+        # LRU 淘汰：按最近使用时间删除
+        Index("ix_ai_review_cache_last_used_at", "last_used_at"),
+    )
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256
+    result: Mapped[str] = mapped_column(Text)  # ReviewResult 的 JSON
+    elapsed_ms: Mapped[int] = mapped_column(Integer, default=0)  # 生成该结果的耗时
+    total_tokens: Mapped[int] = mapped_column(Integer, default=0)  # 生成该结果消耗的 token
+    hit_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class AIReviewLock(Base):
+    """AI审查跨进程锁：多个 worker 同时审查相同条款时只有持锁方调用模型（见 services/singleflight.py）"""
+    __tablename__ = "ai_review_locks"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # 与审查结果缓存的键相同
+    owner: Mapped[str] = mapped_column(String(64))  # 主机名:进程号:随机串
+    acquired_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)  # 持锁进程崩溃时，过期后可被其他进程获取
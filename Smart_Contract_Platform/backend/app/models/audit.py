@@ -1,10 +1,16 @@
 from datetime import datetime
-from sqlalchemy import String, DateTime
+from sqlalchemy import String, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # 全量日志按时间倒序分页、今日操作数统计
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        # 按对象查看操作记录
+        Index("ix_audit_logs_entity", "entity_type", "entity_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     actor: Mapped[str] = mapped_column(String(64), index=True)
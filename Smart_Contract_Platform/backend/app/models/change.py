@@ -1,13 +1,18 @@
 from datetime import datetime
-from sqlalchemy import String, Float, DateTime, ForeignKey, Integer
+from sqlalchemy import String, Float, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
 class ChangeRequest(Base):
     __tablename__ = "change_requests"
+    __table_args__ = (
+        Index("ix_change_requests_created_at_id", "created_at", "id"),
+        Index("ix_change_requests_status_created_at", "status", "created_at", "id"),
+        Index("ix_change_requests_contract_id_created_at", "contract_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    code: Mapped[str] = mapped_column(String(32), unique=True, index=True)  # BQ-YYYY-XXX
+    code: Mapped[str] = mapped_column(String(32), unique=True, index=True)  # BQ-YYYY-NNNNNN
     contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id"))
     amount: Mapped[float] = mapped_column(Float)
     reason: Mapped[str] = mapped_column(String(500))
@@ -23,6 +28,12 @@ class ChangeRequest(Base):
 
 class ChangeApprovalTask(Base):
     __tablename__ = "change_tasks"
+    __table_args__ = (
+        # tasks_for_change / 前序步骤检查
+        Index("ix_change_tasks_change_id_step_order", "change_id", "step_order"),
+        # pending_tasks_for_user：按角色查待审批任务
+        Index("ix_change_tasks_assignee_role_status", "assignee_role", "status"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     change_id: Mapped[int] = mapped_column(ForeignKey("change_requests.id"))
     step_order: Mapped[int] = mapped_column(Integer)
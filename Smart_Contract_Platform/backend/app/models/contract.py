@@ -1,17 +1,27 @@
 from datetime import datetime
-from sqlalchemy import String, Float, DateTime, Text
+from sqlalchemy import String, Float, DateTime, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
 class Contract(Base):
     __tablename__ = "contracts"
+    __table_args__ = (
+        # 列表/仪表盘：ORDER BY created_at DESC, id DESC 的游标分页
+        Index("ix_contracts_created_at_id", "created_at", "id"),
+        # 按状态过滤 + 按时间排序（法务待审、监理待录入、管理员待处理）
+        Index("ix_contracts_status_created_at", "status", "created_at", "id"),
+        # 承包方可见性过滤（contract_visibility）+ 按时间排序
+        Index("ix_contracts_contractor_org_created_at", "contractor_org", "created_at", "id"),
+        # 合同管理员仪表盘：本人创建的合同按状态统计
+        Index("ix_contracts_created_by_status", "created_by", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     contract_no: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     contract_name: Mapped[str] = mapped_column(String(200))
     project_name: Mapped[str] = mapped_column(String(200))
     owner_org: Mapped[str] = mapped_column(String(200))
-    contractor_org: Mapped[str] = mapped_column(String(200), index=True)
+    contractor_org: Mapped[str] = mapped_column(String(200))
 
     tender_price: Mapped[float] = mapped_column(Float)   # 中标价
     contract_price: Mapped[float] = mapped_column(Float) # 合同价（强制=中标价）
@@ -1,13 +1,17 @@
 from datetime import datetime
-from sqlalchemy import String, DateTime, Boolean
+from sqlalchemy import String, DateTime, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # 用户通知列表：WHERE to_username = ? ORDER BY created_at DESC, id DESC
+        Index("ix_notifications_to_username_created_at", "to_username", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    to_username: Mapped[str] = mapped_column(String(64), index=True)
+    to_username: Mapped[str] = mapped_column(String(64))
     title: Mapped[str] = mapped_column(String(200))
     content: Mapped[str] = mapped_column(String(1000))
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
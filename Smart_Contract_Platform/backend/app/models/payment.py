@@ -1,13 +1,18 @@
 from datetime import datetime
-from sqlalchemy import String, Float, DateTime, ForeignKey, Integer, Boolean
+from sqlalchemy import String, Float, DateTime, ForeignKey, Integer, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
 class PaymentRequest(Base):
     __tablename__ = "payment_requests"
+    __table_args__ = (
+        Index("ix_payment_requests_created_at_id", "created_at", "id"),
+        Index("ix_payment_requests_status_created_at", "status", "created_at", "id"),
+        Index("ix_payment_requests_contract_id_created_at", "contract_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    code: Mapped[str] = mapped_column(String(32), unique=True, index=True)  # ZF-YYYY-XXX
+    code: Mapped[str] = mapped_column(String(32), unique=True, index=True)  # ZF-YYYY-NNNNNN
     contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id"))
     amount: Mapped[float] = mapped_column(Float)
     purpose: Mapped[str] = mapped_column(String(300))
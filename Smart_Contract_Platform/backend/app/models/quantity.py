@@ -1,10 +1,13 @@
 from datetime import datetime
-from sqlalchemy import String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
 class QuantityRecord(Base):
     __tablename__ = "quantity_records"
+    __table_args__ = (
+        Index("ix_quantity_records_contract_id_created_at", "contract_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id"))
@@ -0,0 +1,11 @@
+from sqlalchemy import String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class DocumentSequence(Base):
+    """单据编号计数器：每个前缀每年一行，last_value 为已分配的最大序号"""
+    __tablename__ = "document_sequences"
+
+    prefix: Mapped[str] = mapped_column(String(8), primary_key=True)  # BQ / ZF
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_value: Mapped[int] = mapped_column(Integer, default=0)
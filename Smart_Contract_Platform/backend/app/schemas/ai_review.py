@@ -1,6 +1,7 @@
 """
 AI审查相关的Schema定义
 """
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -21,10 +22,65 @@ class ReviewResult(BaseModel):
     compliance_score: float = 0.0  # 合规性评分（0-100）
     reviewed_sections: List[str] = []  # 已审查的条款片段
     relevant_laws_count: int = 0  # 检索到的相关法律条款数量
+    prompt_tokens: int = 0  # 本次发送的提示词估算 token 数（分段审查为各分段之和，复用的分段不计）
+    duplicate_laws: int = 0  # 拼接提示词时与已选片段重复而丢弃的法律条款片段数
+    overlap_laws: int = 0  # 裁掉与同一文件已选片段重叠的部分后过短而丢弃的法律条款片段数
+    over_budget_laws: int = 0  # 超出提示词 token 预算舍弃的法律条款片段数
     error: Optional[str] = None  # 错误信息（如果有）
+    cached: bool = False  # 是否直接复用了缓存的审查结果
+    reused_sections: List[str] = []  # 分段审查时未修改、直接复用上次结果的分段
 
 
 class ReviewRequest(BaseModel):
     """审查请求（可选，支持自定义条款）"""
     clauses: Optional[str] = None  # 自定义条款内容，如果不提供则使用合同中的条款
+    bypass_cache: bool = False  # 为True时忽略缓存，强制重新审查（并刷新缓存）
+    chunked: Optional[bool] = None  # 是否按"第X条"分段审查，不传时有两条及以上时自动分段（流式审查按长度）
 
+
+
+class ReviewJobOut(BaseModel):
+    """AI审查后台任务"""
+    id: int
+    contract_id: int
+    status: str  # PENDING/RUNNING/SUCCEEDED/FAILED
+    progress: int = 0  # 进度（0-100）
+    stage: Optional[str] = None  # 当前阶段
+    result: Optional[ReviewResult] = None  # 完成后的审查结果
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class BatchReviewRequest(BaseModel):
+    """批量审查请求：指定合同ID列表，或按合同状态筛选（二选一）"""
+    contract_ids: Optional[List[int]] = None
+    status: Optional[str] = None  # 如 ACTIVE
+    bypass_cache: bool = False
+    chunked: Optional[bool] = None
+
+
+class BatchJobItem(BaseModel):
+    """批次中单份合同的审查状态（完整结果通过 /ai-review/jobs/{job_id} 获取）"""
+    job_id: int
+    contract_id: int
+    status: str
+    compliance_score: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ReviewBatchOut(BaseModel):
+    """批量审查进度"""
+    id: int
+    status: str  # PENDING/RUNNING/FINISHED
+    total: int  # 合同数
+    unique_clauses: int  # 去重后实际审查的条款数
+    succeeded: int
+    failed: int
+    skipped: List[int] = []  # 条款为空而跳过的合同ID（仅在提交时返回）
+    created_by: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    jobs: List[BatchJobItem] = []
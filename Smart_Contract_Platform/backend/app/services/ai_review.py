@@ -2,11 +2,33 @@
 AI合同审查服务
 使用DeepSeek API和RAG进行合同条款审查
 """
+import copy
 import json
+import time
+import asyncio
+import threading
 import httpx
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional
 from app.core.config import settings
 from app.services.rag_service import get_rag_service
+from app.services.review_cache import get_review_cache, review_cache_key
+from app.services.llm_client import LLMHttpClient
+from app.services.clause_sections import (
+    ClauseSection, split_sections, split_review_sections, section_bodies, relabel_result,
+    merge_section_results, law_refs, locate_issue,
+)
+from app.services.stream_parser import IssueStreamParser
+from app.services.prompt_budget import (
+    DEFAULT_MAX_OUTPUT_TOKENS, DEFAULT_PROMPT_TOKEN_BUDGET, ReviewPrompt,
+    dedupe_laws, estimate_tokens, fit_laws, for_model,
+)
+from app.services.singleflight import review_flights, section_flights, get_review_lock
+from app.services.review_jobs import get_review_job_runner
+
+# 提示词版本：修改 build_review_prompt 或系统提示词时递增，使旧的缓存结果失效
+PROMPT_VERSION = "3"
+
+SYSTEM_PROMPT = "你是一位专业的合同审查专家，擅长分析合同条款的合规性和风险点。请严格按照JSON格式返回审查结果。"
 
 
 class AIReviewService:
@@ -17,19 +39,53 @@ class AIReviewService:
         self.api_base = settings.deepseek_api_base
         self.model = settings.deepseek_model
         self.rag_service = get_rag_service()
+        # 长期复用的HTTP客户端（连接池、并发上限、重试、耗时统计），只在审查任务执行器的事件循环中使用
+        self.http = LLMHttpClient(
+            timeout=settings.deepseek_timeout_seconds,
+            max_in_flight=settings.deepseek_max_in_flight,
+            max_retries=settings.deepseek_max_retries,
+            retry_base_delay=settings.deepseek_retry_base_delay,
+        )
+        get_review_job_runner().on_shutdown(self.http.aclose)
     
     def build_review_prompt(self, contract_clauses: str, relevant_laws: List[Dict]) -> str:
         """构建审查提示词"""
-        # 构建相关法律条款上下文
-        law_context = ""
-        if relevant_laws:
-            law_context = "相关法律条款参考：\n\n"
-            for i, law in enumerate(relevant_laws, 1):
-                law_context += f"{i}. {law['content']}\n"
-                if law.get('metadata', {}).get('source_file'):
-                    law_context += f"   来源：{law['metadata']['source_file']}\n"
-                law_context += "\n"
-        
+        return self.assemble_review_prompt(contract_clauses, relevant_laws).text
+    
+    def assemble_review_prompt(self, contract_clauses: str, relevant_laws: List[Dict]) -> ReviewPrompt:
+        """构建审查提示词：法律条款去重，并按模型的提示词 token 预算裁剪（合同条款不裁剪）"""
+        laws, duplicates, overlapped = dedupe_laws(relevant_laws)
+        budget = for_model(settings.ai_review_prompt_token_budget, self.model, DEFAULT_PROMPT_TOKEN_BUDGET)
+        fixed = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(self._render_prompt(contract_clauses, "相关法律条款参考：\n\n"))
+        laws, over_budget = fit_laws(laws, budget - fixed, self._format_law)
+        text = self._render_prompt(contract_clauses, self._law_context(laws))
+        return ReviewPrompt(text, estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(text), laws, duplicates, overlapped, over_budget)
+    
+    @staticmethod
+    def _prompt_stats(prompt: ReviewPrompt) -> Dict:
+        """写入审查结果的提示词统计（字段见 ReviewResult）"""
+        return {
+            "prompt_tokens": prompt.prompt_tokens,
+            "duplicate_laws": prompt.duplicates,
+            "overlap_laws": prompt.overlapped,
+            "over_budget_laws": prompt.over_budget,
+        }
+    
+    @staticmethod
+    def _format_law(i: int, law: Dict) -> str:
+        entry = f"{i}. {law['content']}\n"
+        if law.get('metadata', {}).get('source_file'):
+            entry += f"   来源：{law['metadata']['source_file']}\n"
+        return entry + "\n"
+    
+    def _law_context(self, laws: List[Dict]) -> str:
+        """构建相关法律条款上下文"""
+        if not laws:
+            return ""
+        return "相关法律条款参考：\n\n" + "".join(self._format_law(i, law) for i, law in enumerate(laws, 1))
+    
+    @staticmethod
+    def _render_prompt(contract_clauses: str, law_context: str) -> str:
         prompt = f"""你是一位专业的合同审查专家。请仔细审查以下合同条款，并基于提供的相关法律条款，标出所有问题、风险点和改进建议。
 
 {law_context}
@@ -65,8 +121,8 @@ class AIReviewService:
 """
         return prompt
     
-    def call_deepseek_api(self, prompt: str) -> str:
-        """调用DeepSeek API"""
+    def _build_chat_request(self, prompt: str, stream: bool = False) -> tuple[str, Dict, Dict]:
+        """构建DeepSeek请求的 (url, headers, body)"""
         if not self.api_key:
             raise Exception("DeepSeek API密钥未配置，请在.env文件中设置DEEPSEEK_API_KEY")
         
@@ -81,7 +137,7 @@ class AIReviewService:
             "messages": [
                 {
                     "role": "system",
-                    "content": "你是一位专业的合同审查专家，擅长分析合同条款的合规性和风险点。请严格按照JSON格式返回审查结果。"
+                    "content": SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -89,19 +145,58 @@ class AIReviewService:
                 }
             ],
             "temperature": 0.3,
-            "max_tokens": 4000
+            "max_tokens": for_model(settings.ai_review_max_output_tokens, self.model, DEFAULT_MAX_OUTPUT_TOKENS)
         }
-        
+        if stream:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+        return url, headers, data
+    
+    def _extract_content(self, result: Dict, usage: Optional[Dict] = None) -> str:
+        """从API响应中取出模型回复，usage 不为空时写入 token 用量"""
+        if usage is not None:
+            self._add_usage(usage, result.get("usage") or {})
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        raise Exception(f"API返回格式异常: {result}")
+    
+    async def acall_deepseek_api(self, prompt: str, usage: Optional[Dict] = None) -> str:
+        """调用DeepSeek API（异步版本，等待响应期间不占用线程）"""
+        url, headers, data = self._build_chat_request(prompt)
         try:
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(url, headers=headers, json=data)
-                response.raise_for_status()
-                result = response.json()
-                
-                if "choices" in result and len(result["choices"]) > 0:
-                    return result["choices"][0]["message"]["content"]
-                else:
-                    raise Exception(f"API返回格式异常: {result}")
+            return self._extract_content(await self.http.apost_json(url, headers, data), usage)
+        except httpx.HTTPStatusError as e:
+            raise Exception(f"DeepSeek API调用失败: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            raise Exception(f"DeepSeek API调用错误: {str(e)}")
+    
+    @staticmethod
+    def normalize_issue(issue: Dict) -> Dict:
+        """补全问题项缺失的字段"""
+        issue.setdefault("type", "不完善")
+        issue.setdefault("severity", "中")
+        issue.setdefault("location", "未知位置")
+        issue.setdefault("description", "")
+        issue.setdefault("suggestion", "")
+        return issue
+    
+    async def astream_deepseek_api(self, prompt: str, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """以流式模式调用DeepSeek API，逐段返回模型输出的文本"""
+        url, headers, data = self._build_chat_request(prompt, stream=True)
+        try:
+            async for line in self.http.astream_lines(url, headers, data):
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if usage is not None and chunk.get("usage"):
+                    self._add_usage(usage, chunk["usage"])
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
         except httpx.HTTPStatusError as e:
             raise Exception(f"DeepSeek API调用失败: {e.response.status_code} - {e.response.text}")
         except Exception as e:
@@ -135,18 +230,8 @@ class AIReviewService:
             
             # 确保每个issue都有必需的字段
             for issue in result["issues"]:
-                if not isinstance(issue, dict):
-                    continue
-                if "type" not in issue:
-                    issue["type"] = "不完善"
-                if "severity" not in issue:
-                    issue["severity"] = "中"
-                if "location" not in issue:
-                    issue["location"] = "未知位置"
-                if "description" not in issue:
-                    issue["description"] = ""
-                if "suggestion" not in issue:
-                    issue["suggestion"] = ""
+                if isinstance(issue, dict):
+                    self.normalize_issue(issue)
             
             if "suggestions" not in result:
                 result["suggestions"] = []
@@ -169,56 +254,379 @@ class AIReviewService:
             # 如果JSON解析失败，尝试提取关键信息
             raise Exception(f"无法解析AI返回的JSON格式结果: {str(e)}\n原始响应: {api_response[:500]}")
     
-    def review_contract(self, contract_clauses: str) -> Dict:
-        """审查合同条款"""
+    @staticmethod
+    def _empty_clauses_result() -> Dict:
+        return {
+            "issues": [],
+            "suggestions": ["合同条款为空，无法进行审查"],
+            "compliance_score": 0.0,
+            "reviewed_sections": [],
+            "error": "合同条款为空"
+        }
+    
+    @staticmethod
+    def _error_result(e: Exception) -> Dict:
+        return {
+            "issues": [],
+            "suggestions": [],
+            "compliance_score": 0.0,
+            "reviewed_sections": [],
+            "error": str(e)
+        }
+    
+    def cache_key(self, contract_clauses: str, chunked: bool = False, kb_version: Optional[str] = None) -> str:
+        """审查结果缓存键：条款内容、模型、提示词版本、知识库版本、审查方式任一变化都会生成新键"""
+        prompt_version = f"{PROMPT_VERSION}-chunked" if chunked else PROMPT_VERSION
+        if kb_version is None:
+            kb_version = self.rag_service.knowledge_base_version()
+        return review_cache_key(contract_clauses, self.model, prompt_version, kb_version)
+    
+    @staticmethod
+    def should_chunk(contract_clauses: str) -> bool:
+        """有两条及以上"第X条"的合同自动分段审查（分段结果可在修改条款后复用）"""
+        return len(split_sections(contract_clauses)) > 1
+    
+    @staticmethod
+    def should_stream_chunked(contract_clauses: str) -> bool:
+        """流式审查只有超过 ai_review_chunk_threshold_chars 的长合同才自动分段
+        
+        分段审查的各分段不逐字输出，问题要等整个分段的模型调用结束才能推送；
+        短合同整份流式审查，问题在模型输出的同时推送。
+        """
+        return len(contract_clauses) > settings.ai_review_chunk_threshold_chars
+    
+    @staticmethod
+    def _add_usage(total: Dict, usage: Dict) -> None:
+        for k, v in usage.items():
+            if isinstance(v, int):
+                total[k] = total.get(k, 0) + v
+    
+    async def _areview_text(self, text: str, usage: Dict) -> tuple[Dict, List[Dict]]:
+        """检索 + 调用模型审查一段条款，返回 (审查结果, 检索到的法律条款)
+        
+        向量检索放到线程中执行，模型调用使用异步HTTP。
+        """
+        relevant_laws = await asyncio.to_thread(self.rag_service.search_relevant_chunks, query=text, top_k=5)
+        prompt = self.assemble_review_prompt(text, relevant_laws)
+        api_response = await self.acall_deepseek_api(prompt.text, usage)
+        result = self.parse_review_result(api_response)
+        result.update(self._prompt_stats(prompt))
+        return result, relevant_laws
+    
+    def section_cache_key(self, section: ClauseSection, kb_version: str) -> str:
+        """分段结果缓存键：只取决于分段内各条的正文（不含条号）而与所属合同无关
+
+        修改过的条款才会重新审查；前面插入或删除条款导致条号变化时仍能复用。
+        """
+        return review_cache_key(section_bodies(section), self.model, f"{PROMPT_VERSION}-section", kb_version)
+    
+    async def _areview_section(self, section: ClauseSection, kb_version: str, use_cache: bool) -> tuple[Dict, Dict]:
+        """审查单个分段，返回 (审查结果, token用量)
+        
+        上次审查过且未修改的分段直接复用缓存结果（条号不同时换成本次的条号）；同一分段正由其他请求审查时等待其结果。
+        失败时返回带 error 的结果而不是抛出异常。
+        """
+        cache = get_review_cache()
+        key = self.section_cache_key(section, kb_version)
+        if use_cache:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                relabel_result(cached, cached.pop("article_titles", []), list(section.titles))
+                cached["reused"] = True
+                return cached, {}
+        
+        async def compute() -> tuple[Dict, Dict]:
+            started = time.perf_counter()
+            usage: Dict = {}
+            try:
+                result, laws = await self._areview_text(section.text, usage)
+            except Exception as e:
+                return self._error_result(e), usage
+            result["law_refs"] = law_refs(laws)
+            result["article_titles"] = list(section.titles)  # 复用时据此换成新的条号
+            await asyncio.to_thread(
+                cache.put, key, result, int((time.perf_counter() - started) * 1000), usage.get("total_tokens", 0)
+            )
+            return result, usage
+        
+        if not use_cache:
+            result, usage = await compute()
+        else:
+            (result, usage), shared = await section_flights.ado(key, compute)
+            result, usage = self._shared_section(result, usage, shared)
+        relabel_result(result, result.pop("article_titles", []), list(section.titles))
+        return result, usage
+    
+    @staticmethod
+    def _shared_section(result: Dict, usage: Dict, shared: bool) -> tuple[Dict, Dict]:
+        """共享其他请求的分段结果时按复用处理，token 已由执行方计入"""
+        if not shared:
+            return result, usage
+        if not result.get("error"):
+            result["reused"] = True
+        return result, {}
+    
+    def _merge_sections(self, sections: List[ClauseSection], outcomes: List[tuple[Dict, Dict]], usage: Dict) -> Dict:
+        laws, reused = set(), []
+        prompt_stats = {"prompt_tokens": 0, "duplicate_laws": 0, "overlap_laws": 0, "over_budget_laws": 0}
+        for section, (section_result, section_usage) in zip(sections, outcomes):
+            laws.update(section_result.pop("law_refs", []))
+            section_stats = {k: section_result.pop(k, 0) for k in prompt_stats}
+            if section_result.pop("reused", False):
+                reused.append(section.title)
+            else:
+                self._add_usage(prompt_stats, section_stats)  # 本次实际发送的提示词，复用的分段不计
+            self._add_usage(usage, section_usage)
+        result = merge_section_results(sections, [r for r, _ in outcomes])
+        result["relevant_laws_count"] = len(laws)
+        result.update(prompt_stats)
+        result["reused_sections"] = reused
+        return result
+    
+    async def _aclaim(self, key: str) -> Optional[Dict]:
+        """获取条款的跨进程审查锁
+        
+        其他进程正在审查相同条款时轮询缓存等待其结果并返回；对方失败（锁释放但没有结果）时重新争抢。
+        返回 None 表示已获得锁，由本进程审查，完成后需释放锁。
+        """
+        lock = get_review_lock()
+        cache = get_review_cache()
+        while not await asyncio.to_thread(lock.acquire, key):
+            while await asyncio.to_thread(lock.held, key):
+                await asyncio.sleep(lock.poll_interval)
+                cached = await asyncio.to_thread(cache.get, key, False)
+                if cached is not None:
+                    return cached
+            cached = await asyncio.to_thread(cache.get, key, False)
+            if cached is not None:
+                return cached
+        return None
+    
+    async def _acoalesced(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """相同条款的并发审查只执行一次：本进程内等待同一个进行中的审查，跨进程通过审查锁等待持锁方的缓存结果"""
+        async def exclusive() -> Dict:
+            cached = await self._aclaim(key)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+            try:
+                return await compute()
+            finally:
+                await asyncio.to_thread(get_review_lock().release, key)
+        
+        result, shared = await review_flights.ado(key, exclusive)
+        if shared and not result.get("error"):
+            result["cached"] = True
+        return result
+    
+    def review_contract(self, contract_clauses: str, use_cache: bool = True, chunked: Optional[bool] = None) -> Dict:
+        """审查合同条款（同步调用入口，供脚本使用；不能在审查任务执行器的事件循环里调用）
+        
+        与 areview_contract 相同，提交到审查任务执行器的事件循环执行，与其他审查共用连接池和并发上限。
+        """
+        return get_review_job_runner().run_coroutine(
+            self.areview_contract(contract_clauses, use_cache=use_cache, chunked=chunked)
+        ).result()
+    
+    async def areview_contract(
+        self,
+        contract_clauses: str,
+        on_progress: Optional[Callable[[int, str], Awaitable[None]]] = None,
+        use_cache: bool = True,
+        chunked: Optional[bool] = None,
+    ) -> Dict:
+        """审查合同条款（供后台任务使用）
+        
+        use_cache 为 False 时跳过缓存读取，重新审查并刷新缓存。
+        chunked 为 True 时按"第X条"分段并发审查后合并结果，为 None 时按长度自动选择。
+        分段审查是增量的：每个分段的结果按分段内容缓存，重新审查时只有新增或修改过的分段会调用模型。
+        相同条款同时被多次审查时（包括其他 worker 进程），只有一次会调用模型，其余等待并共享其结果。
+        
+        向量检索是CPU密集的本地计算，放到线程中执行；模型调用使用异步HTTP。
+        分段审查时各分段并发执行（并发数为 ai_review_section_concurrency），
+        总耗时取决于最长的分段而不是所有分段之和。
+        on_progress(progress, stage) 在每个阶段开始时回调。
+        """
+        if not contract_clauses or not contract_clauses.strip():
+            return self._empty_clauses_result()
+        if chunked is None:
+            chunked = self.should_chunk(contract_clauses)
+        
+        async def report(progress: int, stage: str):
+            if on_progress is not None:
+                await on_progress(progress, stage)
+        
+        cache = get_review_cache()
+        kb_version = await asyncio.to_thread(self.rag_service.knowledge_base_version)
+        key = self.cache_key(contract_clauses, chunked, kb_version)
+        if use_cache:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+        
+        async def compute() -> Dict:
+            started = time.perf_counter()
+            usage: Dict = {}
+            try:
+                if chunked:
+                    sections = split_review_sections(contract_clauses, settings.ai_review_chunk_threshold_chars)
+                    semaphore = asyncio.Semaphore(settings.ai_review_section_concurrency)
+                    done = 0
+                    await report(10, f"分段审查中（0/{len(sections)}）")
+                    
+                    async def run(section: ClauseSection):
+                        nonlocal done
+                        async with semaphore:
+                            outcome = await self._areview_section(section, kb_version, use_cache)
+                        done += 1
+                        await report(10 + 80 * done // len(sections), f"分段审查中（{done}/{len(sections)}）")
+                        return outcome
+                    
+                    outcomes = await asyncio.gather(*(run(section) for section in sections))
+                    await report(90, "合并审查结果")
+                    result = self._merge_sections(sections, outcomes, usage)
+                else:
+                    await report(10, "检索相关法律条款")
+                    result, relevant_laws = await self._areview_text(contract_clauses, usage)
+                    await report(90, "解析审查结果")
+                    result["relevant_laws_count"] = len(relevant_laws)
+                result["reviewed_at"] = None
+                
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                await asyncio.to_thread(cache.put, key, result, elapsed_ms, usage.get("total_tokens", 0))
+                return result
+            except Exception as e:
+                return self._error_result(e)
+        
+        return await self._acoalesced(key, compute) if use_cache else await compute()
+    
+    async def astream_review(
+        self,
+        contract_clauses: str,
+        use_cache: bool = True,
+        chunked: Optional[bool] = None,
+    ) -> AsyncIterator[tuple[str, Dict]]:
+        """流式审查合同条款，逐个产出 (事件类型, 数据)
+        
+        - status: 当前阶段 {"stage": ...}
+        - delta: 模型输出的原始文本片段 {"text": ...}
+        - section: 分段审查时某个分段完成 {"title": ..., "reused": bool}
+        - issue: 一个完整的问题项，模型输出到该问题的结尾时立即产出
+        - result: 最终的规范化审查结果（与 areview_contract 返回值相同），之后流结束
+        
+        chunked 为 None 时按长度选择（见 should_stream_chunked），而不是像 areview_contract 那样按条数。
+        """
         if not contract_clauses or not contract_clauses.strip():
-            return {
-                "issues": [],
-                "suggestions": ["合同条款为空，无法进行审查"],
-                "compliance_score": 0.0,
-                "reviewed_sections": [],
-                "error": "合同条款为空"
-            }
+            yield "result", self._empty_clauses_result()
+            return
+        if chunked is None:
+            chunked = self.should_stream_chunked(contract_clauses)
         
+        cache = get_review_cache()
+        kb_version = await asyncio.to_thread(self.rag_service.knowledge_base_version)
+        key = self.cache_key(contract_clauses, chunked, kb_version)
+        flight, leader = None, False
+        if use_cache:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is None:
+                # 相同条款正在审查时（本进程或其他 worker）等待并共享其结果，不重复调用模型
+                flight, leader = review_flights.begin(key)
+                if leader:
+                    try:
+                        cached = await self._aclaim(key)
+                    except BaseException as e:
+                        review_flights.finish(key, flight, error=e)
+                        raise
+                    if cached is not None:
+                        review_flights.finish(key, flight, cached)
+                        leader = False
+                else:
+                    yield "status", {"stage": "等待相同条款的审查结果"}
+                    cached = copy.deepcopy(await asyncio.wrap_future(flight))
+            if cached is not None:
+                if not cached.get("error"):
+                    cached["cached"] = True
+                for issue in cached.get("issues", []):
+                    yield "issue", issue
+                yield "result", cached
+                return
+        
+        result = None
         try:
-            # 1. 使用RAG检索相关法律条款
-            relevant_laws = self.rag_service.search_relevant_chunks(
-                query=contract_clauses,
-                top_k=5
-            )
-            
-            # 2. 构建提示词
-            prompt = self.build_review_prompt(contract_clauses, relevant_laws)
-            
-            # 3. 调用DeepSeek API
-            api_response = self.call_deepseek_api(prompt)
-            
-            # 4. 解析结果
-            result = self.parse_review_result(api_response)
-            
-            # 5. 添加元数据
-            result["relevant_laws_count"] = len(relevant_laws)
-            result["reviewed_at"] = None  # 可以在调用时添加时间戳
-            
-            return result
-        except Exception as e:
-            # 返回错误信息
-            return {
-                "issues": [],
-                "suggestions": [],
-                "compliance_score": 0.0,
-                "reviewed_sections": [],
-                "error": str(e)
-            }
+            started = time.perf_counter()
+            usage: Dict = {}
+            try:
+                if chunked:
+                    # 分段审查：各分段并发执行，哪个分段先完成就先输出它的问题
+                    sections = split_review_sections(contract_clauses, settings.ai_review_chunk_threshold_chars)
+                    yield "status", {"stage": f"分段审查中（共{len(sections)}段）"}
+                    semaphore = asyncio.Semaphore(settings.ai_review_section_concurrency)
+                    
+                    async def run(index: int):
+                        async with semaphore:
+                            return index, await self._areview_section(sections[index], kb_version, use_cache)
+                    
+                    outcomes: List = [None] * len(sections)
+                    for next_done in asyncio.as_completed([run(i) for i in range(len(sections))]):
+                        index, outcome = await next_done
+                        outcomes[index] = outcome
+                        section_result = outcome[0]
+                        yield "section", {"title": sections[index].title, "reused": bool(section_result.get("reused"))}
+                        if not section_result.get("error"):
+                            for issue in section_result.get("issues", []):
+                                if isinstance(issue, dict):
+                                    yield "issue", locate_issue(self.normalize_issue(dict(issue)), sections[index])
+                    result = self._merge_sections(sections, outcomes, usage)
+                else:
+                    yield "status", {"stage": "检索相关法律条款"}
+                    relevant_laws = await asyncio.to_thread(
+                        self.rag_service.search_relevant_chunks, query=contract_clauses, top_k=5
+                    )
+                    yield "status", {"stage": "AI分析中"}
+                    prompt = self.assemble_review_prompt(contract_clauses, relevant_laws)
+                    parser = IssueStreamParser()
+                    async for text in self.astream_deepseek_api(prompt.text, usage):
+                        yield "delta", {"text": text}
+                        for issue in parser.feed(text):
+                            yield "issue", self.normalize_issue(issue)
+                    result = self.parse_review_result(parser.buffer)
+                    result["relevant_laws_count"] = len(relevant_laws)
+                    result.update(self._prompt_stats(prompt))
+                result["reviewed_at"] = None
+                
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                await asyncio.to_thread(cache.put, key, result, elapsed_ms, usage.get("total_tokens", 0))
+            except Exception as e:
+                result = self._error_result(e)
+        finally:
+            if leader:
+                # 客户端中途断开时也要唤醒等待者并释放锁；此处不能再 await，
+                # 释放锁要提交数据库事务，放到线程池执行，不阻塞事件循环
+                review_flights.finish(key, flight, result or self._error_result(RuntimeError("审查已中断")))
+                asyncio.get_running_loop().run_in_executor(None, get_review_lock().release, key)
+        yield "result", result
 
 
 # 全局AI审查服务实例
 _ai_review_service: Optional[AIReviewService] = None
+_ai_review_service_lock = threading.Lock()
 
 def get_ai_review_service() -> AIReviewService:
     """获取AI审查服务实例（单例模式）"""
     global _ai_review_service
     if _ai_review_service is None:
-        _ai_review_service = AIReviewService()
+        with _ai_review_service_lock:
+            if _ai_review_service is None:
+                _ai_review_service = AIReviewService()
     return _ai_review_service
 
+def warmup_ai_review() -> float:
+    """预加载AI审查依赖（向量库、嵌入模型），返回耗时秒数
+
+    默认在第一次审查时才加载；设置 AI_REVIEW_WARMUP=true 时在应用启动后由后台线程调用。
+    """
+    started = time.perf_counter()
+    get_ai_review_service().rag_service.warmup()
+    return time.perf_counter() - started
+
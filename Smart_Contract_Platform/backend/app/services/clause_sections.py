@@ -0,0 +1,177 @@
+"""
+合同条款分段
+
+合同按"第X条"切分为条，相邻的条再组成审查分段，分段审查后合并为一份审查结果。
+分段的边界由内容决定（某条正文的哈希满足条件且分段已够长时在其后切开），
+插入或删除一条只影响它所在的分段，后面的分段不变，仍能复用缓存的审查结果。
+分段的缓存键只取正文、不含条号，条号整体后移时也能命中（见 section_bodies、relabel_result）。
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from app.services.review_cache import normalize_clauses
+
+# 分段达到最小长度后，平均每 CUT_MODULUS 条切开一次
+CUT_MODULUS = 3
+
+ARTICLE_HEADING = re.compile(r"^[ \t　]*(第[一二三四五六七八九十百千零〇两\d]+条)", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class ClauseSection:
+    """条款分段"""
+    title: str  # 如"第三条"、"第三条至第五条"；第一条之前的内容为"前言"
+    text: str
+    articles: Tuple[str, ...] = ()  # 分段内各条的条号，为空时即 (title,)
+
+    @property
+    def titles(self) -> Tuple[str, ...]:
+        return self.articles or (self.title,)
+
+
+def strip_heading(section: ClauseSection) -> str:
+    """去掉开头条号后的正文（规范化空白），用作缓存键"""
+    text = section.text
+    m = ARTICLE_HEADING.match(text)
+    if m and m.group(1) == section.title:
+        text = text[m.end():]
+    return normalize_clauses(text)
+
+
+def split_sections(clauses: str) -> List[ClauseSection]:
+    """按行首的"第X条"切分条款；没有条号时整体作为一个分段"""
+    matches = list(ARTICLE_HEADING.finditer(clauses))
+    if not matches:
+        text = clauses.strip()
+        return [ClauseSection(title="全文", text=text)] if text else []
+
+    sections = []
+    preamble = clauses[:matches[0].start()].strip()
+    if preamble:
+        sections.append(ClauseSection(title="前言", text=preamble))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(clauses)
+        text = clauses[m.start():end].strip()
+        if text:
+            sections.append(ClauseSection(title=m.group(1), text=text))
+    return sections
+
+
+def group_sections(articles: List[ClauseSection], max_chars: int) -> List[ClauseSection]:
+    """把相邻的条组成审查分段：分段不少于 max_chars // 4 字后，在正文哈希满足条件的条之后切开，最长 max_chars 字
+
+    单独一条超过 max_chars 时自成一段。
+    """
+    min_chars = max_chars // 4
+    groups: List[List[ClauseSection]] = []
+    current: List[ClauseSection] = []
+    size = 0
+    for article in articles:
+        if current and size + len(article.text) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(article)
+        size += len(article.text)
+        digest = int(hashlib.sha1(strip_heading(article).encode("utf-8")).hexdigest()[:8], 16)
+        if size >= min_chars and digest % CUT_MODULUS == 0:
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+
+    sections = []
+    for group in groups:
+        title = group[0].title if len(group) == 1 else f"{group[0].title}至{group[-1].title}"
+        sections.append(ClauseSection(
+            title=title,
+            text="\n".join(a.text for a in group),
+            articles=tuple(a.title for a in group),
+        ))
+    return sections
+
+
+def split_review_sections(clauses: str, max_chars: int) -> List[ClauseSection]:
+    """切分为审查分段"""
+    return group_sections(split_sections(clauses), max_chars)
+
+
+def section_bodies(section: ClauseSection) -> str:
+    """分段内各条去掉条号后的正文，作为分段结果的缓存键：条号变化（前面插入或删除了条）不影响命中"""
+    articles = split_sections(section.text)
+    return "\n\n".join(strip_heading(a) for a in articles)
+
+
+def relabel_result(result: Dict, old_titles: List[str], new_titles: List[str]) -> Dict:
+    """复用条号不同的分段结果时，把问题位置和描述中的旧条号换成新条号"""
+    mapping = {old: new for old, new in zip(old_titles, new_titles) if old != new}
+    if not mapping:
+        return result
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(mapping, key=len, reverse=True)))
+    for issue in result.get("issues", []):
+        if not isinstance(issue, dict):
+            continue
+        for field in ("location", "description", "suggestion"):
+            if isinstance(issue.get(field), str):
+                issue[field] = pattern.sub(lambda m: mapping[m.group(0)], issue[field])
+    return result
+
+
+def law_refs(laws: List[Dict]) -> List[str]:
+    """检索到的法律条款的短哈希，分段结果缓存时只保存引用，用于合并后统计去重的条款数"""
+    return [hashlib.sha1(law["content"].encode("utf-8")).hexdigest()[:16] for law in laws]
+
+
+def locate_issue(issue: Dict, section: ClauseSection) -> Dict:
+    """分段审查时模型给出的位置可能不含条号，补上所属分段"""
+    location = issue.get("location", "")
+    if not any(title in location for title in section.titles):
+        issue["location"] = f"{section.title} {location}".strip()
+    return issue
+
+
+def merge_section_results(sections: List[ClauseSection], results: List[Dict]) -> Dict:
+    """合并各分段的审查结果
+
+    - 问题按分段顺序拼接，去掉位置和描述都相同的重复项
+    - 总体建议去重并保持顺序
+    - 合规性评分按分段文本长度加权平均
+    - 失败的分段不参与评分，并在 error 中列出
+    """
+    issues, seen_issues = [], set()
+    suggestions, seen_suggestions = [], set()
+    reviewed_sections = []
+    weighted_score, total_weight = 0.0, 0
+    failed = []
+
+    for section, result in zip(sections, results):
+        if result.get("error"):
+            failed.append(f"{section.title}: {result['error']}")
+            continue
+        for issue in result.get("issues", []):
+            if not isinstance(issue, dict):
+                continue
+            locate_issue(issue, section)
+            key = (issue.get("location"), issue.get("description"))
+            if key not in seen_issues:
+                seen_issues.add(key)
+                issues.append(issue)
+        for s in result.get("suggestions", []):
+            if s not in seen_suggestions:
+                seen_suggestions.add(s)
+                suggestions.append(s)
+        reviewed_sections.append(section.title)
+        weight = len(section.text)
+        weighted_score += float(result.get("compliance_score", 0.0)) * weight
+        total_weight += weight
+
+    merged = {
+        "issues": issues,
+        "suggestions": suggestions,
+        "compliance_score": round(weighted_score / total_weight, 1) if total_weight else 0.0,
+        "reviewed_sections": reviewed_sections,
+    }
+    if failed:
+        merged["error"] = f"{len(failed)}/{len(sections)} 个分段审查失败：" + "；".join(failed)
+    return merged
@@ -0,0 +1,214 @@
+"""
+嵌入服务（unix socket 边车进程）
+
+每个 uvicorn worker 各自加载嵌入模型会在内存中保存多份相同的模型。启动一个嵌入服务进程，
+并在各 worker 的配置中设置 EMBEDDING_SERVER_SOCKET，所有 worker 就共用这一份模型。
+
+来自各连接的请求先进入队列，由一个线程合并成批后调用一次模型（micro-batching）：
+- 空闲时（上一批只有一个请求）收到请求立即计算，不增加延迟
+- 有并发请求时最多等待 max_wait_ms 凑批，直到累计 max_batch_size 条文本
+
+用法：
+    python -m app.services.embedding_server --socket /tmp/contract_embeddings.sock
+    python -m app.services.embedding_server --socket /tmp/contract_embeddings.sock --stats  # 查看批处理统计
+"""
+import argparse
+import os
+import queue
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.embeddings import EmbeddingClient, load_local_embeddings, recv_message, send_message
+
+
+class _Pending:
+    """一个等待计算的请求"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result: Optional[List[List[float]]] = None
+        self.error: Optional[Exception] = None
+
+
+class MicroBatcher:
+    """把多个请求的文本合并为一次 embed_documents 调用"""
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_batch_size: int = 64, max_wait_ms: float = 10):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._last_batch_requests = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.busy_ms = 0.0
+        self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """提交文本并等待结果（由各连接的处理线程调用）"""
+        if self._closed:
+            raise RuntimeError("嵌入服务正在停止")
+        pending = _Pending(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        # 停止前刚入队的请求不再计算，直接返回错误
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                pending.error = RuntimeError("嵌入服务正在停止")
+                pending.done.set()
+
+    def _collect(self, first: _Pending) -> tuple[List[_Pending], bool]:
+        """从队列中凑一批请求，返回 (批, 是否收到停止信号)"""
+        batch, size = [first], len(first.texts)
+        # 动态窗口：上一批只有一个请求说明当前空闲，不等待；否则最多等待 max_wait 凑批
+        wait = self.max_wait if self._last_batch_requests > 1 else 0
+        deadline = time.monotonic() + wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item.texts)
+        return batch, False
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            self._run(batch)
+
+    def _run(self, batch: List[_Pending]) -> None:
+        texts = [text for pending in batch for text in pending.texts]
+        started = time.perf_counter()
+        try:
+            vectors = self.embed_fn(texts)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+                pending.done.set()
+            return
+        finally:
+            self._last_batch_requests = len(batch)
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.busy_ms += (time.perf_counter() - started) * 1000
+        offset = 0
+        for pending in batch:
+            pending.result = [list(map(float, v)) for v in vectors[offset:offset + len(pending.texts)]]
+            offset += len(pending.texts)
+            pending.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "avg_texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "busy_ms": round(self.busy_ms, 1),
+            }
+
+
+def make_handler(batcher: MicroBatcher):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            while True:
+                message = recv_message(self.request)
+                if message is None:
+                    return
+                if message.get("op") == "stats":
+                    send_message(self.request, batcher.stats())
+                    continue
+                try:
+                    send_message(self.request, {"embeddings": batcher.embed(message["texts"])})
+                except Exception as e:
+                    send_message(self.request, {"error": str(e)})
+
+    return Handler
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # 多个 worker 的多个线程会同时建立连接
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher):
+        # 上次异常退出时残留的 socket 文件会导致 bind 失败
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, make_handler(batcher))
+        self.socket_path = socket_path
+        self.batcher = batcher
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path: str, embeddings, max_batch_size: int = 64, max_wait_ms: float = 10) -> EmbeddingServer:
+    """在后台线程启动嵌入服务并返回 server，shutdown() + server_close() 停止
+
+    embeddings 为任意提供 embed_documents 的对象。
+    """
+    server = EmbeddingServer(socket_path, MicroBatcher(embeddings.embed_documents, max_batch_size, max_wait_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入服务（多个 worker 共用一份嵌入模型）")
+    parser.add_argument("--socket", default=settings.embedding_server_socket or "/tmp/contract_embeddings.sock")
+    parser.add_argument("--max-batch-size", type=int, default=settings.embedding_batch_max_size)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.embedding_batch_max_wait_ms)
+    parser.add_argument("--stats", action="store_true", help="连接正在运行的嵌入服务并输出批处理统计")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(EmbeddingClient(args.socket).stats())
+        return
+
+    print("加载嵌入模型...")
+    embeddings = load_local_embeddings()
+    server = EmbeddingServer(args.socket, MicroBatcher(embeddings.embed_documents, args.max_batch_size, args.max_wait_ms))
+    print(f"嵌入服务: {args.socket}（批大小 {args.max_batch_size}，等待窗口 {args.max_wait_ms}ms）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
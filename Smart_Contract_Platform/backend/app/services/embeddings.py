@@ -0,0 +1,109 @@
+"""
+文本嵌入
+
+- load_local_embeddings：在本进程加载 HuggingFace 嵌入模型
+- EmbeddingClient：连接嵌入服务（app/services/embedding_server.py），多个 uvicorn worker 共用一份模型
+
+两者都提供 embed_documents / embed_query，RAGService 按 EMBEDDING_SERVER_SOCKET 配置选择其一。
+嵌入服务通过 unix socket 通信，每条消息为 4 字节大端长度 + UTF-8 JSON。
+"""
+import json
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+_HEADER = struct.Struct(">I")
+
+
+def load_local_embeddings():
+    """在本进程加载嵌入模型（首次运行时会自动下载模型）"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def send_message(sock: socket.socket, message: Dict) -> None:
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict]:
+    """读取一条消息；对端关闭连接时返回 None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class EmbeddingClient:
+    """嵌入服务客户端，接口与 HuggingFaceEmbeddings 相同
+
+    每个线程持有一条长连接；连接断开（如嵌入服务重启）时重连一次。
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ConnectionError(f"无法连接嵌入服务 {self.socket_path}: {e}") from e
+        return sock
+
+    def _request(self, message: Dict) -> Dict:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                send_message(sock, message)
+                response = recv_message(sock)
+            except OSError:
+                response = None
+            if response is not None:
+                break
+            sock.close()
+            self._local.sock = None
+            if attempt == 1:
+                raise ConnectionError(f"嵌入服务 {self.socket_path} 连接中断")
+        if "error" in response:
+            raise RuntimeError(f"嵌入服务出错: {response['error']}")
+        return response
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._request({"texts": list(texts)})["embeddings"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._request({"texts": [text]})["embeddings"][0]
+
+    def stats(self) -> Dict:
+        """嵌入服务的批处理统计"""
+        return self._request({"op": "stats"})
@@ -0,0 +1,251 @@
+"""
+知识库批量导入
+
+按流水线方式导入大量PDF：
+1. 进程池并行提取PDF文本；大文件按页段（kb_ingest_pages_per_task）拆成多个任务，同一文件的各段也并行提取
+2. 主进程按页序把各段文本送入该文件的流式分块器，切出的文档块依次装入固定大小的批，
+   每批向量化一次（嵌入模型只加载一份）；文件后面的页还在解析时，前面的文档块已经在向量化
+3. 后台线程把向量化好的批写入向量库，与下一批的向量化重叠；待写入的批数有上限
+
+提取中和已提取待分块的页段总数有上限，内存占用与文件大小和文件总数都无关。
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.services.rag_service import RAGService, StreamingTextSplitter, iter_pdf_pages, open_pdf
+
+
+@dataclass
+class PageRange:
+    """进程池任务结果：PDF第 [start, end) 页的文本"""
+    path: str
+    start: int
+    end: int
+    pages: List[str]
+    page_count: int = 0
+    error: Optional[str] = None
+
+
+def extract_page_range(path: str, start: int, end: int) -> PageRange:
+    """进程池任务：提取一个PDF第 [start, end) 页的文本，同时返回总页数"""
+    try:
+        reader = open_pdf(path)
+        pages = list(iter_pdf_pages(reader, start, end))
+        return PageRange(path, start, start + len(pages), pages, len(reader.pages))
+    except Exception as e:
+        return PageRange(path, start, start, [], error=str(e))
+
+
+@dataclass
+class FileResult:
+    """一个文件的导入结果"""
+    source_file: str
+    path: str
+    pages: int = 0
+    chunks: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestStats:
+    """导入进度和吞吐"""
+    files_total: int
+    files_done: int = 0
+    files_failed: int = 0
+    files_empty: int = 0
+    pages: int = 0
+    chunks: int = 0  # 已写入向量库的文档块数
+    batches: int = 0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+    errors: List[str] = field(default_factory=list)
+    ingested: Dict[str, int] = field(default_factory=dict)  # 成功处理的文件路径 → 文档块数（无文本为 0）
+    failed: List[str] = field(default_factory=list)  # 失败的文件路径（其中已写入的部分文档块由调用方清除）
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        rate = self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+        remaining = ""
+        if 0 < self.files_done < self.files_total:
+            eta = self.elapsed / self.files_done * (self.files_total - self.files_done)
+            remaining = f"，预计剩余 {eta:.0f}s"
+        return (
+            f"文件 {self.files_done}/{self.files_total}，页 {self.pages}，文档块 {self.chunks}，"
+            f"{rate:.1f} 块/秒，已用 {self.elapsed:.0f}s{remaining}"
+        )
+
+
+class _Upserter:
+    """后台写入向量库；待写入的批数超过 max_pending 时 put 阻塞，控制内存"""
+
+    def __init__(self, rag: RAGService, stats: IngestStats, max_pending: int = 2):
+        self.rag = rag
+        self.stats = stats
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._loop, name="kb-upsert", daemon=True)
+        self._thread.start()
+
+    def put(self, batch: tuple) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(batch)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            if self._error is not None:
+                continue  # 出错后丢弃剩余的批，由 close/put 抛出
+            started = time.perf_counter()
+            try:
+                self.rag.upsert_chunks(*batch)
+            except BaseException as e:
+                self._error = e
+                continue
+            self.stats.upsert_seconds += time.perf_counter() - started
+            self.stats.chunks += len(batch[0])
+            self.stats.batches += 1
+
+
+class _FileStream:
+    """一个文件的流式分块状态：各页段可能乱序完成，按页序送入分块器"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.source_file = os.path.basename(path)
+        self.metadata = {"file_path": path, "file_size": os.path.getsize(path)}
+        self.splitter = StreamingTextSplitter()
+        self.page_count: Optional[int] = None
+        self.next_start = 0
+        self.held: Dict[int, PageRange] = {}  # 已提取、等待前面页段的页段
+        self.chunks = 0
+
+
+def ingest_pdfs(
+    rag: RAGService,
+    paths: Iterable[str],
+    workers: int = 0,
+    batch_size: int = 64,
+    on_progress: Optional[Callable[[IngestStats, FileResult], None]] = None,
+    pages_per_task: int = 50,
+) -> IngestStats:
+    """并行提取、流式分块、分批向量化并写入向量库，返回统计信息
+
+    文档块 ID 为 "{文件名}_{序号}"，与 RAGService.chunk_records 一致；流式导入时总块数未知，元数据中不含 total_chunks。
+    on_progress(stats, result) 在每个文件完成（或失败）时回调。
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    stats = IngestStats(files_total=len(paths))
+    upserter = _Upserter(rag, stats)
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict] = []
+
+    def flush():
+        started = time.perf_counter()
+        embeddings = rag.embed_documents(documents)
+        stats.embed_seconds += time.perf_counter() - started
+        upserter.put((ids[:], documents[:], metadatas[:], embeddings))
+        ids.clear(); documents.clear(); metadatas.clear()
+
+    def emit(stream: _FileStream, chunks: List[str]):
+        for chunk in chunks:
+            ids.append(f"{stream.source_file}_{stream.chunks}")
+            documents.append(chunk)
+            metadatas.append({"source_file": stream.source_file, "chunk_index": stream.chunks, **stream.metadata})
+            stream.chunks += 1
+            if len(ids) >= batch_size:
+                flush()
+
+    streams: Dict[str, _FileStream] = {}
+    ready: deque = deque()  # 已知页数的文件的剩余页段，优先于新文件提交
+    pending_paths = iter(paths)
+    held = 0
+
+    def next_task():
+        while ready:
+            task = ready.popleft()
+            if task[0] in streams:  # 已失败文件的剩余页段不再提取
+                return task
+        path = next(pending_paths, None)
+        if path is None:
+            return None
+        streams[path] = _FileStream(path)
+        return (path, 0, pages_per_task)
+
+    def finish(stream: _FileStream, error: Optional[str] = None):
+        nonlocal held
+        del streams[stream.path]
+        held -= len(stream.held)
+        stats.files_done += 1
+        if error:
+            stats.files_failed += 1
+            stats.failed.append(stream.path)
+            stats.errors.append(f"{stream.source_file}: {error}")
+        else:
+            if not stream.chunks:
+                stats.files_empty += 1
+            stats.ingested[stream.path] = stream.chunks
+        if on_progress is not None:
+            on_progress(stats, FileResult(stream.source_file, stream.path, stream.next_start, stream.chunks, error))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 提取中和等待分块的页段总数有上限：慢页段之后完成的页段不会无限堆积
+        limit = workers * 2
+        in_flight = set()
+        while True:
+            while len(in_flight) + held < limit:
+                task = next_task()
+                if task is None:
+                    break
+                in_flight.add(pool.submit(extract_page_range, *task))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                stream = streams.get(result.path)
+                if stream is None:
+                    continue
+                if result.error:
+                    finish(stream, result.error)
+                    continue
+                if result.start == 0:
+                    stream.page_count = result.page_count
+                    rest = [(stream.path, s, s + pages_per_task) for s in range(result.end, result.page_count, pages_per_task)]
+                    ready.extendleft(reversed(rest))
+                stream.held[result.start] = result
+                held += 1
+                while stream.next_start in stream.held:
+                    part = stream.held.pop(stream.next_start)
+                    held -= 1
+                    for page in part.pages:
+                        emit(stream, stream.splitter.feed(page + "\n"))
+                    stats.pages += len(part.pages)
+                    stream.next_start = part.end
+                if stream.next_start >= stream.page_count:
+                    emit(stream, stream.splitter.flush())
+                    finish(stream)
+    if ids:
+        flush()
+    upserter.close()
+    return stats
@@ -0,0 +1,117 @@
+"""
+知识库文件清单
+
+记录每个已导入PDF的 (文件名, 大小, 修改时间, 内容哈希, 文档块数)，使重复执行 init_knowledge_base 真正增量：
+- 大小和修改时间都未变化的文件只做一次 stat，不读取内容
+- 大小或修改时间变化但内容哈希相同（如重新复制）的文件只更新清单
+- 内容变化的文件重新导入并删除多出来的旧文档块
+- 已删除的文件从向量库中清除
+
+清单保存为 JSON（KB_MANIFEST_PATH），每次同步有变化时 revision 加一；
+RAGService.knowledge_base_version 包含 revision，文件被替换但文档块数不变时AI审查缓存也会失效。
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class FileEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    chunks: int
+
+
+@dataclass
+class SyncPlan:
+    """一次同步需要做的事"""
+    unchanged: List[str] = field(default_factory=list)  # 文件名
+    touched: Dict[str, FileEntry] = field(default_factory=dict)  # 内容未变、只需更新 stat 的文件
+    added: List[str] = field(default_factory=list)  # 文件路径
+    changed: List[str] = field(default_factory=list)  # 文件路径
+    removed: List[str] = field(default_factory=list)  # 文件名
+    pending: Dict[str, FileEntry] = field(default_factory=dict)  # 新增/修改的文件路径 → 本次的 stat 和哈希（文档块数待导入后填写）
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """分块读取计算文件哈希，内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeBaseManifest:
+    """已导入文件的清单（文件名 → FileEntry）"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.revision = 0
+        self.files: Dict[str, FileEntry] = {}
+        self.exists = self.path.exists()
+        if self.exists:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.revision = data.get("revision", 0)
+            self.files = {name: FileEntry(**entry) for name, entry in data.get("files", {}).items()}
+
+    def save(self) -> None:
+        """先写临时文件再替换，中途中断不会留下损坏的清单"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"revision": self.revision, "files": {name: asdict(e) for name, e in sorted(self.files.items())}}
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def plan(self, paths: List[str], legacy: Optional[Dict[str, Tuple[int, int]]] = None) -> SyncPlan:
+        """对比当前文件与清单
+
+        legacy 为引入清单之前已导入的文件（文件名 → (导入时的大小, 文档块数)）：首次同步时大小一致的
+        文件视为未变化并记入清单，避免把整个知识库重新导入一遍。
+        """
+        plan = SyncPlan()
+        seen = set()
+        for path in paths:
+            name = os.path.basename(path)
+            seen.add(name)
+            st = os.stat(path)
+            entry = self.files.get(name)
+            if entry is not None and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                plan.unchanged.append(name)
+                continue
+            sha = file_sha256(path)
+            if entry is None and legacy and name in legacy and legacy[name][0] == st.st_size:
+                plan.touched[name] = FileEntry(st.st_size, st.st_mtime_ns, sha, legacy[name][1])
+            elif entry is not None and entry.sha256 == sha:
+                plan.touched[name] = FileEntry(st.st_size, st.st_mtime_ns, sha, entry.chunks)
+            else:
+                plan.pending[path] = FileEntry(st.st_size, st.st_mtime_ns, sha, 0)
+                (plan.changed if entry is not None else plan.added).append(path)
+        plan.removed = sorted(name for name in set(self.files) | set(legacy or {}) if name not in seen)
+        return plan
+
+
+_revision_cache: Tuple[Optional[int], int] = (None, 0)
+_revision_lock = threading.Lock()
+
+def manifest_revision(path: str) -> int:
+    """清单的 revision；清单文件未变化时不重新读取（按修改时间缓存）"""
+    global _revision_cache
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+    with _revision_lock:
+        cached_mtime, revision = _revision_cache
+        if cached_mtime != mtime_ns:
+            try:
+                revision = json.loads(Path(path).read_text(encoding="utf-8")).get("revision", 0)
+            except (OSError, ValueError):
+                return revision
+            _revision_cache = (mtime_ns, revision)
+        return revision
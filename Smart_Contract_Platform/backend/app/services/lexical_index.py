@@ -0,0 +1,145 @@
+"""
+知识库关键词索引（BM25）
+
+向量检索经常召回不到精确的法条编号（《民法典》第五百七十七条）和专门术语（履约保证金）。
+本模块在进程内为知识库文档块建立倒排索引，检索时与向量检索的结果按倒数排名融合（RRF）：
+- 分词：不依赖分词词典，中文按相邻两字（bigram）切分，连续的字母数字作为一个词；
+  "第五百七十七条"这类编号统一写成"第577条"并额外作为一个完整的词，中文数字和阿拉伯数字写法可以互相匹配
+- 评分：BM25；合同条款作为查询时很长，只使用区分度（idf）最高的 max_query_terms 个词
+- 内存：只保存文档块 ID、长度和倒排表（紧凑数组），不保存文本；检索结果的文本由调用方按 ID 从向量库读取
+"""
+import heapq
+import math
+import re
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+_NUMBERED_RE = re.compile(r"第([零〇一二两三四五六七八九十百千]+|\d+)([编章节条款项])")
+_NUMBERED_TOKEN_RE = re.compile(r"第\d+[编章节条款项]")
+_WORD_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+
+
+def chinese_number(text: str) -> int:
+    """中文数字转整数（一万以内，如 五百七十七、五百零六、十二）"""
+    total, digit = 0, 0
+    for ch in text:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        else:
+            total += (digit or 1) * _CN_UNITS[ch]
+            digit = 0
+    return total + digit
+
+
+def normalize_numbering(text: str) -> str:
+    """把 "第五百七十七条" 写成 "第577条"（编、章、节、条、款、项）"""
+    def repl(m):
+        number = m.group(1)
+        return f"第{number if number.isdigit() else chinese_number(number)}{m.group(2)}"
+    return _NUMBERED_RE.sub(repl, text)
+
+
+def tokenize(text: str) -> List[str]:
+    """编号词 + 字母数字词 + 中文 bigram（单字的中文片段保留单字）"""
+    text = normalize_numbering(text).lower()
+    tokens = _NUMBERED_TOKEN_RE.findall(text)
+    for m in _WORD_RE.finditer(text):
+        word = m.group()
+        if not ("一" <= word[0] <= "鿿"):
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 倒排索引（词 → 文档序号、词频）"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_query_terms: int = 64):
+        self.k1 = k1
+        self.b = b
+        self.max_query_terms = max_query_terms
+        self.ids: List[str] = []
+        self._lengths = array("I")
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str], **kwargs) -> "LexicalIndex":
+        index = cls(**kwargs)
+        for doc_id, document in zip(ids, documents):
+            index.add(doc_id, document or "")
+        return index
+
+    def add(self, doc_id: str, document: str) -> None:
+        doc = len(self.ids)
+        self.ids.append(doc_id)
+        counts = Counter(tokenize(document))
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("I"))
+            posting[0].append(doc)
+            posting[1].append(tf)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _idf(self, df: int) -> float:
+        n = len(self.ids)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, n: int = 20) -> List[Dict]:
+        """返回得分最高的 n 个文档块 [{"id", "score"}]（score 为 BM25 得分，不含文本）"""
+        if not self.ids:
+            return []
+        terms = [t for t in set(tokenize(query)) if t in self._postings]
+        terms = heapq.nlargest(self.max_query_terms, terms, key=lambda t: self._idf(len(self._postings[t][0])))
+        avg_length = self._total_length / len(self.ids) or 1.0
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+        for term in terms:
+            docs, tfs = self._postings[term]
+            idf = self._idf(len(docs))
+            for doc, tf in zip(docs, tfs):
+                norm = k1 * (1 - b + b * self._lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return [
+            {"id": self.ids[doc], "score": score}
+            for doc, score in heapq.nlargest(n, scores.items(), key=lambda kv: kv[1])
+        ]
+
+    def memory_bytes(self) -> int:
+        """倒排表、文档长度和 ID 占用内存的估计值（含 Python 对象开销）"""
+        total = sys.getsizeof(self._postings) + sys.getsizeof(self._lengths) + sys.getsizeof(self.ids)
+        for term, (docs, tfs) in self._postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(docs) + sys.getsizeof(tfs) + 64  # 64: 元组和字典项
+        return total + sum(sys.getsizeof(doc_id) for doc_id in self.ids)
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self.ids),
+            "terms": len(self._postings),
+            "memory_mb": round(self.memory_bytes() / 2**20, 1),
+        }
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """倒数排名融合：文档块得分为其在各路结果中 1 / (k + 名次) 之和，不依赖各路得分的量纲"""
+    scores: Dict[str, float] = {}
+    chunks: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, 1):
+            key = chunk["id"]
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+            chunks.setdefault(key, chunk)  # 排在前面的一路（向量检索）保留文本和 distance
+    return [chunks[key] for key in heapq.nlargest(top_k, scores, key=scores.get)]
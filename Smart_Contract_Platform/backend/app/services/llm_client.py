@@ -0,0 +1,212 @@
+"""
+大模型 HTTP 客户端
+
+AIReviewService 持有一个长期复用的实例：
+- 异步 httpx 客户端带连接池和 keep-alive，避免每次调用重新建立 TCP+TLS 连接
+- 并发上限（max_in_flight）：一个 asyncio.Semaphore，等待时挂起协程而不是轮询，批量审查时不会压垮上游
+- 客户端和信号量绑定第一次使用时的事件循环（AI审查任务执行器的事件循环），整个进程共用一份，
+  在其他事件循环中使用会抛出 RuntimeError；执行器关闭时调用 aclose 关闭连接池
+- 429/5xx 和网络错误按指数退避加随机抖动重试，优先遵循 Retry-After
+- 记录每次调用的耗时，用于观察吞吐和上游延迟
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CallMetrics:
+    """调用耗时统计（保留最近 window 次调用用于计算分位数）"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.in_flight = 0
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self._latencies.append(elapsed_ms)
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+            def pct(p: float) -> Optional[float]:
+                if not latencies:
+                    return None
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "in_flight": self.in_flight,
+                "avg_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p50_ms": pct(0.5),
+                "p95_ms": pct(0.95),
+                "max_ms": round(latencies[-1], 1) if latencies else None,
+            }
+
+
+class LLMHttpClient:
+    """带连接池、并发上限、重试和耗时统计的 HTTP 客户端"""
+
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        max_in_flight: int = 8,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        self.max_in_flight = max_in_flight
+        # httpx.AsyncClient 和 asyncio.Semaphore 绑定创建时的事件循环，只在这一个事件循环中创建和使用
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.metrics = CallMetrics()
+
+    def _bind(self) -> None:
+        """第一次使用时绑定当前事件循环；在其他事件循环中使用时报错（并发上限必须是进程级的）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is None:
+                self._loop = loop
+                self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+                self._async_semaphore = asyncio.Semaphore(self.max_in_flight)
+            elif self._loop is not loop:
+                raise RuntimeError("LLMHttpClient 只能在创建它的事件循环中使用（AI审查任务执行器的事件循环）")
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        self._bind()
+        return self._async_client
+
+    @property
+    def async_semaphore(self) -> asyncio.Semaphore:
+        self._bind()
+        return self._async_semaphore
+
+    async def aclose(self) -> None:
+        """关闭连接池并解除与事件循环的绑定（在绑定的事件循环中调用）"""
+        with self._lock:
+            client, self._async_client = self._async_client, None
+            self._loop = self._async_semaphore = None
+        if client is not None:
+            await client.aclose()
+
+    # ---- 并发上限：挂起等待，不占用事件循环 ----
+
+    @asynccontextmanager
+    async def _aslot(self):
+        async with self.async_semaphore:
+            self.metrics.enter()
+            try:
+                yield
+            finally:
+                self.metrics.leave()
+
+    # ---- 重试策略 ----
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """第 attempt 次重试前的等待秒数：指数退避 + 全抖动，Retry-After 优先"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.retry_max_delay)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    def _should_retry(self, attempt: int, response: Optional[httpx.Response]) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return response is None or response.status_code in RETRYABLE_STATUS
+
+    async def apost_json(self, url: str, headers: Dict, body: Dict) -> Dict:
+        """POST JSON 并返回解析后的响应；重试用尽后抛出 httpx 异常"""
+        attempt = 0
+        while True:
+            response = None
+            started = time.perf_counter()
+            try:
+                async with self._aslot():
+                    started = time.perf_counter()  # 不计排队等待时间
+                    response = await self.async_client.post(url, headers=headers, json=body)
+                    response.raise_for_status()
+                self.metrics.record((time.perf_counter() - started) * 1000, ok=True)
+                return response.json()
+            except (httpx.HTTPStatusError, httpx.TransportError):
+                self.metrics.record((time.perf_counter() - started) * 1000, ok=False)
+                if not self._should_retry(attempt, response):
+                    raise
+            self.metrics.record_retry()
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def astream_lines(self, url: str, headers: Dict, body: Dict) -> AsyncIterator[str]:
+        """流式 POST，逐行返回响应内容（用于 SSE 流式输出）
+
+        只在输出第一行之前重试；开始输出后连接中断直接抛出，重试会从头重新输出，调用方收到重复内容。
+        """
+        attempt = 0
+        yielded = False
+        while True:
+            started = time.perf_counter()
+            async with self._aslot():
+                started = time.perf_counter()
+                try:
+                    async with self.async_client.stream("POST", url, headers=headers, json=body) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            yielded = True
+                            yield line
+                    self.metrics.record((time.perf_counter() - started) * 1000, ok=True)
+                    return
+                except httpx.HTTPStatusError as e:
+                    self.metrics.record((time.perf_counter() - started) * 1000, ok=False)
+                    if not self._should_retry(attempt, e.response):
+                        raise
+                    delay = self._retry_delay(attempt, e.response)
+                except httpx.TransportError:
+                    self.metrics.record((time.perf_counter() - started) * 1000, ok=False)
+                    if yielded or not self._should_retry(attempt, None):
+                        raise
+                    delay = self._retry_delay(attempt, None)
+            self.metrics.record_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,125 @@
+"""
+审查提示词的 token 预算
+
+检索到的法律条款原来全部拼进提示词：相邻文档块有 150 字重叠，同一段法条经常出现两次，
+检索结果再长也照单全收。拼接前先：
+1. 去重：与已选片段高度重合（字 bigram 包含度 ≥ 0.8）的片段丢弃；同一文件中与已选片段首尾重叠的部分裁掉，
+   裁剪后剩余过短的片段丢弃
+2. 估算 token 数：按 DeepSeek 文档给出的换算比例，1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token
+3. 按模型的提示词预算依次放入法律条款，放不下的截断或舍弃；合同条款本身不截断
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+DEFAULT_PROMPT_TOKEN_BUDGET = 12000
+DEFAULT_MAX_OUTPUT_TOKENS = 4000
+
+_WIDE_RE = re.compile(r"[　-〿一-鿿＀-￯]")  # 中文标点、汉字、全角字符
+_SPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class ReviewPrompt:
+    """拼接好的审查提示词"""
+    text: str
+    prompt_tokens: int  # 估算值，含系统提示词
+    laws: List[Dict]  # 实际放入提示词的法律条款（已去重、裁剪）
+    duplicates: int = 0  # 去重丢弃的片段数
+    overlapped: int = 0  # 裁掉重叠部分后过短而丢弃的片段数
+    over_budget: int = 0  # 超出预算舍弃的片段数
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数（中文和全角字符按 0.6，其他字符按 0.3）"""
+    wide = len(_WIDE_RE.findall(text))
+    return math.ceil(wide * 0.6 + (len(text) - wide) * 0.3)
+
+
+def for_model(values: Dict[str, int], model: str, default: int) -> int:
+    """按模型取配置值：先找模型名，再找 default"""
+    return values.get(model) or values.get("default") or default
+
+
+def _bigrams(text: str) -> set:
+    text = _SPACE_RE.sub("", text)
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _overlap(head: str, tail: str, min_chars: int) -> int:
+    """head 的结尾与 tail 的开头重合的字符数（不足 min_chars 视为不重合）"""
+    probe = tail[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    start = head.find(probe)
+    while start >= 0:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(probe, start + 1)
+    return 0
+
+
+def dedupe_laws(laws: List[Dict], threshold: float = 0.8, min_chars: int = 20) -> Tuple[List[Dict], int, int]:
+    """去掉重复和重叠的法律条款片段，保持检索顺序
+
+    返回 (片段, 重复丢弃的片段数, 裁掉重叠部分后剩余不足 min_chars 而丢弃的片段数)。
+    未被裁剪的片段不论多短都保留（除非与已选片段重复）。
+    """
+    kept: List[Dict] = []
+    kept_grams: List[set] = []
+
+    def is_duplicate(text: str, grams: set) -> bool:
+        if not grams:  # 不足两个字，没有 bigram，只比较全文
+            return any(k["content"] == text for k in kept)
+        return any(len(grams & g) >= threshold * len(grams) for g in kept_grams)
+
+    duplicates = overlapped = 0
+    for law in laws:
+        original = content = law.get("content", "").strip()
+        if is_duplicate(content, _bigrams(content)):
+            duplicates += 1
+            continue
+        source = (law.get("metadata") or {}).get("source_file")
+        # 同一文件的相邻文档块：裁掉与已选片段重叠的开头或结尾
+        for other in kept:
+            if source and (other.get("metadata") or {}).get("source_file") == source:
+                n = _overlap(other["content"], content, min_chars)
+                if n:
+                    content = content[n:].strip()
+                n = _overlap(content, other["content"], min_chars)
+                if n:
+                    content = content[:-n].strip()
+        grams = _bigrams(content)
+        if content != original:
+            if len(content) < min_chars:
+                overlapped += 1
+                continue
+            if is_duplicate(content, grams):
+                duplicates += 1
+                continue
+        kept.append({**law, "content": content})
+        kept_grams.append(grams)
+    return kept, duplicates, overlapped
+
+
+def fit_laws(laws: List[Dict], available_tokens: int, format_law: Callable[[int, Dict], str],
+             min_tokens: int = 100) -> Tuple[List[Dict], int]:
+    """按顺序放入法律条款直到用完 available_tokens；最后一个放不下时剩余预算不少于 min_tokens 则截断放入
+
+    返回 (放入的片段, 舍弃的片段数)。
+    """
+    fitted: List[Dict] = []
+    remaining = available_tokens
+    for law in laws:
+        cost = estimate_tokens(format_law(len(fitted) + 1, law))
+        if cost <= remaining:
+            fitted.append(law)
+            remaining -= cost
+            continue
+        # 按中文 0.6 token/字 换算剩余预算能保留的字数
+        keep = int((remaining - (cost - estimate_tokens(law["content"]))) / 0.6)
+        if remaining >= min_tokens and keep > 0:
+            fitted.append({**law, "content": law["content"][:keep] + "……"})
+        break
+    return fitted, len(laws) - len(fitted)
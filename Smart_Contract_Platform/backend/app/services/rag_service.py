@@ -1,19 +1,113 @@
 """
 RAG知识库服务
 处理PDF文档、文本分块、向量化和检索
+
+chromadb、langchain、PyPDF2 及嵌入模型导入和加载都很慢，统一推迟到第一次创建 RAGService 时，
+API 进程启动时不导入这些依赖（见 scripts/bench_import_time.py）。
 """
 import os
+import copy
 import hashlib
-from typing import List, Dict, Optional
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional
 from pathlib import Path
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from PyPDF2 import PdfReader
-
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.services.embeddings import EmbeddingClient, load_local_embeddings
+from app.services.kb_manifest import file_sha256, manifest_revision
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.reranker import Reranker, load_cross_encoder
+
+
+def make_text_splitter():
+    """文本分割器（知识库导入的各进程使用相同的分块参数）"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    return RecursiveCharacterTextSplitter(
+        chunk_size=800,  # 每个块800字符
+        chunk_overlap=150,  # 重叠150字符
+        length_function=len,
+        separators=["\n\n", "\n", "。", "，", " ", ""]
+    )
+
+
+def open_pdf(pdf_path: str):
+    """打开PDF（只解析交叉引用表和页目录，页面内容在提取时才读取）"""
+    from PyPDF2 import PdfReader
+    
+    try:
+        return PdfReader(pdf_path)
+    except Exception as e:
+        raise Exception(f"PDF解析失败: {str(e)}")
+
+
+def iter_pdf_pages(reader, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """逐页提取文本（生成器）；没有文本层的页（扫描件、图片）返回空字符串"""
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+    for i in range(start, end):
+        try:
+            text = reader.pages[i].extract_text()
+        except Exception as e:
+            raise Exception(f"PDF解析失败（第 {i + 1} 页）: {str(e)}")
+        yield text or ""
+
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """从PDF文件提取全部文本（不依赖 RAGService，可在进程池中执行）"""
+    return "".join(page + "\n" for page in iter_pdf_pages(open_pdf(pdf_path)))
+
+
+class StreamingTextSplitter:
+    """流式分块：逐页输入文本，缓冲区攒够后切出已确定的文档块
+    
+    最后一个块可能被后续文本延长，留在缓冲区与后面的文本一起再切分，
+    因此内存只与 buffer_size 有关，与文档长度无关。
+    """
+    
+    def __init__(self, splitter=None, buffer_size: int = 8000):
+        self.splitter = splitter or make_text_splitter()
+        self.buffer_size = buffer_size
+        self._parts: List[str] = []
+        self._size = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """输入一段文本，返回已确定的文档块"""
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size < self.buffer_size:
+            return []
+        buffer = "".join(self._parts)
+        chunks = self.splitter.split_text(buffer)
+        if len(chunks) < 2:
+            self._parts = [buffer]
+            return []
+        # 从最后一个块在缓冲区中的起点保留剩余文本（保留其前后的空白和分隔符）
+        tail = chunks[-1]
+        start = buffer.rfind(tail)
+        rest = buffer[start:] if start >= 0 else tail
+        self._parts, self._size = [rest], len(rest)
+        return chunks[:-1]
+    
+    def flush(self) -> List[str]:
+        """输入结束，返回剩余的文档块"""
+        buffer = "".join(self._parts)
+        self._parts, self._size = [], 0
+        return self.splitter.split_text(buffer) if buffer.strip() else []
+
+
+def iter_pdf_chunks(pdf_path: str, splitter=None) -> Iterator[str]:
+    """边解析边分块：解析完前几页即可得到第一批文档块"""
+    stream = StreamingTextSplitter(splitter)
+    for page in iter_pdf_pages(open_pdf(pdf_path)):
+        yield from stream.feed(page + "\n")
+    yield from stream.flush()
+
+
+def normalize_query(query: str) -> str:
+    """合并空白，排版不同的相同条款使用同一个缓存项"""
+    return " ".join(query.split())
 
 
 class RAGService:
@@ -21,6 +115,40 @@ class RAGService:
     
     def __init__(self):
         """初始化RAG服务"""
+        self.collection = self._open_collection()
+        
+        # 初始化文本分割器
+        self.text_splitter = make_text_splitter()
+        
+        self.embeddings = self._load_embeddings()
+        self.reranker = self._load_reranker()
+        
+        # 查询向量缓存（规范化查询 → 向量）和检索结果缓存（(向量哈希, top_k) → 文档块）
+        self._embedding_cache = TTLCache(settings.rag_query_cache_size, None)
+        self._results_cache = TTLCache(settings.rag_query_cache_size, None)
+        self._results_kb_version: Optional[str] = None
+        
+        # 关键词索引（与向量库内容对应，文件清单 revision 变化后在后台线程重新构建）
+        self._lexical_index: Optional[LexicalIndex] = None
+        self._lexical_version: Optional[str] = None
+        self._lexical_building: Optional[threading.Thread] = None
+        self._lexical_lock = threading.Lock()
+    
+    def _open_collection(self):
+        """向量库：numpy 后端提供与 ChromaDB Collection 相同的接口（见 rag_vector_backend）"""
+        if settings.rag_vector_backend == "numpy":
+            from app.services.vector_index import NumpyVectorStore
+            
+            self.chroma_client = None
+            return NumpyVectorStore(
+                settings.rag_numpy_index_dir,
+                name="contract_law_knowledge",
+                dtype=settings.rag_numpy_dtype,
+            )
+        
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+        
         # 初始化ChromaDB客户端
         self.chroma_client = chromadb.PersistentClient(
             path=settings.chroma_db_path,
@@ -28,42 +156,41 @@ class RAGService:
         )
         
         # 获取或创建集合
-        self.collection = self.chroma_client.get_or_create_collection(
+        return self.chroma_client.get_or_create_collection(
             name="contract_law_knowledge",
             metadata={"description": "合同法律知识库"}
         )
-        
-        # 初始化文本分割器
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # 每个块800字符
-            chunk_overlap=150,  # 重叠150字符
-            length_function=len,
-            separators=["\n\n", "\n", "。", "，", " ", ""]
-        )
+    
+    @staticmethod
+    def _load_embeddings():
+        """配置了嵌入服务时由其统一计算（多个 worker 共用一份模型），否则在本进程加载"""
+        if settings.embedding_server_socket:
+            return EmbeddingClient(settings.embedding_server_socket)
         
         # 初始化嵌入模型（使用本地模型，避免额外API调用）
         # 注意：首次运行时会自动下载模型，可能需要一些时间
         try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
+            return load_local_embeddings()
         except Exception as e:
             print(f"警告：无法加载本地嵌入模型，将使用ChromaDB默认嵌入: {e}")
             print(f"提示：如果这是首次运行，请确保已安装 sentence-transformers 包")
-            self.embeddings = None
+            return None
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """从PDF文件提取文本"""
+    @staticmethod
+    def _load_reranker() -> Optional[Reranker]:
+        """开启 rag_rerank 时加载 cross-encoder；加载失败时不重排序"""
+        if not settings.rag_rerank:
+            return None
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            model = load_cross_encoder(settings.rag_rerank_model)
         except Exception as e:
-            raise Exception(f"PDF解析失败: {str(e)}")
+            print(f"警告：无法加载重排序模型，检索结果将不重排序: {e}")
+            return None
+        return Reranker(model, settings.rag_rerank_batch_size, settings.rag_rerank_budget_ms)
+    
+    def extract_text_from_pdf(self, pdf_path: str) -> str:
+        """从PDF文件提取文本"""
+        return extract_pdf_text(pdf_path)
     
     def split_text(self, text: str) -> List[str]:
         """将文本分割为块"""
@@ -71,37 +198,44 @@ class RAGService:
         return chunks
     
     def get_file_hash(self, file_path: str) -> str:
-        """计算文件哈希值，用于判断文件是否已处理"""
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        return file_hash
+        """计算文件内容哈希（分块读取）"""
+        return file_sha256(file_path)
     
     def is_file_processed(self, file_path: str) -> bool:
-        """检查文件是否已处理"""
-        file_hash = self.get_file_hash(file_path)
-        # 检查集合中是否已有该文件的元数据
+        """检查知识库中是否已有同名文件的文档块（不判断内容是否变化，增量同步见 kb_manifest）"""
         results = self.collection.get(
             where={"source_file": os.path.basename(file_path)},
             limit=1
         )
         return len(results['ids']) > 0
     
-    def add_document_to_knowledge_base(self, text: str, source_file: str, metadata: Optional[Dict] = None):
-        """将文档添加到知识库"""
-        # 分割文本
-        chunks = self.split_text(text)
-        
-        # 准备数据
+    def indexed_files(self) -> Dict[str, tuple[int, int]]:
+        """知识库中已有的文件：文件名 → (导入时的文件大小, 文档块数)"""
+        results = self.collection.get(where={"chunk_index": 0}, include=["metadatas"])
+        files = {}
+        for m in results["metadatas"]:
+            total = m.get("total_chunks")
+            if total is None:
+                # 流式导入的文档块不记录总块数，按文件统计
+                total = len(self.collection.get(where={"source_file": m["source_file"]}, include=[])["ids"])
+            files[m["source_file"]] = (m.get("file_size", -1), total)
+        return files
+    
+    def delete_file_chunks(self, source_file: str, start: int = 0, end: Optional[int] = None) -> None:
+        """删除文件的文档块；指定 start/end 时只删除该序号范围（文件更新后文档块变少时删除多出来的旧块）"""
+        if start == 0 and end is None:
+            self.collection.delete(where={"source_file": source_file})
+        elif end is not None and end > start:
+            self.collection.delete(ids=[f"{source_file}_{i}" for i in range(start, end)])
+        self._results_cache.clear()
+    
+    @staticmethod
+    def chunk_records(source_file: str, chunks: List[str], metadata: Optional[Dict] = None) -> tuple[List[str], List[Dict]]:
+        """文档块的 ID 和元数据"""
         ids = []
-        documents = []
         metadatas = []
-        embeddings = []
-        
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{source_file}_{i}"
-            ids.append(chunk_id)
-            documents.append(chunk)
-            
+        for i in range(len(chunks)):
+            ids.append(f"{source_file}_{i}")
             chunk_metadata = {
                 "source_file": source_file,
                 "chunk_index": i,
@@ -110,47 +244,126 @@ class RAGService:
             if metadata:
                 chunk_metadata.update(metadata)
             metadatas.append(chunk_metadata)
-        
-        # 如果有嵌入模型，生成嵌入向量
-        if self.embeddings:
-            embeddings_list = self.embeddings.embed_documents(documents)
-            embeddings = embeddings_list
-        
-        # 添加到ChromaDB
+        return ids, metadatas
+    
+    def embed_documents(self, documents: List[str]) -> Optional[List[List[float]]]:
+        """文档块向量化；没有嵌入模型时返回 None，由 ChromaDB 使用默认嵌入"""
+        if not self.embeddings:
+            return None
+        return self.embeddings.embed_documents(documents)
+    
+    def upsert_chunks(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: Optional[List[List[float]]] = None):
+        """写入一批文档块（ID 相同的块会被覆盖，重复导入是幂等的）"""
         if embeddings:
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas,
-                embeddings=embeddings
-            )
+            self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
         else:
             # 使用ChromaDB默认嵌入
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas
+            self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+        self._results_cache.clear()
+    
+    def add_document_to_knowledge_base(self, text: str, source_file: str, metadata: Optional[Dict] = None):
+        """将文档添加到知识库（按 kb_ingest_batch_size 分批向量化和写入）"""
+        # 分割文本
+        chunks = self.split_text(text)
+        ids, metadatas = self.chunk_records(source_file, chunks, metadata)
+        
+        batch_size = settings.kb_ingest_batch_size
+        for start in range(0, len(chunks), batch_size):
+            documents = chunks[start:start + batch_size]
+            self.upsert_chunks(
+                ids[start:start + batch_size],
+                documents,
+                metadatas[start:start + batch_size],
+                self.embed_documents(documents),
             )
         
         return len(chunks)
     
-    def search_relevant_chunks(self, query: str, top_k: int = 5) -> List[Dict]:
-        """搜索相关文档块"""
-        # 如果有嵌入模型，生成查询向量
-        query_embedding = None
-        if self.embeddings:
-            query_embedding = self.embeddings.embed_query(query)
+    def _embed_query(self, query: str) -> List[float]:
+        """查询向量化，按规范化后的查询文本缓存"""
+        embedding = self._embedding_cache.get(query)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self._embedding_cache.set(query, embedding)
+        return embedding
+    
+    def _results_cache_for(self, kb_version: str) -> TTLCache:
+        """检索结果缓存；知识库内容变化（包括其他进程导入文档）后清空"""
+        if kb_version != self._results_kb_version:
+            self._results_cache.clear()
+            self._results_kb_version = kb_version
+        return self._results_cache
+    
+    def lexical_version(self) -> str:
+        """关键词索引的版本：只随文件清单 revision（每次同步完成时加一）变化，导入过程中文档块数的变化不触发重建"""
+        return f"{self.collection.name}:{manifest_revision(settings.kb_manifest_path)}"
+    
+    def lexical_index(self, wait: bool = False) -> Optional[LexicalIndex]:
+        """关键词索引
         
-        # 执行搜索
+        首次使用或版本变化后在后台线程从向量库读取全部文档块构建，构建完成前继续使用旧索引（检索请求不等待）；
+        还没有索引时返回 None。wait 为 True 时等待构建完成（预热、基准测试、lexical 检索方式）。
+        """
+        version = self.lexical_version()
+        with self._lexical_lock:
+            if self._lexical_version != version and self._lexical_building is None:
+                self._lexical_building = threading.Thread(
+                    target=self._build_lexical_index, args=(version,), name="lexical-index", daemon=True
+                )
+                self._lexical_building.start()
+            building = self._lexical_building
+        if wait and building is not None:
+            building.join()
+        return self._lexical_index
+    
+    def _build_lexical_index(self, version: str) -> None:
+        try:
+            data = self.collection.get(include=["documents"])
+            index = LexicalIndex.build(data["ids"], data["documents"])
+        except Exception as e:
+            index = self._lexical_index  # 构建失败时保留旧索引，等到下一个版本再重建
+            print(f"警告：关键词索引构建失败: {e}")
+        with self._lexical_lock:
+            self._lexical_index = index
+            self._lexical_version = version
+            self._lexical_building = None
+    
+    def _lexical_search(self, query: str, n: int, wait: bool = False) -> Optional[List[Dict]]:
+        """关键词检索，只返回 id 和 score；还没有关键词索引时返回 None"""
+        index = self.lexical_index(wait)
+        return index.search(query, n) if index is not None else None
+    
+    def _hydrate(self, chunks: List[Dict]) -> List[Dict]:
+        """为关键词检索命中的文档块从向量库读取文本和元数据（已删除的文档块跳过）"""
+        missing = [c["id"] for c in chunks if "content" not in c]
+        if not missing:
+            return chunks
+        data = self.collection.get(ids=missing, include=["documents", "metadatas"])
+        found = {
+            doc_id: (document, metadata)
+            for doc_id, document, metadata in zip(data["ids"], data["documents"], data["metadatas"] or [{}] * len(data["ids"]))
+        }
+        hydrated = []
+        for chunk in chunks:
+            if "content" not in chunk:
+                if chunk["id"] not in found:
+                    continue
+                document, metadata = found[chunk["id"]]
+                chunk = {**chunk, "content": document, "metadata": metadata or {}, "distance": None}
+            hydrated.append(chunk)
+        return hydrated
+    
+    def _vector_search(self, query: str, query_embedding: Optional[List[float]], n: int) -> List[Dict]:
+        """向量检索"""
         if query_embedding:
             results = self.collection.query(
                 query_embeddings=[query_embedding],
-                n_results=top_k
+                n_results=n
             )
         else:
             results = self.collection.query(
                 query_texts=[query],
-                n_results=top_k
+                n_results=n
             )
         
         # 格式化结果
@@ -158,29 +371,123 @@ class RAGService:
         if results['ids'] and len(results['ids'][0]) > 0:
             for i in range(len(results['ids'][0])):
                 chunks.append({
+                    "id": results['ids'][0][i],
                     "content": results['documents'][0][i],
                     "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
                     "distance": results['distances'][0][i] if results['distances'] else None
                 })
+        return chunks
+    
+    def search(self, query: str, top_k: int = 5, mode: str = "hybrid",
+               query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """不经结果缓存的检索
+        
+        mode 为 vector、lexical 或 hybrid：hybrid 时向量检索和关键词检索各取 rag_hybrid_candidates 个候选，
+        按倒数排名融合后取前 top_k 个，精确的法条编号和术语不会因向量相似度不高而漏掉。
+        关键词索引尚未构建完成时 hybrid 退化为向量检索。
+        """
+        if query_embedding is None and self.embeddings and mode != "lexical":
+            query_embedding = self._embed_query(query)
+        if mode == "vector":
+            return self._vector_search(query, query_embedding, top_k)
+        n = max(top_k, settings.rag_hybrid_candidates)
+        lexical = self._lexical_search(query, n, wait=mode == "lexical")
+        if mode == "lexical":
+            return self._hydrate((lexical or [])[:top_k])
+        if lexical is None:
+            # 关键词索引尚在后台构建，暂时只用向量检索
+            return self._vector_search(query, query_embedding, top_k)
+        vector = self._vector_search(query, query_embedding, n)
+        return self._hydrate(reciprocal_rank_fusion([vector, lexical], top_k, settings.rag_rrf_k))
+    
+    def search_relevant_chunks(self, query: str, top_k: int = 5) -> List[Dict]:
+        """搜索相关文档块（检索方式见 rag_retrieval_mode，开启 rag_rerank 时再由 cross-encoder 重排序）
+        
+        常见条款（付款、违约金、质保等）几乎在每份合同中重复出现，
+        查询向量和检索结果都按 LRU 缓存，命中时不再向量化和查询向量库。
+        """
+        query = normalize_query(query)
+        mode = settings.rag_retrieval_mode
         
+        # 如果有嵌入模型，生成查询向量
+        query_embedding = None
+        if self.embeddings and mode != "lexical":
+            query_embedding = self._embed_query(query)
+        
+        kb_version = self.knowledge_base_version()
+        results_cache = self._results_cache_for(kb_version)
+        if query_embedding and mode == "vector":
+            cache_key = (kb_version, mode, self.reranker is not None, hashlib.sha1(array("d", query_embedding).tobytes()).hexdigest(), top_k)
+        else:
+            cache_key = (kb_version, mode, self.reranker is not None, query, top_k)
+        cached = results_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        # 关键词索引尚未构建或正在按新版本重建时的结果不缓存，重建完成后同一查询使用新索引
+        cacheable = mode == "vector" or self._lexical_version == self.lexical_version()
+        
+        # 执行搜索
+        if self.reranker is None:
+            chunks = self.search(query, top_k, mode, query_embedding)
+        else:
+            candidates = self.search(query, max(top_k, settings.rag_rerank_candidates), mode, query_embedding)
+            chunks, reranked = self.reranker.rerank(query, candidates, top_k)
+            # 超出预算时的检索顺序结果不缓存，负载下降后同一查询可以得到重排序的结果
+            cacheable = cacheable and reranked
+        if not cacheable:
+            return chunks
+        
+        results_cache.set(cache_key, copy.deepcopy(chunks))
         return chunks
     
+    def knowledge_base_version(self) -> str:
+        """知识库版本标识，文档增删或替换后随之变化（用于AI审查结果缓存键）"""
+        return f"{self.collection.name}:{self.collection.count()}:{manifest_revision(settings.kb_manifest_path)}"
+    
+    def warmup(self) -> None:
+        """预热：执行一次查询向量化，使嵌入模型完成加载，并构建关键词索引，避免第一次审查承担这部分耗时"""
+        if self.embeddings:
+            self.embeddings.embed_query("合同")
+        self.collection.count()
+        if settings.rag_retrieval_mode != "vector":
+            self.lexical_index(wait=True)
+        if self.reranker is not None:
+            self.reranker.warmup()
+    
     def get_knowledge_base_stats(self) -> Dict:
         """获取知识库统计信息"""
         count = self.collection.count()
         return {
             "total_chunks": count,
-            "collection_name": self.collection.name
+            "collection_name": self.collection.name,
+            "vector_backend": settings.rag_vector_backend,
+            "retrieval_mode": settings.rag_retrieval_mode,
+            "lexical_index": {
+                **(self._lexical_index.stats() if self._lexical_index is not None else {}),
+                "version": self._lexical_version,
+                "building": self._lexical_building is not None,
+            } if settings.rag_retrieval_mode != "vector" else None,
+            "rerank": self.reranker.stats() if self.reranker is not None else None,
+            "query_cache": {
+                "embeddings": self._embedding_cache.stats(),
+                "results": self._results_cache.stats(),
+            },
         }
 
 
 # 全局RAG服务实例
 _rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
 
 def get_rag_service() -> RAGService:
-    """获取RAG服务实例（单例模式）"""
+    """获取RAG服务实例（单例模式）
+
+    首次创建需要导入依赖并加载嵌入模型，耗时数秒，加锁避免并发请求重复创建。
+    """
     global _rag_service
     if _rag_service is None:
-        _rag_service = RAGService()
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
     return _rag_service
 
@@ -0,0 +1,95 @@
+"""
+检索结果重排序（cross-encoder）
+
+向量/关键词检索多取一些候选（rag_rerank_candidates），由 cross-encoder 逐对计算（合同条款, 文档块）的相关性，
+只把最相关的 top_k 个放进审查提示词：提示词更短、更相关，大模型的 token 数和耗时随之减少。
+
+CPU 上的 cross-encoder 耗时与候选数成正比，重排序有毫秒预算（rag_rerank_budget_ms）：
+- 按最近的实测单对耗时估算，预算内只能算少于 top_k 个候选时跳过重排序，直接使用检索顺序
+- 预算内算不完全部候选时只重排序排在前面的候选
+- 计算中超出预算（如模型被其他请求占用）时放弃本次结果，使用检索顺序
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+RERANK_MODEL_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # 多语言（含中文）的小型 cross-encoder
+
+
+def load_cross_encoder(model_name: str = RERANK_MODEL_NAME):
+    """在本进程加载 cross-encoder（首次运行时会自动下载模型）"""
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=512, device="cpu")
+
+
+class Reranker:
+    """带延迟预算的 cross-encoder 重排序"""
+
+    def __init__(self, model, batch_size: int = 16, budget_ms: float = 150, max_query_chars: int = 256):
+        self.model = model
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.max_query_chars = max_query_chars  # 合同条款可能很长，截断后再与文档块拼接，避免文档块被截掉
+        self._lock = threading.Lock()  # CPU 推理不并发，排队时间计入预算
+        self._pair_ms: Optional[float] = None  # 单对耗时的滑动平均
+        self.reranked = 0
+        self.skipped = 0  # 预估超出预算而跳过
+        self.timeouts = 0  # 排队或计算中超出预算
+        self.total_ms = 0.0
+
+    def rerank(self, query: str, candidates: List[Dict], top_k: int) -> Tuple[List[Dict], bool]:
+        """返回 (前 top_k 个文档块, 是否经过重排序)；未重排序时为检索顺序的前 top_k 个"""
+        if len(candidates) <= 1:
+            return candidates[:top_k], False
+        started = time.perf_counter()
+        fallback = candidates[:top_k]
+
+        n = len(candidates)
+        if self._pair_ms is not None:
+            n = min(n, int(self.budget_ms / max(self._pair_ms, 1e-3)))
+            if n < top_k:
+                # 预估的单对耗时随每次跳过衰减，负载下降后会重新尝试
+                self._pair_ms *= 0.9
+                self.skipped += 1
+                return fallback, False
+
+        if not self._lock.acquire(timeout=self.budget_ms / 1000):
+            self.timeouts += 1
+            return fallback, False
+        try:
+            query = query[:self.max_query_chars]
+            scores: List[float] = []
+            for start in range(0, n, self.batch_size):
+                if start and (time.perf_counter() - started) * 1000 > self.budget_ms:
+                    self.timeouts += 1
+                    return fallback, False
+                batch = candidates[start:start + self.batch_size][:n - start]
+                batch_started = time.perf_counter()
+                scores.extend(float(s) for s in self.model.predict([(query, c["content"]) for c in batch], batch_size=self.batch_size))
+                pair_ms = (time.perf_counter() - batch_started) * 1000 / len(batch)
+                self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+        finally:
+            self._lock.release()
+
+        order = sorted(range(n), key=lambda i: -scores[i])[:top_k]
+        self.reranked += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+        return [{**candidates[i], "rerank_score": scores[i]} for i in order], True
+
+    def warmup(self) -> None:
+        """执行一次推理，完成模型加载并得到单对耗时的初始估计"""
+        with self._lock:
+            started = time.perf_counter()
+            self.model.predict([("合同", "合同")] * self.batch_size, batch_size=self.batch_size)
+            self._pair_ms = (time.perf_counter() - started) * 1000 / self.batch_size
+
+    def stats(self) -> Dict:
+        return {
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.reranked, 1) if self.reranked else 0.0,
+            "pair_ms": round(self._pair_ms, 2) if self._pair_ms is not None else None,
+            "budget_ms": self.budget_ms,
+        }
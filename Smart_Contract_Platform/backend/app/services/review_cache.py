@@ -0,0 +1,158 @@
+"""
+AI审查结果缓存
+
+缓存键是 SHA-256(规范化条款, 模型, 提示词版本, 知识库版本)，内容相同的条款
+无论属于哪份合同、由谁发起，都直接复用上次的审查结果，不再检索和调用模型。
+结果保存在 ai_review_cache 表中，多个 worker 共享；按 TTL 过期、按最近使用时间淘汰。
+命中时只读数据库：命中次数和最近使用时间先在进程内累积，每 ai_review_cache_hit_flush_seconds 秒
+（或积累到 HIT_FLUSH_SIZE 个键）随下一次读写批量写入，避免每次命中都提交一次写事务。
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud.crud_ai_review import (
+    review_cache_get, review_cache_put, review_cache_touch, review_cache_evict, review_cache_totals,
+)
+
+# 累积的命中记录达到这么多个键时立即写入
+HIT_FLUSH_SIZE = 200
+
+_WHITESPACE = re.compile(r"[ \t　\xa0]+")
+
+
+def normalize_clauses(clauses: str) -> str:
+    """规范化条款文本：统一换行、合并空白、去掉空行，避免排版差异导致缓存不命中"""
+    lines = (_WHITESPACE.sub(" ", line).strip() for line in clauses.replace("\r\n", "\n").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def review_cache_key(clauses: str, model: str, prompt_version: str, kb_version: str) -> str:
+    payload = json.dumps([normalize_clauses(clauses), model, prompt_version, kb_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReviewCache:
+    """审查结果缓存，并统计本进程的命中情况"""
+
+    def __init__(self, ttl_hours: float, max_entries: int, hit_flush_seconds: float = 30):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.hit_flush_seconds = hit_flush_seconds
+        self._lock = threading.Lock()
+        self._pending_hits: Dict[str, tuple[int, datetime]] = {}  # 尚未写入数据库的命中
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0  # 命中缓存节省的模型耗时
+        self.saved_tokens = 0  # 命中缓存节省的 token
+        self._puts_since_evict = 0
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Dict]:
+        """读取缓存；等待其他进程写入结果时轮询读取，此时未命中不计入统计（count_miss=False）"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            entry = review_cache_get(db, key, fresh_after=now - self.ttl)
+            with self._lock:
+                if entry is None:
+                    if count_miss:
+                        self.misses += 1
+                    return None
+                self.hits += 1
+                self.saved_ms += entry.elapsed_ms
+                self.saved_tokens += entry.total_tokens
+                count, _ = self._pending_hits.get(key, (0, now))
+                self._pending_hits[key] = (count + 1, now)
+            result = json.loads(entry.result)
+            self._flush_hits(db)
+            return result
+        finally:
+            db.close()
+
+    def _flush_hits(self, db, force: bool = False) -> None:
+        """到期（或 force）时把累积的命中次数和最近使用时间写入数据库"""
+        with self._lock:
+            due = time.monotonic() - self._last_flush >= self.hit_flush_seconds or len(self._pending_hits) >= HIT_FLUSH_SIZE
+            if not self._pending_hits or not (force or due):
+                return
+            hits, self._pending_hits = self._pending_hits, {}
+            self._last_flush = time.monotonic()
+        try:
+            review_cache_touch(db, hits)
+        except Exception as e:
+            # 命中统计写入失败不影响读取缓存，放回后下次再写
+            db.rollback()
+            with self._lock:
+                for key, (count, last_used_at) in hits.items():
+                    pending, _ = self._pending_hits.get(key, (0, last_used_at))
+                    self._pending_hits[key] = (pending + count, last_used_at)
+            print(f"警告：写入AI审查缓存命中统计失败: {e}")
+
+    def flush(self) -> None:
+        """立即写入累积的命中统计（进程退出前调用）"""
+        db = SessionLocal()
+        try:
+            self._flush_hits(db, force=True)
+        finally:
+            db.close()
+
+    def put(self, key: str, result: Dict, elapsed_ms: int, total_tokens: int) -> None:
+        if result.get("error"):
+            return  # 失败结果不缓存
+        db = SessionLocal()
+        try:
+            review_cache_put(db, key, json.dumps(result, ensure_ascii=False), elapsed_ms, total_tokens)
+            with self._lock:
+                self._puts_since_evict += 1
+                evict = self._puts_since_evict >= 100
+                if evict:
+                    self._puts_since_evict = 0
+            self._flush_hits(db)
+            # 淘汰需要扫描整表，每写入一批再执行一次；淘汰按最近使用时间，先写入累积的命中
+            if evict:
+                self._flush_hits(db, force=True)
+                review_cache_evict(db, datetime.utcnow() - self.ttl, self.max_entries)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        db = SessionLocal()
+        try:
+            self._flush_hits(db, force=True)
+            totals = review_cache_totals(db)
+        finally:
+            db.close()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "process": {
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "saved_ms": self.saved_ms,
+                    "saved_tokens": self.saved_tokens,
+                },
+                "total": totals,
+            }
+
+
+# 全局缓存实例
+_review_cache: Optional[ReviewCache] = None
+
+def get_review_cache() -> ReviewCache:
+    """获取审查结果缓存实例（单例模式）"""
+    global _review_cache
+    if _review_cache is None:
+        _review_cache = ReviewCache(
+            ttl_hours=settings.ai_review_cache_ttl_hours,
+            max_entries=settings.ai_review_cache_max_entries,
+            hit_flush_seconds=settings.ai_review_cache_hit_flush_seconds,
+        )
+    return _review_cache
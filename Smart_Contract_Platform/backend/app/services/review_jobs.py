@@ -0,0 +1,343 @@
+"""
+AI审查后台任务执行器
+
+POST 接口只创建任务记录并提交到本模块，立即返回任务ID；
+审查在独立事件循环线程中异步执行，并发数由 ai_review_max_workers 限制；
+流式审查（SSE）也在该事件循环中执行并占用同一个并发名额，事件转交给接口所在的事件循环。
+任务状态、进度和结果写回 ai_review_jobs 表，因此任意 worker 都能查询。
+本进程持有的未完成任务（含排队中的）定期写心跳；worker 重启后遗留的任务没有心跳，
+由 review_jobs_fail_stale 标记为失败。
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud.crud_ai_review import (
+    review_job_update, review_jobs_heartbeat, review_jobs_fail_stale, review_batch_start, review_batch_record,
+)
+from app.crud.crud_audit import audit_add
+from app.services.review_cache import normalize_clauses
+
+# 批量审查每完成多少份合同写一次数据库
+BATCH_FLUSH_SIZE = 20
+
+
+def group_identical_clauses(items: list[tuple[int, str]]) -> list[tuple[str, list[int]]]:
+    """把条款内容相同（忽略空白差异）的合同归为一组，每组只需审查一次
+
+    items 为 [(contract_id, clauses)]，返回 [(clauses, [contract_id, ...])]，保持首次出现的顺序。
+    """
+    groups: dict[str, tuple[str, list[int]]] = {}
+    for contract_id, clauses in items:
+        digest = hashlib.sha256(normalize_clauses(clauses).encode("utf-8")).hexdigest()
+        groups.setdefault(digest, (clauses, []))[1].append(contract_id)
+    return list(groups.values())
+
+
+def _error_result(e: Exception) -> dict:
+    return {"issues": [], "suggestions": [], "compliance_score": 0.0, "reviewed_sections": [], "error": str(e)}
+
+
+def _finished_job_fields(result: dict) -> dict:
+    """任务完成时要写入的字段"""
+    error = result.get("error")
+    return {
+        "status": "FAILED" if error else "SUCCEEDED",
+        "progress": 100,
+        "stage": "审查失败" if error else "审查完成",
+        "result": json.dumps(result, ensure_ascii=False),
+        "error": error[:1000] if error else None,
+        "finished_at": datetime.utcnow(),
+    }
+
+
+def _audit_detail(result: dict) -> str:
+    return f"AI审查合同条款，合规性评分: {result.get('compliance_score', 0.0)}"
+
+
+def fail_stale_jobs(job_id: Optional[int] = None, batch_id: Optional[int] = None) -> int:
+    """把超过 ai_review_job_stale_seconds 没有心跳的未完成任务标记为失败，返回标记的任务数"""
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ai_review_job_stale_seconds)
+        return review_jobs_fail_stale(db, stale_before, job_id=job_id, batch_id=batch_id)
+    finally:
+        db.close()
+
+
+class ReviewJobRunner:
+    """在后台事件循环中执行AI审查任务的有界工作池"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._active: set[int] = set()  # 本进程持有的未完成任务ID（只在事件循环线程中修改）
+        self._closers: list[Callable[[], Awaitable[None]]] = []  # 关闭时在事件循环中执行（如关闭连接池）
+
+    def start(self) -> None:
+        """启动后台事件循环（重复调用无副作用）"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._semaphore = asyncio.Semaphore(self.max_workers)
+                loop.create_task(self._heartbeat())
+                started.set()
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="ai-review-jobs", daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+
+    def on_shutdown(self, close: Callable[[], Awaitable[None]]) -> None:
+        """注册关闭时在事件循环中执行的清理函数（绑定该事件循环的资源，如 HTTP 连接池）"""
+        self._closers.append(close)
+
+    def shutdown(self) -> None:
+        """执行清理函数、取消未完成的审查后停止事件循环（未完成的任务由 review_jobs_fail_stale 处理）"""
+        with self._lock:
+            if self._loop is None:
+                return
+            loop = self._loop
+            try:
+                asyncio.run_coroutine_threadsafe(self._aclose(), loop).result(timeout=5)
+            except Exception as e:
+                print(f"警告：AI审查任务执行器关闭时清理失败: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+            if not self._thread.is_alive():
+                loop.close()
+            self._loop = None
+            self._thread = None
+
+    async def _aclose(self) -> None:
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for close in self._closers:
+            await close()
+
+    def run_coroutine(self, coro) -> Future:
+        """把协程提交到后台事件循环执行"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def submit(
+        self, job_id: int, contract_id: int, clauses: str, actor: str,
+        use_cache: bool = True, chunked: Optional[bool] = None,
+    ) -> Future:
+        """提交审查任务，返回 concurrent.futures.Future（结果为审查结果字典）"""
+        return self.run_coroutine(self._run(job_id, contract_id, clauses, actor, use_cache, chunked))
+
+    async def _run(
+        self, job_id: int, contract_id: int, clauses: str, actor: str,
+        use_cache: bool = True, chunked: Optional[bool] = None,
+    ) -> dict:
+        self._active.add(job_id)
+        try:
+            return await self._run_job(job_id, contract_id, clauses, actor, use_cache, chunked)
+        finally:
+            self._active.discard(job_id)
+
+    async def _run_job(
+        self, job_id: int, contract_id: int, clauses: str, actor: str,
+        use_cache: bool, chunked: Optional[bool],
+    ) -> dict:
+        async with self._semaphore:
+            await self._update(job_id, status="RUNNING", started_at=datetime.utcnow(), progress=5, stage="开始审查")
+
+            async def on_progress(progress: int, stage: str):
+                await self._update(job_id, progress=progress, stage=stage)
+
+            try:
+                # 延迟导入：AI服务依赖较重，只在真正执行审查时加载
+                from app.services.ai_review import get_ai_review_service
+                result = await get_ai_review_service().areview_contract(
+                    clauses, on_progress=on_progress, use_cache=use_cache, chunked=chunked
+                )
+            except Exception as e:
+                result = _error_result(e)
+
+            await asyncio.to_thread(self._finish, job_id, contract_id, actor, result)
+            return result
+
+    async def stream_review(
+        self, clauses: str, use_cache: bool = True, chunked: Optional[bool] = None,
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """在后台事件循环中流式审查，在调用方的事件循环中逐个产出 (事件类型, 数据)
+
+        与审查任务共用 ai_review_max_workers 并发上限，排队时先产出一个 status 事件；
+        调用方提前停止迭代（客户端断开）时取消后台的审查。
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def emit(item) -> None:
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, item)
+            except RuntimeError:
+                pass  # 调用方的事件循环已关闭
+
+        future = self.run_coroutine(self._stream(clauses, use_cache, chunked, emit))
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    async def _stream(self, clauses: str, use_cache: bool, chunked: Optional[bool], emit) -> None:
+        try:
+            if self._semaphore.locked():
+                emit(("status", {"stage": "排队等待审查"}))
+            async with self._semaphore:
+                from app.services.ai_review import get_ai_review_service
+                async for event in get_ai_review_service().astream_review(clauses, use_cache=use_cache, chunked=chunked):
+                    emit(event)
+        except Exception as e:
+            emit(("result", _error_result(e)))
+        finally:
+            emit(None)
+
+    async def _heartbeat(self) -> None:
+        """定期为本进程持有的未完成任务写心跳"""
+        while True:
+            await asyncio.sleep(settings.ai_review_job_heartbeat_seconds)
+            if not self._active:
+                continue
+            try:
+                await asyncio.to_thread(self._heartbeat_sync, list(self._active))
+            except Exception as e:
+                print(f"警告：AI审查任务心跳写入失败: {e}")
+
+    @staticmethod
+    def _heartbeat_sync(job_ids: list[int]) -> None:
+        db = SessionLocal()
+        try:
+            review_jobs_heartbeat(db, job_ids, datetime.utcnow())
+        finally:
+            db.close()
+
+    async def _update(self, job_id: int, **fields) -> None:
+        await asyncio.to_thread(self._update_sync, job_id, fields)
+
+    @staticmethod
+    def _update_sync(job_id: int, fields: dict) -> None:
+        db = SessionLocal()
+        try:
+            review_job_update(db, job_id, **fields)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _finish(job_id: int, contract_id: int, actor: str, result: dict) -> None:
+        """在同一事务中写入任务结果和审计日志"""
+        db = SessionLocal()
+        try:
+            review_job_update(db, job_id, commit=False, **_finished_job_fields(result))
+            audit_add(db, actor, "AI_REVIEW", "Contract", str(contract_id), _audit_detail(result), commit=False)
+            db.commit()
+        finally:
+            db.close()
+
+    # ---- 批量审查 ----
+
+    def submit_batch(
+        self, batch_id: int, groups: list[tuple[str, list[tuple[int, int]]]], actor: str,
+        use_cache: bool = True, chunked: Optional[bool] = None,
+    ) -> Future:
+        """提交批量审查
+
+        groups 为 [(clauses, [(job_id, contract_id), ...])]：条款相同的合同只审查一次，结果分发给组内所有任务。
+        各组与单个审查任务共用同一个并发上限；结果和审计日志每完成 BATCH_FLUSH_SIZE 份合同批量写入一次。
+        """
+        return self.run_coroutine(self._run_batch(batch_id, groups, actor, use_cache, chunked))
+
+    async def _run_batch(
+        self, batch_id: int, groups: list[tuple[str, list[tuple[int, int]]]], actor: str,
+        use_cache: bool, chunked: Optional[bool],
+    ) -> None:
+        from app.services.ai_review import get_ai_review_service
+        job_ids = [job_id for _, members in groups for job_id, _ in members]
+        self._active.update(job_ids)
+        pending: list[tuple[int, int, dict]] = []
+        flush_lock = asyncio.Lock()
+
+        async def flush(finished: bool = False):
+            async with flush_lock:
+                rows = pending[:]
+                pending.clear()
+                await asyncio.to_thread(self._batch_record, batch_id, actor, rows, finished)
+                self._active.difference_update(job_id for job_id, _, _ in rows)
+
+        async def review_group(clauses: str, members: list[tuple[int, int]]):
+            async with self._semaphore:
+                try:
+                    result = await get_ai_review_service().areview_contract(
+                        clauses, use_cache=use_cache, chunked=chunked
+                    )
+                except Exception as e:
+                    result = _error_result(e)
+            pending.extend((job_id, contract_id, result) for job_id, contract_id in members)
+            if len(pending) >= BATCH_FLUSH_SIZE:
+                await flush()
+
+        try:
+            await asyncio.to_thread(self._batch_start, batch_id)
+            await asyncio.gather(*(review_group(clauses, members) for clauses, members in groups))
+            await flush(finished=True)
+        finally:
+            self._active.difference_update(job_ids)
+
+    @staticmethod
+    def _batch_start(batch_id: int) -> None:
+        db = SessionLocal()
+        try:
+            review_batch_start(db, batch_id, datetime.utcnow())
+        finally:
+            db.close()
+
+    @staticmethod
+    def _batch_record(batch_id: int, actor: str, rows: list[tuple[int, int, dict]], finished: bool) -> None:
+        job_rows = [{"id": job_id, **_finished_job_fields(result)} for job_id, _, result in rows]
+        audit_rows = [
+            {
+                "actor": actor, "action": "AI_REVIEW", "entity_type": "Contract",
+                "entity_id": str(contract_id), "detail": _audit_detail(result),
+            }
+            for _, contract_id, result in rows
+        ]
+        db = SessionLocal()
+        try:
+            review_batch_record(db, batch_id, job_rows, audit_rows, finished=finished)
+        finally:
+            db.close()
+
+
+# 全局任务执行器实例
+_runner: Optional[ReviewJobRunner] = None
+
+def get_review_job_runner() -> ReviewJobRunner:
+    """获取AI审查任务执行器（单例模式）"""
+    global _runner
+    if _runner is None:
+        _runner = ReviewJobRunner(max_workers=settings.ai_review_max_workers)
+    return _runner
@@ -0,0 +1,113 @@
+"""
+相同审查请求合并（singleflight）
+
+两位法务同时打开同一份合同时，只应该付一次检索和模型调用的代价：
+- 进程内：同一个键同时只执行一次，其余调用等待同一个 Future
+- 跨进程：通过 ai_review_locks 表加锁，拿不到锁的 worker 轮询审查结果缓存，等持锁方写入后直接复用
+"""
+import asyncio
+import copy
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud.crud_ai_review import review_lock_acquire, review_lock_release, review_lock_held
+
+
+class SingleFlight:
+    """进程内的请求合并"""
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # 等待他人结果而未重复执行的调用次数
+
+    def begin(self, key: str) -> tuple[Future, bool]:
+        """返回 (Future, 是否由本次调用执行)"""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.shared += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            return fut, True
+
+    def finish(self, key: str, fut: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """执行方完成后调用，唤醒所有等待者（保存结果的副本，执行方之后修改结果不影响等待者）"""
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(copy.deepcopy(result))
+
+    def in_flight(self, key: str) -> Optional[Future]:
+        with self._lock:
+            return self._calls.get(key)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """执行 fn 或等待正在执行的同键调用，返回 (结果, 是否为共享结果)
+
+        共享结果是深拷贝，调用方可以放心修改。
+        """
+        fut, leader = self.begin(key)
+        if not leader:
+            return copy.deepcopy(await asyncio.wrap_future(fut)), True
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.finish(key, fut, error=e)
+            raise
+        self.finish(key, fut, result)
+        return result, False
+
+
+class ReviewLock:
+    """基于数据库的跨进程互斥锁，超时后自动失效（持锁进程崩溃时不会永久阻塞）"""
+
+    def __init__(self, ttl_seconds: float, poll_interval: float = 0.5):
+        self.ttl = ttl_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, key: str) -> bool:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            return review_lock_acquire(db, key, self.owner, now, now + timedelta(seconds=self.ttl))
+        finally:
+            db.close()
+
+    def release(self, key: str) -> None:
+        db = SessionLocal()
+        try:
+            review_lock_release(db, key, self.owner)
+        finally:
+            db.close()
+
+    def held(self, key: str) -> bool:
+        db = SessionLocal()
+        try:
+            return review_lock_held(db, key, datetime.utcnow())
+        finally:
+            db.close()
+
+
+# 全局实例
+review_flights = SingleFlight()  # 整份条款的审查
+section_flights = SingleFlight()  # 分段审查
+_review_lock: Optional[ReviewLock] = None
+
+def get_review_lock() -> ReviewLock:
+    """获取跨进程审查锁（单例模式）"""
+    global _review_lock
+    if _review_lock is None:
+        _review_lock = ReviewLock(ttl_seconds=settings.ai_review_lock_ttl_seconds)
+    return _review_lock
@@ -0,0 +1,73 @@
+"""
+流式审查结果的增量解析
+
+模型以流式方式逐段返回审查结果 JSON，本模块在文本到达的同时扫描 "issues" 数组，
+每当数组中的一个对象完整闭合就立即解析出来，不必等待整个 JSON 结束。
+"""
+import json
+from typing import Dict, List
+
+
+class IssueStreamParser:
+    """从逐步到达的 JSON 文本中提取 issues 数组里的完整对象"""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0  # 已扫描到的位置
+        self._in_issues = False  # 是否已进入 issues 数组
+        self._finished = False  # issues 数组是否已结束
+        self._depth = 0  # 当前 issue 对象内的花括号深度
+        self._start = -1  # 当前 issue 对象的起始位置
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Dict]:
+        """追加一段文本，返回本次新解析出的完整 issue"""
+        self.buffer += text
+        issues = []
+        if self._finished:
+            return issues
+        if not self._in_issues:
+            key = self.buffer.find('"issues"', self._pos)
+            if key < 0:
+                return issues
+            bracket = self.buffer.find("[", key)
+            if bracket < 0:
+                return issues
+            self._in_issues = True
+            self._pos = bracket + 1
+
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._start >= 0:
+                    try:
+                        issue = json.loads(buf[self._start:i + 1])
+                        if isinstance(issue, dict):
+                            issues.append(issue)
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = -1
+            elif ch == "]" and self._depth == 0:
+                self._finished = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+        return issues
@@ -0,0 +1,369 @@
+"""
+NumPy 内存映射向量索引（不依赖 ChromaDB 的检索后端）
+
+知识库只有几十万个 384 维向量，chromadb.PersistentClient 的启动耗时、SQLite 锁和每个进程各自的内存都不必要。
+RAG_VECTOR_BACKEND=numpy 时 RAGService 改用 NumpyVectorStore，它提供 RAGService 用到的 Collection 接口子集
+（name/count/get/upsert/delete/query，where 只支持字段相等），两种后端可以直接切换（切换后重新执行 init_knowledge_base）。
+
+存储（RAG_NUMPY_INDEX_DIR 下的 gen-N 目录，CURRENT 文件记录当前使用的目录）：
+- vectors.npy：归一化后的向量矩阵（float16 或 float32），各进程以只读方式内存映射，
+  所有 uvicorn worker 共用操作系统的页缓存，不各自占用内存
+- alive.npy：每行是否有效；覆盖和删除只把旧行标记为无效，不移动数据
+- offsets.npy + records.jsonl：每行的 ID、文本和元数据，检索时只读取命中的前 k 行
+
+只能有一个进程写入（init_knowledge_base）：新行先追加数据再改写 .npy 头中的行数，读取方看到的总是完整的行；
+无效行超过一半时把有效行重写到新的 gen 目录并切换 CURRENT；上一代目录保留到下一次压缩，
+快照打开时持有 records.jsonl 的句柄，压缩前打开的快照仍可继续读取。
+检索按块计算矩阵-向量乘积，每块用 argpartition 取前 k 个再合并，临时内存只与块大小有关。
+"""
+import json
+import os
+import shutil
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_HEADER_LEN = 128  # 固定长度的 .npy 头：追加数据后原地改写行数，数据起点不变
+
+
+def _write_npy_header(f, dtype: np.dtype, shape: Tuple[int, ...]) -> None:
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape})
+    header = header.ljust(_HEADER_LEN - 10 - 1) + "\n"
+    f.seek(0)
+    f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+class _NpyAppender:
+    """可追加行的 .npy 文件（np.load 可直接读取和内存映射）"""
+
+    def __init__(self, path: Path, dtype, row_shape: Tuple[int, ...] = ()):
+        """文件已存在时沿用其中的类型和行形状"""
+        self.path = path
+        if path.exists():
+            existing = np.load(path, mmap_mode="r")
+            self.dtype, self.row_shape, self.rows = existing.dtype, existing.shape[1:], existing.shape[0]
+        else:
+            self.dtype, self.row_shape, self.rows = np.dtype(dtype), tuple(row_shape), 0
+            with open(path, "wb") as f:
+                _write_npy_header(f, self.dtype, (0,) + self.row_shape)
+        self.row_nbytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+
+    def append(self, data: np.ndarray) -> None:
+        data = np.ascontiguousarray(data, dtype=self.dtype)
+        with open(self.path, "r+b") as f:
+            f.seek(_HEADER_LEN + self.rows * self.row_nbytes)
+            f.write(data.tobytes())
+            f.flush()
+            self.rows += len(data)
+            _write_npy_header(f, self.dtype, (self.rows,) + self.row_shape)
+
+    def write_at(self, rows: Sequence[int], value) -> None:
+        """原地改写若干行（alive 标记）"""
+        raw = np.asarray(value, dtype=self.dtype).tobytes()
+        with open(self.path, "r+b") as f:
+            for row in sorted(rows):
+                f.seek(_HEADER_LEN + row * self.row_nbytes)
+                f.write(raw)
+
+
+class _Snapshot:
+    """某一时刻的只读内存映射；文件变化后重新打开"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.alive = np.load(directory / "alive.npy", mmap_mode="r")
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        vectors_path = directory / "vectors.npy"
+        self.vectors = np.load(vectors_path, mmap_mode="r") if vectors_path.exists() else None
+        # alive 最后追加，行数以它为准
+        self.rows = min(len(self.alive), len(self.offsets), len(self.vectors) if self.vectors is not None else 0)
+        # 持有句柄而不是每次按路径打开：目录被压缩删除后，已打开的快照仍能读到文本
+        self._records = open(directory / "records.jsonl", "rb")
+        self._records_lock = threading.Lock()
+
+    def __del__(self):
+        records = getattr(self, "_records", None)
+        if records is not None:
+            records.close()
+
+    def _read(self, row: int) -> Dict:
+        start, end = self.offsets[row]
+        with self._records_lock:
+            self._records.seek(int(start))
+            data = self._records.read(int(end - start))
+        return json.loads(data)
+
+    def read_records(self, rows: Sequence[int]) -> List[Dict]:
+        return [self._read(row) for row in rows]
+
+    def iter_records(self) -> Iterator[Tuple[int, Dict]]:
+        """按行顺序读取全部有效行"""
+        for row in range(self.rows):
+            if self.alive[row]:
+                yield row, self._read(row)
+
+
+class NumpyVectorStore:
+    """内存映射的向量矩阵 + 元数据文件，接口与 chromadb 的 Collection 相同（RAGService 用到的部分）"""
+
+    def __init__(self, path: str, name: str = "contract_law_knowledge", dtype: str = "float16", block_rows: int = 8192):
+        self.root = Path(path)
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._snapshot_key = None
+        # 写入状态（只在写入进程中使用）
+        self._appenders: Optional[Dict[str, _NpyAppender]] = None
+        self._id_rows: Optional[Dict[str, int]] = None
+
+    # ---- 目录与快照 ----
+
+    def _current_dir(self) -> Optional[Path]:
+        try:
+            return self.root / (self.root / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+
+    def _snap(self) -> Optional[_Snapshot]:
+        directory = self._current_dir()
+        if directory is None:
+            return None
+        # alive.npy 的头（行数）最后写入，它变化说明有新的完整行（标记无效是原地修改，内存映射直接可见）
+        try:
+            with open(directory / "alive.npy", "rb") as f:
+                key = (directory.name, f.read(_HEADER_LEN))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if key != self._snapshot_key:
+                self._snapshot = _Snapshot(directory)
+                self._snapshot_key = key
+            return self._snapshot
+
+    # ---- 读取 ----
+
+    def count(self) -> int:
+        snap = self._snap()
+        return int(np.count_nonzero(snap.alive[:snap.rows])) if snap else 0
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None) -> Dict:
+        result = {"ids": [], "documents": [], "metadatas": []}
+        snap = self._snap()
+        if snap is None:
+            return result
+        if ids is not None:
+            id_rows = self._ids(snap)
+            rows = [id_rows[i] for i in ids if i in id_rows]
+            records = zip(rows, snap.read_records(rows))
+        else:
+            records = snap.iter_records()
+        for _, record in records:
+            metadata = record["metadata"]
+            if where and any(metadata.get(k) != v for k, v in where.items()):
+                continue
+            result["ids"].append(record["id"])
+            result["documents"].append(record["document"])
+            result["metadatas"].append(metadata)
+            if limit and len(result["ids"]) >= limit:
+                break
+        return result
+
+    def query(self, query_embeddings: Optional[List[List[float]]] = None, n_results: int = 10,
+              query_texts: Optional[List[str]] = None) -> Dict:
+        """余弦相似度最高的 n_results 行；distance 为单位向量的 L2 距离平方（与 ChromaDB 默认的 l2 一致）"""
+        if query_embeddings is None:
+            raise ValueError("numpy 向量索引需要查询向量（请安装嵌入模型或配置嵌入服务）")
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        snap = self._snap()
+        if snap is None or snap.vectors is None or snap.rows == 0 or n_results <= 0:
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+
+        # 按块计算 (块行数, 查询数) 的相似度，每块每个查询保留前 k 个候选
+        k = min(n_results, snap.rows)
+        cand_scores, cand_rows = [], []
+        for start in range(0, snap.rows, self.block_rows):
+            end = min(start + self.block_rows, snap.rows)
+            scores = np.asarray(snap.vectors[start:end], dtype=np.float32) @ queries.T
+            scores[~np.asarray(snap.alive[start:end], dtype=bool)] = -np.inf
+            kk = min(k, end - start)
+            top = np.argpartition(-scores, kk - 1, axis=0)[:kk]
+            cand_scores.append(np.take_along_axis(scores, top, axis=0))
+            cand_rows.append(top + start)
+        cand_scores = np.concatenate(cand_scores)
+        cand_rows = np.concatenate(cand_rows)
+
+        for q in range(len(queries)):
+            order = np.argsort(-cand_scores[:, q], kind="stable")[:k]
+            order = order[np.isfinite(cand_scores[order, q])]
+            rows = cand_rows[order, q].tolist()
+            records = snap.read_records(rows)
+            result["ids"].append([r["id"] for r in records])
+            result["documents"].append([r["document"] for r in records])
+            result["metadatas"].append([r["metadata"] for r in records])
+            result["distances"].append([float(max(0.0, 2 - 2 * s)) for s in cand_scores[order, q]])
+        return result
+
+    # ---- 写入 ----
+
+    def _ids(self, snap: _Snapshot) -> Dict[str, int]:
+        """ID → 行号（写入进程中首次使用时扫描一次，之后随写入更新）"""
+        if self._id_rows is None:
+            self._id_rows = {record["id"]: row for row, record in snap.iter_records()}
+        return self._id_rows
+
+    def _open_writer(self, dim: Optional[int]) -> Dict[str, _NpyAppender]:
+        if self._appenders is None:
+            directory = self._current_dir()
+            if directory is None:
+                directory = self.root / "gen-0"
+                directory.mkdir(parents=True, exist_ok=True)
+                (self.root / "CURRENT").write_text(directory.name)
+            self._appenders = self._appenders_for(directory, dim)
+        if "vectors" not in self._appenders and dim is not None:
+            self._appenders["vectors"] = _NpyAppender(self._appenders["alive"].path.parent / "vectors.npy", self.dtype, (dim,))
+        return self._appenders
+
+    def _appenders_for(self, directory: Path, dim: Optional[int]) -> Dict[str, _NpyAppender]:
+        (directory / "records.jsonl").touch()
+        appenders = {
+            "offsets": _NpyAppender(directory / "offsets.npy", np.int64, (2,)),
+            "alive": _NpyAppender(directory / "alive.npy", np.uint8),
+        }
+        vectors_path = directory / "vectors.npy"
+        if vectors_path.exists() or dim is not None:
+            dim = np.load(vectors_path, mmap_mode="r").shape[1] if vectors_path.exists() else dim
+            appenders["vectors"] = _NpyAppender(vectors_path, self.dtype, (dim,))
+        # 上次写入中断时其他文件可能比 alive 多出不完整的行，从 alive 的行数处继续写（覆盖多出的行）
+        for appender in appenders.values():
+            appender.rows = min(appender.rows, appenders["alive"].rows)
+        return appenders
+
+    def _append(self, appenders: Dict[str, _NpyAppender], ids, documents, metadatas, vectors) -> range:
+        """追加若干行：向量、文本、偏移，最后是 alive（读取方以 alive 的行数为准）"""
+        directory = appenders["alive"].path.parent
+        start = appenders["alive"].rows
+        records_path = directory / "records.jsonl"
+        offset = records_path.stat().st_size if records_path.exists() else 0
+        lines, offsets = [], []
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            line = (json.dumps({"id": doc_id, "document": document, "metadata": metadata or {}}, ensure_ascii=False) + "\n").encode("utf-8")
+            offsets.append((offset, offset + len(line)))
+            offset += len(line)
+            lines.append(line)
+        appenders["vectors"].append(vectors)
+        with open(records_path, "ab") as f:
+            f.write(b"".join(lines))
+        appenders["offsets"].append(np.asarray(offsets, dtype=np.int64).reshape(-1, 2))
+        appenders["alive"].append(np.ones(len(lines), dtype=np.uint8))
+        return range(start, start + len(lines))
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+               embeddings: Optional[List[List[float]]] = None) -> None:
+        """追加新行，同 ID 的旧行标记为无效"""
+        if embeddings is None:
+            raise ValueError("numpy 向量索引需要文档向量（请安装嵌入模型或配置嵌入服务）")
+        if not ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._write_lock:
+            appenders = self._open_writer(vectors.shape[1])
+            id_rows = self._ids(self._snap())
+            stale = [id_rows[i] for i in ids if i in id_rows]
+            rows = self._append(appenders, ids, documents, metadatas, vectors)
+            if stale:
+                appenders["alive"].write_at(stale, 0)
+            id_rows.update(zip(ids, rows))  # 同一批中重复的 ID 以最后一个为准
+            self._maybe_compact()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        snap = self._snap()
+        if snap is None:
+            return
+        with self._write_lock:
+            id_rows = self._ids(snap)
+            if ids is None:
+                ids = self.get(where=where)["ids"]
+            rows = [id_rows.pop(i) for i in ids if i in id_rows]
+            if rows:
+                self._open_writer(None)["alive"].write_at(rows, 0)
+                self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        snap = self._snap()
+        if snap is not None and snap.rows >= 1024 and self.count() * 2 < snap.rows:
+            self.compact()
+
+    def compact(self) -> None:
+        """只保留有效行，重写到新的 gen 目录后切换 CURRENT
+
+        旧目录保留到下一次压缩时才删除，其他进程在切换前读到的 CURRENT 仍然有效；
+        更早打开的快照持有 records.jsonl 的句柄，目录删除后也能继续读取。
+        """
+        with self._write_lock:
+            snap = self._snap()
+            if snap is not None:
+                self._compact(snap)
+
+    def _compact(self, snap: _Snapshot) -> None:
+        old = snap.directory
+        new = self.root / f"gen-{int(old.name.split('-')[1]) + 1}"
+        shutil.rmtree(new, ignore_errors=True)
+        new.mkdir(parents=True)
+        dim = snap.vectors.shape[1] if snap.vectors is not None else None
+        appenders = self._appenders_for(new, dim)
+        id_rows: Dict[str, int] = {}
+        batch: List[Tuple[int, Dict]] = []
+
+        def flush():
+            rows = [row for row, _ in batch]
+            records = [record for _, record in batch]
+            new_rows = self._append(
+                appenders, [r["id"] for r in records], [r["document"] for r in records],
+                [r["metadata"] for r in records], snap.vectors[rows],
+            )
+            id_rows.update(zip((r["id"] for r in records), new_rows))
+            batch.clear()
+
+        for item in snap.iter_records():
+            batch.append(item)
+            if len(batch) >= self.block_rows:
+                flush()
+        if batch:
+            flush()
+        tmp = self.root / "CURRENT.tmp"
+        tmp.write_text(new.name)
+        os.replace(tmp, self.root / "CURRENT")
+        self._appenders, self._id_rows = appenders, id_rows
+        # 只删除更早的目录；刚被替换的 old 留给仍在使用它的读取方
+        for directory in self.root.glob("gen-*"):
+            if directory not in (old, new):
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        snap = self._snap()
+        if snap is None:
+            return {"rows": 0, "alive": 0, "dtype": self.dtype.name}
+        return {
+            "directory": str(snap.directory),
+            "rows": snap.rows,
+            "alive": self.count(),
+            "dim": snap.vectors.shape[1] if snap.vectors is not None else None,
+            "dtype": self.dtype.name,
+        }
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
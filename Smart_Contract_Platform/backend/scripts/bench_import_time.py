@@ -0,0 +1,105 @@
+"""
+API 启动导入耗时基准测试
+用 python -X importtime 在子进程中导入 app.main，统计总导入耗时和耗时最多的模块，
+并检查 chromadb、langchain、PyPDF2 等AI依赖没有在启动时被导入（它们应在第一次AI审查时才加载）。
+
+用法：
+    python scripts/bench_import_time.py [--repeat 5] [--max-ms 3000]
+    python scripts/bench_import_time.py --baseline import_baseline.json --update-baseline  # 记录基线
+    python scripts/bench_import_time.py --baseline import_baseline.json --tolerance 0.2    # 超过基线 20% 视为退化
+
+出现以下情况时以退出码 1 结束，可直接用于 CI：
+- 启动时导入了 HEAVY_MODULES 中的任一模块
+- 导入耗时超过 --max-ms，或超过基线的 (1 + tolerance) 倍
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# 启动时不应导入的模块（顶层包名）
+HEAVY_MODULES = [
+    "chromadb",
+    "langchain",
+    "langchain_community",
+    "langchain_core",
+    "PyPDF2",
+    "sentence_transformers",
+    "transformers",
+    "torch",
+    "numpy",
+]
+
+
+def measure(target: str) -> tuple[float, dict[str, float]]:
+    """导入 target 一次，返回 (总耗时ms, {模块名: 累计耗时ms})"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {target} 失败：\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules[target], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 启动导入耗时基准测试")
+    parser.add_argument("--target", default="app.main", help="要导入的模块")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最小值以减少磁盘缓存等噪声")
+    parser.add_argument("--max-ms", type=float, default=3000, help="导入耗时上限（毫秒）")
+    parser.add_argument("--baseline", help="基线文件路径（JSON）")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="相对基线允许增加的比例")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--top", type=int, default=10, help="输出累计耗时最多的模块数")
+    args = parser.parse_args()
+
+    runs = [measure(args.target) for _ in range(args.repeat)]
+    best_ms, modules = min(runs, key=lambda r: r[0])
+    print(f"导入 {args.target}：最小 {best_ms:.1f} ms，各次 {', '.join(f'{ms:.0f}' for ms, _ in runs)} ms")
+
+    print(f"\n累计耗时最多的 {args.top} 个顶层包：")
+    top_level = {name: ms for name, ms in modules.items() if "." not in name and name != args.target}
+    for name, ms in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {ms:9.1f} ms  {name}")
+
+    failures = []
+    heavy = sorted(name for name in modules if name in HEAVY_MODULES)
+    if heavy:
+        failures.append(f"启动时导入了AI依赖：{', '.join(heavy)}（应推迟到第一次AI审查时导入）")
+    if best_ms > args.max_ms:
+        failures.append(f"导入耗时 {best_ms:.1f} ms 超过上限 {args.max_ms:.0f} ms")
+
+    if args.baseline:
+        baseline_path = Path(args.baseline)
+        if args.update_baseline:
+            baseline_path.write_text(json.dumps({"target": args.target, "ms": round(best_ms, 1)}, indent=2))
+            print(f"\n已更新基线：{baseline_path}")
+        elif baseline_path.exists():
+            baseline_ms = json.loads(baseline_path.read_text())["ms"]
+            limit = baseline_ms * (1 + args.tolerance)
+            print(f"\n基线 {baseline_ms:.1f} ms，允许上限 {limit:.1f} ms")
+            if best_ms > limit:
+                failures.append(f"导入耗时 {best_ms:.1f} ms 超过基线 {baseline_ms:.1f} ms 的 {1 + args.tolerance:.0%}")
+        else:
+            print(f"\n基线文件不存在：{baseline_path}（使用 --update-baseline 生成）")
+
+    if failures:
+        print("\n❌ 启动导入耗时退化：")
+        for f in failures:
+            print(f"  - {f}")
+        sys.exit(1)
+    print("\n✅ 启动导入检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+索引基准测试脚本
+在临时 SQLite 数据库中生成模拟数据，对 crud/* 中的热点查询分别在
+"迁移前（基线的单列索引，无复合索引）" 和 "执行 app.db.migrations.ensure_indexes 之后" 两种情况下
+输出查询计划（EXPLAIN QUERY PLAN）和平均耗时。
+
+用法：
+    python scripts/bench_indexes.py [--scale 1.0] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, text
+
+from app.db.base import Base
+from app.db.migrations import SUPERSEDED_INDEXES, ensure_indexes
+import app.models  # noqa: F401
+
+# 基础数据量（scale=1.0 时）
+BASE_ROWS = {
+    "contracts": 40_000,
+    "change_requests": 60_000,
+    "payment_requests": 60_000,
+    "audit_logs": 400_000,
+    "notifications": 120_000,
+    "quantity_records": 60_000,
+}
+
+NOW = datetime(2025, 12, 31)
+
+# 迁移前模型中的单列索引（迁移时被复合索引取代并删除）：索引名 -> (表, 列)
+BASELINE_INDEXES = {
+    "ix_contracts_contractor_org": ("contracts", "contractor_org"),
+    "ix_notifications_to_username": ("notifications", "to_username"),
+}
+assert set(BASELINE_INDEXES) == set(SUPERSEDED_INDEXES)
+
+# 超过该耗时（毫秒）的查询不再重复执行
+SLOW_QUERY_MS = 1000
+
+# (名称, 对应索引, SQL, 参数) —— 与 crud/* 生成的查询形状一致
+QUERIES = [
+    ("合同列表首页", "ix_contracts_created_at_id",
+     "SELECT * FROM contracts ORDER BY created_at DESC, id DESC LIMIT 50", {}),
+    ("合同按状态分页", "ix_contracts_status_created_at",
+     "SELECT * FROM contracts WHERE status = :s ORDER BY created_at DESC, id DESC LIMIT 50", {"s": "APPROVING"}),
+    ("承包方合同列表", "ix_contracts_contractor_org_created_at",
+     "SELECT * FROM contracts WHERE contractor_org = :c ORDER BY created_at DESC, id DESC LIMIT 50", {"c": "承包方7"}),
+    ("合同管理员按状态统计", "ix_contracts_created_by_status",
+     "SELECT status, count(id) FROM contracts WHERE created_by = :u GROUP BY status", {"u": "user3"}),
+    ("变更按状态分页", "ix_change_requests_status_created_at",
+     "SELECT * FROM change_requests WHERE status = :s ORDER BY created_at DESC, id DESC LIMIT 50", {"s": "APPROVING"}),
+    ("合同下的变更", "ix_change_requests_contract_id_created_at",
+     "SELECT * FROM change_requests WHERE contract_id = :cid ORDER BY created_at DESC, id DESC LIMIT 50", {"cid": 1234}),
+    ("承包方变更（半连接）", "ix_contracts_contractor_org_created_at + ix_change_requests_contract_id_created_at",
+     "SELECT count(id) FROM change_requests WHERE contract_id IN "
+     "(SELECT id FROM contracts WHERE contractor_org = :c)", {"c": "承包方7"}),
+    ("变更审批步骤", "ix_change_tasks_change_id_step_order",
+     "SELECT * FROM change_tasks WHERE change_id = :cid ORDER BY step_order", {"cid": 4321}),
+    ("按角色查待审批任务", "ix_change_tasks_assignee_role_status",
+     "SELECT * FROM change_tasks WHERE assignee_role = :r AND status = 'PENDING'", {"r": "OWNER_CONTRACT"}),
+    ("当前可审批任务（NOT EXISTS）", "ix_change_tasks_assignee_role_status + ix_change_tasks_change_id_step_order",
+     "SELECT t.* FROM change_tasks t JOIN change_requests c ON c.id = t.change_id "
+     "WHERE t.status = 'PENDING' AND t.assignee_role = :r AND c.status = 'APPROVING' AND NOT EXISTS "
+     "(SELECT 1 FROM change_tasks e WHERE e.change_id = t.change_id AND e.step_order < t.step_order "
+     "AND e.status != 'APPROVED') ORDER BY t.step_order", {"r": "OWNER_LEADER"}),
+    ("支付按状态分页", "ix_payment_requests_status_created_at",
+     "SELECT * FROM payment_requests WHERE status = :s ORDER BY created_at DESC, id DESC LIMIT 50", {"s": "FINANCE_REVIEW"}),
+    ("合同下的支付", "ix_payment_requests_contract_id_created_at",
+     "SELECT * FROM payment_requests WHERE contract_id = :cid ORDER BY created_at DESC, id DESC LIMIT 50", {"cid": 1234}),
+    ("本月已支付合计", "ix_payment_requests_status_created_at",
+     "SELECT coalesce(sum(amount), 0) FROM payment_requests WHERE status = 'PAID' AND created_at >= :d",
+     {"d": NOW.replace(day=1)}),
+    ("审计日志首页", "ix_audit_logs_created_at_id",
+     "SELECT * FROM audit_logs ORDER BY created_at DESC, id DESC LIMIT 50", {}),
+    ("今日操作数", "ix_audit_logs_created_at_id",
+     "SELECT count(id) FROM audit_logs WHERE created_at >= :d", {"d": NOW - timedelta(days=1)}),
+    ("对象操作记录", "ix_audit_logs_entity",
+     "SELECT * FROM audit_logs WHERE entity_type = 'Contract' AND entity_id = :e "
+     "ORDER BY created_at DESC, id DESC LIMIT 50", {"e": "1234"}),
+    ("用户通知列表", "ix_notifications_to_username_created_at",
+     "SELECT * FROM notifications WHERE to_username = :u ORDER BY created_at DESC, id DESC LIMIT 50", {"u": "user3"}),
+    ("合同工程量记录", "ix_quantity_records_contract_id_created_at",
+     "SELECT * FROM quantity_records WHERE contract_id = :cid ORDER BY created_at DESC", {"cid": 1234}),
+]
+
+
+def rand_time(rng: random.Random) -> datetime:
+    return NOW - timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+
+
+def populate(engine, scale: float, seed: int = 42):
+    """生成模拟数据"""
+    rng = random.Random(seed)
+    n = {k: max(1, int(v * scale)) for k, v in BASE_ROWS.items()}
+    users = [f"user{i}" for i in range(50)]
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO contracts (id, contract_no, contract_name, project_name, owner_org, contractor_org, "
+            "tender_price, contract_price, performance_bond, approved_budget, completion_ratio, paid_total, "
+            "status, created_by, created_at) VALUES (:id, :no, 'n', 'p', 'o', :org, 1, 1, 0.1, 2, :ratio, 0, "
+            ":status, :by, :at)"),
+            [{"id": i, "no": f"HT-{i}", "org": f"承包方{rng.randint(0, 199)}", "ratio": rng.random(),
+              "status": rng.choice(["DRAFT", "APPROVING", "ACTIVE", "ACTIVE", "ACTIVE", "ARCHIVED"]),
+              "by": rng.choice(users), "at": rand_time(rng)} for i in range(1, n["contracts"] + 1)])
+        changes = [{"id": i, "code": f"BQ-{i}", "cid": rng.randint(1, n["contracts"]),
+                    "status": rng.choice(["APPROVING", "APPROVED", "APPROVED", "APPROVED", "REJECTED"]),
+                    "at": rand_time(rng)} for i in range(1, n["change_requests"] + 1)]
+        conn.execute(text(
+            "INSERT INTO change_requests (id, code, contract_id, amount, reason, scope_desc, schedule_impact_days, "
+            "status, created_by, created_at) VALUES (:id, :code, :cid, 1000, 'r', 's', 0, :status, 'contractor', :at)"),
+            changes)
+        # 审批任务状态与变更状态一致：已通过的变更全部步骤 APPROVED，审批中的变更前若干步已通过
+        tasks = []
+        for ch in changes:
+            done = {"APPROVED": 3, "REJECTED": 1, "APPROVING": rng.randint(0, 2)}[ch["status"]]
+            for step, role in enumerate(["OWNER_CONTRACT", "OWNER_LEADER", "OWNER_LEADER"], start=1):
+                if step <= done:
+                    status = "APPROVED"
+                elif ch["status"] == "REJECTED" and step == done + 1:
+                    status = "REJECTED"
+                else:
+                    status = "PENDING"
+                tasks.append({"cid": ch["id"], "step": step, "role": role, "status": status})
+        conn.execute(text(
+            "INSERT INTO change_tasks (change_id, step_order, step_name, assignee_role, status) "
+            "VALUES (:cid, :step, 'step', :role, :status)"), tasks)
+        conn.execute(text(
+            "INSERT INTO payment_requests (id, code, contract_id, amount, purpose, progress_desc, period, status, "
+            "is_blocked, created_by, created_at) VALUES (:id, :code, :cid, :amt, 'p', 'd', '', :status, 0, "
+            "'contractor', :at)"),
+            [{"id": i, "code": f"ZF-{i}", "cid": rng.randint(1, n["contracts"]), "amt": rng.uniform(1e3, 1e6),
+              "status": rng.choice(["FINANCE_REVIEW", "PAID", "PAID", "REJECTED"]), "at": rand_time(rng)}
+             for i in range(1, n["payment_requests"] + 1)])
+        conn.execute(text(
+            "INSERT INTO audit_logs (actor, action, entity_type, entity_id, detail, created_at) "
+            "VALUES (:actor, 'UPDATE', :et, :eid, 'detail', :at)"),
+            [{"actor": rng.choice(users), "et": rng.choice(["Contract", "Change", "Payment"]),
+              "eid": str(rng.randint(1, n["contracts"])), "at": rand_time(rng)} for _ in range(n["audit_logs"])])
+        conn.execute(text(
+            "INSERT INTO notifications (to_username, title, content, is_read, created_at) "
+            "VALUES (:u, 't', 'c', 0, :at)"),
+            [{"u": rng.choice(users), "at": rand_time(rng)} for _ in range(n["notifications"])])
+        conn.execute(text(
+            "INSERT INTO quantity_records (contract_id, period, completion_ratio, completion_description, "
+            "created_by, created_at, sealed) VALUES (:cid, '2025-01', 0.5, 'd', 'supervisor', :at, 0)"),
+            [{"cid": rng.randint(1, n["contracts"]), "at": rand_time(rng)} for _ in range(n["quantity_records"])])
+    return n
+
+
+def restore_baseline_indexes(engine):
+    """删除模型中定义的复合索引并重建被它们取代的单列索引，还原迁移前的数据库"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if len(index.columns) > 1:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        for name, (table, column) in BASELINE_INDEXES.items():
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({column})"))
+        conn.execute(text("ANALYZE"))
+
+
+def measure(engine, repeat: int) -> list[tuple[str, float]]:
+    """返回每个查询的 (查询计划, 平均耗时毫秒)"""
+    results = []
+    with engine.connect() as conn:
+        for _, _, sql, params in QUERIES:
+            plan_rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+            plan = "; ".join(row[-1] for row in plan_rows)
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()  # 预热
+            warmup_ms = (time.perf_counter() - start) * 1000
+            if warmup_ms > SLOW_QUERY_MS:
+                # 无索引时个别查询是平方级的，只跑一次避免基准耗时过长
+                results.append((plan, warmup_ms))
+                continue
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            results.append((plan, (time.perf_counter() - start) * 1000 / repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="复合索引查询计划与耗时基准")
+    parser.add_argument("--scale", type=float, default=1.0, help="数据量倍数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询重复次数")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_indexes.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    restore_baseline_indexes(engine)
+
+    print("生成模拟数据...")
+    counts = populate(engine, args.scale)
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
+
+    before = measure(engine, args.repeat)
+    created = ensure_indexes(engine)
+    print(f"\n新建索引 {len(created)} 个")
+    after = measure(engine, args.repeat)
+
+    print()
+    for (name, index, _, _), (plan_b, ms_b), (plan_a, ms_a) in zip(QUERIES, before, after):
+        speedup = ms_b / ms_a if ms_a > 0 else float("inf")
+        print(f"■ {name}  [{index}]")
+        print(f"  迁移前 {ms_b:8.2f} ms  {plan_b}")
+        print(f"  迁移后 {ms_a:8.2f} ms  {plan_a}")
+        print(f"  加速比 {speedup:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
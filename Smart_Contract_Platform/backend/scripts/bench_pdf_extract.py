@@ -0,0 +1,110 @@
+"""
+PDF 文本提取与分块吞吐基准测试
+每种方式在独立子进程中执行，统计耗时、第一个文档块的延迟、页/秒、块/秒和峰值内存（RSS）：
+- whole：一次提取整份文本后再分块（流式分块之前的方式）
+- stream：逐页提取、流式分块（iter_pdf_chunks）
+- pipeline：kb_ingest 的进程池按页段并行提取 + 流式分块（不向量化、不写入向量库）
+
+建议使用一份上千页的法规汇编测试，流式方式的峰值内存应与页数基本无关。
+
+用法：
+    python scripts/bench_pdf_extract.py path/to/compendium.pdf [--modes whole,stream,pipeline] [--workers 4]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+class _NullRAG:
+    """只统计文档块，不向量化也不写入"""
+
+    def embed_documents(self, documents):
+        return None
+
+    def upsert_chunks(self, ids, documents, metadatas, embeddings=None):
+        pass
+
+
+def run_mode(mode: str, pdf: str, workers: int, pages_per_task: int) -> dict:
+    from app.services.rag_service import extract_pdf_text, iter_pdf_chunks, make_text_splitter, open_pdf
+
+    started = time.perf_counter()
+    first_chunk = None
+    chunks = 0
+    if mode == "whole":
+        text = extract_pdf_text(pdf)
+        for _ in make_text_splitter().split_text(text):
+            chunks += 1
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+    elif mode == "stream":
+        for _ in iter_pdf_chunks(pdf):
+            chunks += 1
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+    else:
+        from app.services.kb_ingest import ingest_pdfs
+
+        stats = ingest_pdfs(_NullRAG(), [pdf], workers=workers, batch_size=1, pages_per_task=pages_per_task)
+        if stats.errors:
+            raise RuntimeError(stats.errors[0])
+        chunks = stats.chunks
+    elapsed = time.perf_counter() - started
+    pages = len(open_pdf(pdf).pages)
+    # ru_maxrss 在 Linux 上单位为 KB；pipeline 方式的提取在子进程中执行，取各子进程中的最大值
+    rss_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "mode": mode,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "first_chunk_ms": round(first_chunk * 1000, 1) if first_chunk is not None else None,
+        "peak_rss_mb": round(rss_kb / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 文本提取与分块吞吐基准测试")
+    parser.add_argument("pdf", help="PDF 文件路径")
+    parser.add_argument("--modes", default="whole,stream,pipeline", help="逗号分隔：whole、stream、pipeline")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pipeline 方式的进程数")
+    parser.add_argument("--pages-per-task", type=int, default=50, help="pipeline 方式每个任务的页数")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, args.pdf, args.workers, args.pages_per_task)))
+        return
+
+    print(f"{'方式':<10}{'页数':>8}{'文档块':>8}{'耗时s':>9}{'首块ms':>10}{'页/秒':>9}{'块/秒':>9}{'峰值RSS MB':>12}")
+    for mode in args.modes.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, args.pdf, "--run-mode", mode,
+             "--workers", str(args.workers), "--pages-per-task", str(args.pages_per_task)],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{mode:<10}失败：{proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        first = f"{r['first_chunk_ms']:.1f}" if r["first_chunk_ms"] is not None else "-"
+        seconds = r["seconds"] or 1e-9
+        print(
+            f"{mode:<10}{r['pages']:>8}{r['chunks']:>8}{r['seconds']:>9.2f}{first:>10}"
+            f"{r['pages'] / seconds:>9.0f}{r['chunks'] / seconds:>9.0f}{r['peak_rss_mb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+知识库检索效果与延迟基准测试
+对标注集中的每条合同条款分别用 vector、lexical、hybrid 三种方式检索，统计 recall@k 和检索延迟。
+方式后加 "+rerank"（如 hybrid+rerank）时先取 rag_rerank_candidates 个候选，再由 cross-encoder 重排序取前 k 个。
+
+标注集为 JSON 列表，每项 {"query": 合同条款, "expect": [应召回的法条编号或关键文字]}；
+检索结果的前 k 个文档块中包含某个 expect（"第五百七十七条" 与 "第577条" 视为相同）即算召回该项。
+默认使用 scripts/retrieval_eval_sample.json（民法典合同编常见条款），需先用 init_knowledge_base.py 导入民法典。
+
+用法：
+    python scripts/bench_retrieval.py [--labels labels.json] [--k 5] [--modes vector,lexical,hybrid]
+    python scripts/bench_retrieval.py --modes hybrid,hybrid+rerank --rerank-budget-ms 0  # 0 表示不限预算
+
+延迟不含查询向量化（各方式共用预先计算好的查询向量），也不经检索结果缓存。
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.lexical_index import normalize_numbering
+from app.services.rag_service import get_rag_service, normalize_query
+from app.services.reranker import Reranker, load_cross_encoder
+
+DEFAULT_LABELS = Path(__file__).parent / "retrieval_eval_sample.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库检索效果与延迟基准测试")
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS), help="标注集路径（JSON）")
+    parser.add_argument("--k", type=int, default=5, help="取前 k 个检索结果")
+    parser.add_argument("--modes", default="vector,lexical,hybrid", help="逗号分隔：vector、lexical、hybrid，可加 +rerank")
+    parser.add_argument("--rerank-budget-ms", type=float, default=settings.rag_rerank_budget_ms, help="重排序预算（0 表示不限）")
+    args = parser.parse_args()
+
+    labels = json.loads(Path(args.labels).read_text(encoding="utf-8"))
+    rag = get_rag_service()
+    print(f"知识库文档块 {rag.collection.count()} 个，标注 {len(labels)} 条，k={args.k}")
+
+    started = time.perf_counter()
+    stats = rag.lexical_index(wait=True).stats()
+    print(f"关键词索引：{stats['documents']} 个文档块、{stats['terms']} 个词，约 {stats['memory_mb']} MB，构建 {time.perf_counter() - started:.2f}s\n")
+
+    queries = [normalize_query(item["query"]) for item in labels]
+    embeddings = [rag.embeddings.embed_query(q) if rag.embeddings else None for q in queries]
+
+    reranker = None
+    if any(mode.endswith("+rerank") for mode in args.modes.split(",")):
+        reranker = Reranker(
+            load_cross_encoder(settings.rag_rerank_model), settings.rag_rerank_batch_size,
+            args.rerank_budget_ms or float("inf"),
+        )
+        reranker.warmup()
+
+    print(f"{'方式':<16}{'recall@' + str(args.k):>10}{'全部召回':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in args.modes.split(","):
+        recalls, complete, latencies = [], 0, []
+        for item, query, embedding in zip(labels, queries, embeddings):
+            t0 = time.perf_counter()
+            if mode.endswith("+rerank"):
+                candidates = rag.search(query, max(args.k, settings.rag_rerank_candidates), mode[:-len("+rerank")], embedding)
+                chunks, _ = reranker.rerank(query, candidates, args.k)
+            else:
+                chunks = rag.search(query, args.k, mode, embedding)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            contents = [normalize_numbering(c["content"]) for c in chunks]
+            found = sum(any(normalize_numbering(e) in content for content in contents) for e in item["expect"])
+            recalls.append(found / len(item["expect"]))
+            complete += found == len(item["expect"])
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"{mode:<16}{statistics.mean(recalls):>10.3f}{complete:>7}/{len(labels):<3}"
+            f"{statistics.median(latencies):>10.1f}{p95:>10.1f}"
+        )
+    if reranker is not None:
+        print(f"\n重排序：{reranker.stats()}")
+
+
+if __name__ == "__main__":
+    main()
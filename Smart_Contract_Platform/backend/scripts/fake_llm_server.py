@@ -0,0 +1,148 @@
+"""
+本地模拟 DeepSeek（OpenAI 兼容）接口，用于在不调用真实模型的情况下联调和压测AI审查功能
+
+用法：
+    python scripts/fake_llm_server.py --port 8765 --delay 2
+    # 另一个终端
+    DEEPSEEK_API_BASE=http://127.0.0.1:8765 DEEPSEEK_API_KEY=fake uvicorn app.main:app
+
+接口：
+    POST /v1/chat/completions  返回固定格式的审查结果，每条"第X条"生成一个问题；支持 stream=true
+    GET  /stats                已处理的请求数，用于验证缓存、合并请求等是否生效
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARTICLE_PATTERN = re.compile(r"第[一二三四五六七八九十百千零〇\d]+条")
+
+
+class FakeLLMState:
+    def __init__(self, delay: float, fail_rate: float):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+
+def build_review(prompt: str) -> dict:
+    """根据提示词中的合同条款生成确定性的审查结果"""
+    clauses = prompt.split("待审查的合同条款：", 1)[-1].split("请按照以下JSON格式", 1)[0]
+    articles = list(dict.fromkeys(ARTICLE_PATTERN.findall(clauses))) or ["全文"]
+    issues = [
+        {
+            "type": "不完善",
+            "severity": "中",
+            "location": article,
+            "description": f"{article}约定不够明确",
+            "suggestion": f"建议细化{article}的权利义务",
+        }
+        for article in articles
+    ]
+    return {
+        "issues": issues,
+        "suggestions": ["建议补充争议解决条款"],
+        "compliance_score": max(0.0, 100.0 - 5 * len(issues)),
+        "reviewed_sections": articles,
+    }
+
+
+def make_handler(state: FakeLLMState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, {"requests": state.requests, "failures": state.failures})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/v1/chat/completions":
+                self._send_json(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            with state.lock:
+                state.requests += 1
+                fail = random.random() < state.fail_rate
+                if fail:
+                    state.failures += 1
+            if fail:
+                self._send_json(random.choice([429, 503]), {"error": "rate limited"})
+                return
+            prompt = body["messages"][-1]["content"]
+            content = json.dumps(build_review(prompt), ensure_ascii=False, indent=2)
+            usage = {
+                "prompt_tokens": len(prompt),
+                "completion_tokens": len(content),
+                "total_tokens": len(prompt) + len(content),
+            }
+            if body.get("stream"):
+                self._send_stream(content, usage)
+                return
+            time.sleep(state.delay)
+            self._send_json(200, {
+                "id": "fake",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+        def _send_stream(self, content: str, usage: dict):
+            """按 OpenAI 流式格式分片输出，delay 平均分摊到各个分片"""
+            pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for piece in pieces:
+                time.sleep(state.delay / len(pieces))
+                chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(port: int = 8765, delay: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """在后台线程启动模拟服务并返回 server，server.shutdown() 停止"""
+    state = FakeLLMState(delay, fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 DeepSeek 接口")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="每次响应前等待的秒数，模拟模型耗时")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 429/503 的比例（0~1）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(FakeLLMState(args.delay, args.fail_rate)))
+    print(f"模拟 DeepSeek 接口: http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
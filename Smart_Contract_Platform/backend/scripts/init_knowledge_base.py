@@ -1,7 +1,14 @@
 """
 知识库初始化脚本
 扫描PDF目录，解析PDF文件并构建向量数据库
+
+PDF 文本在进程池中按页段并行提取并流式分块，文档块按固定大小分批向量化和写入（见 app/services/kb_ingest.py）。
+重复执行是增量的：按文件清单（app/services/kb_manifest.py）只导入新增和修改过的文件，并清除已删除文件的文档块。
+
+用法：
+    python scripts/init_knowledge_base.py [--workers 8] [--batch-size 64] [--pages-per-task 50]
 """
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -11,9 +18,11 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.core.config import settings
 from app.services.rag_service import get_rag_service
+from app.services.kb_ingest import ingest_pdfs
+from app.services.kb_manifest import KnowledgeBaseManifest
 
 
-def init_knowledge_base():
+def init_knowledge_base(workers: int = 0, batch_size: int = 0, pages_per_task: int = 0):
     """初始化知识库"""
     print("开始初始化知识库...")
     
@@ -36,55 +45,88 @@ def init_knowledge_base():
     
     print(f"找到 {len(pdf_files)} 个PDF文件")
     
-    # 处理每个PDF文件
-    total_chunks = 0
-    for pdf_file in pdf_files:
-        file_name = pdf_file.name
-        file_path = str(pdf_file.absolute())
-        
-        print(f"\n处理文件: {file_name}")
-        
-        # 检查是否已处理
-        if rag_service.is_file_processed(file_path):
-            print(f"  文件已处理，跳过: {file_name}")
-            continue
-        
-        try:
-            # 提取文本
-            print(f"  正在提取文本...")
-            text = rag_service.extract_text_from_pdf(file_path)
-            
-            if not text or not text.strip():
-                print(f"  警告: 文件 {file_name} 未提取到文本，跳过")
-                continue
-            
-            print(f"  提取到 {len(text)} 个字符")
-            
-            # 添加到知识库
-            print(f"  正在添加到知识库...")
-            chunks_count = rag_service.add_document_to_knowledge_base(
-                text=text,
-                source_file=file_name,
-                metadata={
-                    "file_path": file_path,
-                    "file_size": os.path.getsize(file_path)
-                }
-            )
-            
-            total_chunks += chunks_count
-            print(f"  成功添加 {chunks_count} 个文档块")
-            
-        except Exception as e:
-            print(f"  错误: 处理文件 {file_name} 时出错: {str(e)}")
-            continue
+    # 对比文件清单：未变化的文件只做 stat 检查，不读取内容
+    manifest = KnowledgeBaseManifest(settings.kb_manifest_path)
+    if manifest.files and rag_service.collection.count() == 0:
+        # 清单中有文件而向量库是空的（如切换了 rag_vector_backend）：清单已失效，全部重新导入
+        print("向量库为空，忽略文件清单，重新导入全部文件")
+        manifest.files.clear()
+    # 首次使用清单时，把此前已导入且大小未变的文件直接记入清单
+    legacy = None if manifest.exists else rag_service.indexed_files()
+    plan = manifest.plan([str(f.absolute()) for f in pdf_files], legacy)
+    print(f"未变化 {len(plan.unchanged) + len(plan.touched)} 个，新增 {len(plan.added)} 个，"
+          f"修改 {len(plan.changed)} 个，已删除 {len(plan.removed)} 个")
+    
+    # 清除已删除文件的文档块
+    for name in plan.removed:
+        print(f"  清除已删除文件: {name}")
+        rag_service.delete_file_chunks(name)
+        manifest.files.pop(name, None)
+    manifest.files.update(plan.touched)
+    
+    pending = plan.added + plan.changed
+    if not pending:
+        if plan.removed:
+            manifest.revision += 1
+        manifest.save()
+        print("\n没有新增或修改的文件，知识库已是最新")
+        return
+    
+    workers = workers or settings.kb_ingest_workers
+    batch_size = batch_size or settings.kb_ingest_batch_size
+    pages_per_task = pages_per_task or settings.kb_ingest_pages_per_task
+    print(f"\n待处理 {len(pending)} 个文件（进程数 {workers or '自动'}，每批 {batch_size} 个文档块）")
+    
+    def on_progress(stats, result):
+        if result.error:
+            print(f"  错误: 处理文件 {result.source_file} 时出错: {result.error}")
+        elif not result.chunks:
+            print(f"  警告: 文件 {result.source_file} 未提取到文本，跳过")
+        else:
+            print(f"  {result.source_file}: {result.pages} 页，{result.chunks} 个文档块")
+        print(f"  [{stats.summary()}]")
+    
+    stats = ingest_pdfs(
+        rag_service, pending, workers=workers, batch_size=batch_size,
+        on_progress=on_progress, pages_per_task=pages_per_task,
+    )
+    
+    # 失败的文件在出错前可能已写入部分文档块：全部清除并移出清单，下次作为新增文件重试
+    for path in stats.failed:
+        name = os.path.basename(path)
+        rag_service.delete_file_chunks(name)
+        manifest.files.pop(name, None)
+    
+    # 修改过的文件：新文档块已按相同 ID 覆盖，删除多出来的旧块后记入清单
+    for path, chunks in stats.ingested.items():
+        name = os.path.basename(path)
+        old = manifest.files.get(name)
+        old_chunks = old.chunks if old else (legacy or {}).get(name, (0, 0))[1]
+        rag_service.delete_file_chunks(name, start=chunks, end=old_chunks)
+        entry = plan.pending[path]
+        entry.chunks = chunks
+        manifest.files[name] = entry
+    manifest.revision += 1
+    manifest.save()
     
     # 显示统计信息
-    stats = rag_service.get_knowledge_base_stats()
+    kb_stats = rag_service.get_knowledge_base_stats()
     print(f"\n知识库初始化完成！")
-    print(f"总文档块数: {stats['total_chunks']}")
-    print(f"本次新增: {total_chunks} 个文档块")
+    print(f"总文档块数: {kb_stats['total_chunks']}")
+    print(f"本次新增: {stats.chunks} 个文档块（{stats.files_done - stats.files_failed - stats.files_empty} 个文件，"
+          f"失败 {stats.files_failed} 个，无文本 {stats.files_empty} 个）")
+    print(f"耗时 {stats.elapsed:.1f}s，其中向量化 {stats.embed_seconds:.1f}s、写入 {stats.upsert_seconds:.1f}s，"
+          f"吞吐 {stats.chunks / stats.elapsed if stats.elapsed else 0:.1f} 块/秒")
 
 
-if __name__ == "__main__":
-    init_knowledge_base()
+def main():
+    parser = argparse.ArgumentParser(description="初始化AI知识库")
+    parser.add_argument("--workers", type=int, default=0, help="提取PDF文本的进程数（默认 KB_INGEST_WORKERS，0 为CPU核数）")
+    parser.add_argument("--batch-size", type=int, default=0, help="每批向量化和写入的文档块数（默认 KB_INGEST_BATCH_SIZE）")
+    parser.add_argument("--pages-per-task", type=int, default=0, help="每个提取任务的页数（默认 KB_INGEST_PAGES_PER_TASK）")
+    args = parser.parse_args()
+    init_knowledge_base(workers=args.workers, batch_size=args.batch_size, pages_per_task=args.pages_per_task)
+
 
+if __name__ == "__main__":
+    main()
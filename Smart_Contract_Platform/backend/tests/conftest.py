@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 从任意目录运行 pytest 时都能导入 app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import re
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.schemas.ai_review import ReviewResult
+import app.models  # noqa: F401
+from app.services import review_cache, singleflight
+from app.services.ai_review import AIReviewService
+from app.services.clause_sections import split_review_sections
+
+
+class FakeRAG:
+    def knowledge_base_version(self):
+        return "kb-1"
+
+    def search_relevant_chunks(self, query, top_k=5):
+        return [{"content": "第五百七十七条 当事人一方不履行合同义务的，应当承担违约责任。", "metadata": {"source_file": "民法典.pdf"}}]
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    # 缓存和锁在 asyncio.to_thread 的多个线程中并发访问数据库，每个线程需要各自的连接，用临时文件数据库
+    engine = create_engine(f"sqlite:///{tmp_path / 'review.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(review_cache, "SessionLocal", factory)
+    monkeypatch.setattr(singleflight, "SessionLocal", factory)
+    monkeypatch.setattr(review_cache, "_review_cache", None)
+    monkeypatch.setattr(singleflight, "_review_lock", None)
+
+    svc = AIReviewService.__new__(AIReviewService)
+    svc.model = "test-model"
+    svc.rag_service = FakeRAG()
+    svc.prompts = []
+
+    async def fake_call(prompt, usage=None):
+        svc.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        if usage is not None:
+            usage["total_tokens"] = usage.get("total_tokens", 0) + 100
+        # 模型把问题定位到所审条款的第一条
+        heading = re.search(r"待审查的合同条款：\n(第\d+条)?", prompt).group(1) or "第1条"
+        return json.dumps({
+            "issues": [{"type": "风险", "severity": "高", "location": heading, "description": "违约责任不明确", "suggestion": "明确违约金"}],
+            "suggestions": [], "compliance_score": 80,
+        }, ensure_ascii=False)
+
+    svc.acall_deepseek_api = fake_call
+    return svc
+
+
+def test_sync_wrapper_uses_async_path_and_cache(service):
+    result = service.review_contract("第一条 甲方应按期付款。")
+    assert result.get("error") is None
+    assert result["compliance_score"] == 80.0
+    assert result["prompt_tokens"] > 0
+    assert len(service.prompts) == 1
+
+    again = service.review_contract("第一条  甲方应按期付款。\n")
+    assert again["cached"] is True
+    assert len(service.prompts) == 1
+
+
+def test_result_reports_prompt_stats(service):
+    law = FakeRAG().search_relevant_chunks("")[0]
+    service.rag_service.search_relevant_chunks = lambda query, top_k=5: [law, dict(law)]
+    result = ReviewResult(**service.review_contract("第一条 甲方应按期付款。")).model_dump()
+    assert result["error"] is None
+    assert result["prompt_tokens"] > 0
+    assert result["duplicate_laws"] == 1
+    assert result["over_budget_laws"] == 0
+
+
+def test_concurrent_identical_reviews_call_model_once(service):
+    async def main():
+        return await asyncio.gather(*(service.areview_contract("第一条 甲方应按期付款。") for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert [r.get("error") for r in results] == [None] * 5
+    assert len(service.prompts) == 1
+    assert all(r["compliance_score"] == 80.0 for r in results)
+    assert sum(bool(r.get("cached")) for r in results) == 4
+
+
+def test_short_contract_is_reviewed_incrementally(service, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "ai_review_chunk_threshold_chars", 400)
+    bodies = [f"乙方应在第{i}个月完成对应工程节点，甲方在验收合格后十五日内支付该节点进度款。" for i in range(12)]
+
+    def text(items):
+        return "\n".join(f"第{i + 1}条 {body}" for i, body in enumerate(items))
+
+    first = asyncio.run(service.areview_contract(text(bodies)))
+    assert first.get("error") is None
+    calls = len(service.prompts)
+    assert calls > 1 and first["reused_sections"] == []
+
+    # 在开头插入一条：后面的条号全部后移，但只有插入位置所在的分段需要重新审查
+    service.prompts.clear()
+    second = asyncio.run(service.areview_contract(text(["合同价款为固定总价。"] + bodies)))
+    assert second.get("error") is None
+    assert len(service.prompts) == 1
+    assert len(second["reused_sections"]) == calls - 1
+    # 复用分段中问题的位置已换成新的条号
+    sections = split_review_sections(text(["合同价款为固定总价。"] + bodies), 400)
+    assert [i["location"] for i in second["issues"]] == [s.titles[0] for s in sections]
+
+
+def test_stream_review_streams_short_multi_article_contracts(service):
+    issue = {"type": "风险", "severity": "高", "location": "第一条", "description": "违约责任不明确", "suggestion": "明确违约金"}
+    output = json.dumps({"issues": [issue], "suggestions": [], "compliance_score": 70}, ensure_ascii=False)
+
+    async def fake_stream(prompt, usage=None):
+        service.prompts.append(prompt)
+        for i in range(0, len(output), 10):
+            yield output[i:i + 10]
+
+    service.astream_deepseek_api = fake_stream
+    lock = singleflight.get_review_lock()
+    release, released_in = lock.release, []
+
+    def record_release(key):
+        released_in.append(threading.current_thread())
+        release(key)
+
+    lock.release = record_release
+
+    async def collect():
+        return [e async for e in service.astream_review("第一条 甲方应按期付款。\n第二条 乙方应按期交付。")]
+
+    events = asyncio.run(collect())
+    kinds = [kind for kind, _ in events]
+    assert "delta" in kinds and "section" not in kinds
+    assert kinds.index("issue") < len(kinds) - 1 and kinds[-1] == "result"
+    assert events[-1][1].get("error") is None and events[-1][1]["compliance_score"] == 70.0
+    assert len(service.prompts) == 1
+    # 释放审查锁要提交数据库事务，不能在事件循环线程中执行
+    assert released_in and released_in[0] is not threading.main_thread()
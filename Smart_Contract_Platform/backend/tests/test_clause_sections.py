@@ -0,0 +1,90 @@
+from app.services.clause_sections import (
+    ClauseSection, group_sections, locate_issue, merge_section_results, relabel_result,
+    section_bodies, split_review_sections, split_sections,
+)
+
+
+def contract(bodies):
+    return "合同双方：甲方、乙方\n" + "\n".join(f"第{i + 1}条 {body}" for i, body in enumerate(bodies))
+
+
+BODIES = [f"条款内容{i}：乙方应在约定期限内完成第{i}项工作，甲方按进度付款，逾期按日支付违约金。" for i in range(40)]
+
+
+def test_split_sections_by_article_heading():
+    sections = split_sections("前言\n第一条 甲方\n  第二条 乙方\n第十二条 其他")
+    assert [s.title for s in sections] == ["前言", "第一条", "第二条", "第十二条"]
+    assert sections[2].text == "第二条 乙方"
+    assert split_sections("没有条号的条款") == [ClauseSection(title="全文", text="没有条号的条款")]
+    assert split_sections("   ") == []
+
+
+def test_groups_cover_all_articles_within_max_chars():
+    text = contract(BODIES)
+    sections = split_review_sections(text, max_chars=400)
+    assert len(sections) > 1
+    assert [t for s in sections for t in s.titles] == [s.title for s in split_sections(text)]
+    for s in sections:
+        assert len(s.text) <= 400 or len(s.titles) == 1
+
+
+def test_inserting_an_article_keeps_other_section_keys():
+    before = split_review_sections(contract(BODIES), max_chars=400)
+    after = split_review_sections(contract(BODIES[:5] + ["新增条款：乙方应购买工程一切险。"] + BODIES[5:]), max_chars=400)
+
+    keys_before = {section_bodies(s) for s in before}
+    keys_after = {section_bodies(s) for s in after}
+    changed = keys_after - keys_before
+    assert len(changed) == 1  # 只有新增条款所在的分段需要重新审查
+    assert len(keys_before - keys_after) == 1
+
+
+def test_section_bodies_ignore_article_numbers_and_whitespace():
+    a = ClauseSection(title="第1条至第2条", text="第1条 甲方付款\n第2条  乙方施工", articles=("第1条", "第2条"))
+    b = ClauseSection(title="第3条至第4条", text="第3条 甲方付款\n\n第4条 乙方施工 ", articles=("第3条", "第4条"))
+    assert section_bodies(a) == section_bodies(b)
+
+
+def test_relabel_result_maps_old_titles_once():
+    result = {"issues": [
+        {"location": "第2条第1款", "description": "与第3条矛盾", "suggestion": "修改第2条"},
+        "not a dict",
+    ]}
+    relabel_result(result, ["第2条", "第3条"], ["第3条", "第4条"])
+    issue = result["issues"][0]
+    assert issue["location"] == "第3条第1款"
+    assert issue["description"] == "与第4条矛盾"
+    assert issue["suggestion"] == "修改第3条"
+
+
+def test_relabel_prefers_longer_titles():
+    result = {"issues": [{"location": "第十二条", "description": "", "suggestion": ""}]}
+    relabel_result(result, ["第十条", "第十二条"], ["第十一条", "第十三条"])
+    assert result["issues"][0]["location"] == "第十三条"
+
+
+def test_locate_issue_prefixes_group_title_when_no_article_mentioned():
+    section = ClauseSection(title="第1条至第2条", text="", articles=("第1条", "第2条"))
+    assert locate_issue({"location": "第2条"}, section)["location"] == "第2条"
+    assert locate_issue({"location": "付款条款"}, section)["location"] == "第1条至第2条 付款条款"
+
+
+def test_merge_section_results():
+    sections = [ClauseSection("第1条", "a" * 100), ClauseSection("第2条", "b" * 300), ClauseSection("第3条", "c")]
+    results = [
+        {"issues": [{"location": "第1条", "description": "x"}], "suggestions": ["s1"], "compliance_score": 60},
+        {"issues": [{"location": "付款", "description": "y"}, {"location": "付款", "description": "y"}],
+         "suggestions": ["s1", "s2"], "compliance_score": 100},
+        {"error": "timeout"},
+    ]
+    merged = merge_section_results(sections, results)
+    assert [i["location"] for i in merged["issues"]] == ["第1条", "第2条 付款"]
+    assert merged["suggestions"] == ["s1", "s2"]
+    assert merged["compliance_score"] == 90.0
+    assert merged["reviewed_sections"] == ["第1条", "第2条"]
+    assert "1/3" in merged["error"] and "第3条" in merged["error"]
+
+
+def test_single_long_article_is_its_own_section():
+    sections = group_sections(split_sections("第一条 " + "长" * 1000 + "\n第二条 短"), max_chars=400)
+    assert sections[0].titles == ("第一条",)
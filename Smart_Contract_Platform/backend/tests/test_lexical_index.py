@@ -0,0 +1,101 @@
+import threading
+
+from app.services import rag_service
+from app.services.lexical_index import (
+    LexicalIndex, chinese_number, normalize_numbering, reciprocal_rank_fusion, tokenize,
+)
+from app.services.rag_service import RAGService
+
+
+def test_chinese_number():
+    assert chinese_number("五百七十七") == 577
+    assert chinese_number("五百零六") == 506
+    assert chinese_number("十二") == 12
+    assert chinese_number("两千") == 2000
+
+
+def test_normalize_numbering():
+    assert normalize_numbering("依据第五百七十七条和第十二章") == "依据第577条和第12章"
+    assert normalize_numbering("第577条") == "第577条"
+
+
+def test_tokenize_keeps_article_number_as_one_token():
+    tokens = tokenize("《民法典》第五百七十七条 ABC违约")
+    assert "第577条" in tokens
+    assert "abc" in tokens
+    assert {"民法", "法典", "违约"} <= set(tokens)
+    assert tokenize("甲") == ["甲"]
+
+
+def test_search_returns_ids_and_matches_either_numbering():
+    index = LexicalIndex.build(
+        ["a", "b", "c"],
+        ["第577条 当事人一方不履行合同义务的，应当承担违约责任。", "履约保证金不得超过合同金额的百分之十。", None],
+    )
+    results = index.search("依据第五百七十七条", 5)
+    assert [r["id"] for r in results] == ["a"]
+    assert set(results[0]) == {"id", "score"}
+    assert index.search("履约保证金", 1)[0]["id"] == "b"
+    assert index.search("无关词语", 5) == []
+    stats = index.stats()
+    assert stats["documents"] == 3 and stats["memory_mb"] >= 0
+    assert LexicalIndex().search("违约") == []
+
+
+def test_reciprocal_rank_fusion_keeps_first_ranking_fields():
+    vector = [{"id": "x", "content": "X", "distance": 0.1}, {"id": "y", "content": "Y", "distance": 0.2}]
+    lexical = [{"id": "y", "score": 3.0}, {"id": "z", "score": 1.0}]
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=3)
+    assert [c["id"] for c in fused] == ["y", "x", "z"]
+    assert fused[0]["content"] == "Y"  # 两路都命中时保留向量检索的文本
+
+
+class FakeCollection:
+    name = "kb"
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.release = threading.Event()
+        self.release.set()
+
+    def get(self, ids=None, include=None):
+        self.release.wait(5)
+        ids = [i for i in (ids or self.docs) if i in self.docs]
+        return {"ids": ids, "documents": [self.docs[i] for i in ids], "metadatas": [{"source_file": i} for i in ids]}
+
+
+def make_rag(monkeypatch, docs):
+    revision = {"value": 1}
+    monkeypatch.setattr(rag_service, "manifest_revision", lambda path: revision["value"])
+    rag = RAGService.__new__(RAGService)
+    rag.collection = FakeCollection(docs)
+    rag.embeddings = None
+    rag._lexical_index = None
+    rag._lexical_version = None
+    rag._lexical_building = None
+    rag._lexical_lock = threading.Lock()
+    return rag, revision
+
+
+def test_lexical_index_rebuilds_in_background_on_revision_change(monkeypatch):
+    rag, revision = make_rag(monkeypatch, {"a": "履约保证金条款"})
+    first = rag.lexical_index(wait=True)
+    assert first.ids == ["a"]
+    assert rag.lexical_index() is first  # revision 未变化不重建
+
+    rag.collection.docs["b"] = "违约责任条款"
+    rag.collection.release.clear()
+    revision["value"] = 2
+    assert rag.lexical_index() is first  # 重建期间继续使用旧索引
+    assert rag._lexical_building is not None
+    rag.collection.release.set()
+    assert rag.lexical_index(wait=True).ids == ["a", "b"]
+    assert rag._lexical_building is None
+
+
+def test_lexical_mode_hydrates_text_by_id(monkeypatch):
+    rag, _ = make_rag(monkeypatch, {"a": "履约保证金条款", "b": "违约责任条款"})
+    chunks = rag.search("违约责任", top_k=1, mode="lexical")
+    assert chunks[0]["id"] == "b"
+    assert chunks[0]["content"] == "违约责任条款"
+    assert chunks[0]["metadata"] == {"source_file": "b"}
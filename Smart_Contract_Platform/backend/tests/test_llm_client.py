@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm_client import LLMHttpClient
+
+
+def test_async_slots_respect_max_in_flight():
+    client = LLMHttpClient(max_in_flight=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with client._aslot():
+            peak = max(peak, client.metrics.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert client.metrics.in_flight == 0
+
+
+def test_client_and_semaphore_are_bound_to_one_event_loop():
+    client = LLMHttpClient(max_in_flight=2)
+
+    async def get():
+        return client.async_client, client.async_semaphore
+
+    async def reopen():
+        first, again = await get(), await get()
+        await client.aclose()
+        return first, again, await get()
+
+    first, again, reopened = asyncio.run(reopen())
+    assert first == again
+    assert reopened[0] is not first[0]  # aclose 之后重新创建
+    with pytest.raises(RuntimeError):
+        asyncio.run(get())  # 其他事件循环不能共用，也不会各建一个
+
+
+class FlakyStream(httpx.AsyncByteStream):
+    """先输出 lines，再按 fail 决定是否模拟连接中断"""
+
+    def __init__(self, lines, fail):
+        self.lines = lines
+        self.fail = fail
+
+    async def __aiter__(self):
+        for line in self.lines:
+            yield (line + "\n").encode()
+        if self.fail:
+            raise httpx.ReadError("connection reset")
+
+
+def stream_with(responses):
+    """依次返回 responses 中的响应（或抛出其中的异常）的客户端，以及请求计数"""
+    client = LLMHttpClient(max_retries=3, retry_base_delay=0)
+    calls = []
+
+    def handler(request):
+        item = responses[len(calls)]
+        calls.append(request)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def collect():
+        client._bind()
+        client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        lines = []
+        try:
+            async for line in client.astream_lines("http://llm/v1/chat/completions", {}, {}):
+                lines.append(line)
+        except httpx.TransportError as e:
+            return lines, e
+        return lines, None
+
+    lines, error = asyncio.run(collect())
+    return lines, error, calls, client
+
+
+def test_stream_retries_before_first_line():
+    lines, error, calls, client = stream_with([
+        httpx.ConnectError("refused"),
+        httpx.Response(503),
+        httpx.Response(200, stream=FlakyStream(["data: one", "data: two"], fail=False)),
+    ])
+    assert error is None
+    assert lines == ["data: one", "data: two"]
+    assert len(calls) == 3
+    assert client.metrics.retries == 2
+
+
+def test_stream_does_not_replay_after_output_started():
+    lines, error, calls, client = stream_with([
+        httpx.Response(200, stream=FlakyStream(["data: one", "data: two"], fail=True)),
+        httpx.Response(200, stream=FlakyStream(["data: one", "data: two", "data: three"], fail=False)),
+    ])
+    assert isinstance(error, httpx.ReadError)
+    assert lines == ["data: one", "data: two"]  # 不会从头重复输出
+    assert len(calls) == 1
+    assert client.metrics.retries == 0 and client.metrics.failures == 1
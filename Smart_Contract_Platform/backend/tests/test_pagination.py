@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+import app.models  # noqa: F401
+from app.core.deps import PageParams
+from app.crud.crud_audit import audit_add, audit_list
+from app.crud.pagination import DEFAULT_PAGE_SIZE, decode_cursor
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for i in range(DEFAULT_PAGE_SIZE + 5):
+        audit_add(session, "alice", "CREATE", "contract", str(i), "", commit=False)
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_lists_are_paged_by_default(db):
+    items, cursor = audit_list(db)
+    assert len(items) == DEFAULT_PAGE_SIZE and cursor is not None
+    rest, cursor = audit_list(db, after=decode_cursor(cursor))
+    assert len(rest) == 5 and cursor is None
+    assert {i.id for i in items}.isdisjoint(i.id for i in rest)
+
+    items, cursor = audit_list(db, limit=None)
+    assert len(items) == DEFAULT_PAGE_SIZE + 5 and cursor is None
+
+
+def test_page_params_require_explicit_opt_out():
+    assert PageParams(limit=DEFAULT_PAGE_SIZE).limit == DEFAULT_PAGE_SIZE
+    assert PageParams(limit=DEFAULT_PAGE_SIZE, paged=False).limit is None
@@ -0,0 +1,56 @@
+from app.services.prompt_budget import dedupe_laws, estimate_tokens, fit_laws, for_model
+
+ARTICLE = "第五百七十七条 当事人一方不履行合同义务或者履行合同义务不符合约定的，应当承担继续履行、采取补救措施或者赔偿损失等违约责任。"
+OTHER = "第五百八十五条 当事人可以约定一方违约时应当根据违约情况向对方支付一定数额的违约金，也可以约定因违约产生的损失赔偿额的计算方法。"
+
+
+def law(content, source="民法典.pdf"):
+    return {"content": content, "metadata": {"source_file": source}}
+
+
+def format_law(i, item):
+    return f"{i}. {item['content']}\n"
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("合同") == 2  # 2 × 0.6 向上取整
+    assert estimate_tokens("abcdefghij") == 3
+    assert estimate_tokens("违约abc") == 3  # 1.2 + 0.9
+
+
+def test_for_model():
+    values = {"deepseek-chat": 64000, "default": 8000}
+    assert for_model(values, "deepseek-chat", 100) == 64000
+    assert for_model(values, "other", 100) == 8000
+    assert for_model({}, "other", 100) == 100
+
+
+def test_dedupe_drops_repeated_and_trims_overlapping_chunks():
+    laws = [law(ARTICLE), law(ARTICLE + " "), law(ARTICLE[40:] + OTHER), law(OTHER, source="合同法.pdf")]
+    kept, duplicates, overlapped = dedupe_laws(laws)
+    assert [k["content"] for k in kept[:2]] == [ARTICLE, OTHER]  # 相邻文档块只保留不重叠的部分
+    assert duplicates == 2 and overlapped == 0  # 完全重复的一段，另一文件中内容相同的一段
+    assert kept[0] is not laws[0] and laws[2]["content"].startswith(ARTICLE[40:])
+
+
+def test_dedupe_keeps_short_unique_laws_and_counts_trimmed_remnants_separately():
+    laws = [law(ARTICLE), law("违约金过高的可以请求调整。"), law("第九条"), law("甲"), law(ARTICLE[-25:] + "违约金的数额可以另行约定。")]
+    kept, duplicates, overlapped = dedupe_laws(laws)
+    assert [k["content"] for k in kept] == [ARTICLE, "违约金过高的可以请求调整。", "第九条", "甲"]
+    assert duplicates == 0
+    assert overlapped == 1  # 裁掉重叠部分后只剩 13 个字
+    assert dedupe_laws([law("甲"), law("甲 ")])[1] == 1
+
+
+def test_fit_laws_truncates_last_law_and_counts_dropped():
+    laws = [law(ARTICLE), law(OTHER), law(ARTICLE[::-1])]
+    first = estimate_tokens(format_law(1, laws[0]))
+    fitted, dropped = fit_laws(laws, first + 30, format_law, min_tokens=20)
+    assert len(fitted) == 2 and dropped == 1
+    assert fitted[1]["content"].endswith("……")
+    assert estimate_tokens(format_law(2, fitted[1])) <= 30 + 2
+
+    fitted, dropped = fit_laws(laws, first + 10, format_law, min_tokens=20)
+    assert len(fitted) == 1 and dropped == 2  # 剩余预算不足 min_tokens 时不截断
+    assert fit_laws(laws, 0, format_law) == ([], 3)
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+import app.models  # noqa: F401
+from app.models import AIReviewCacheEntry
+from app.services import review_cache
+from app.services.review_cache import ReviewCache, normalize_clauses, review_cache_key
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(review_cache, "SessionLocal", factory)
+    return factory
+
+
+def hit_count(factory, key):
+    db = factory()
+    try:
+        return db.get(AIReviewCacheEntry, key).hit_count
+    finally:
+        db.close()
+
+
+def test_key_ignores_whitespace_differences():
+    assert normalize_clauses("第一条  甲方\r\n\r\n第二条\t乙方 ") == "第一条 甲方\n第二条 乙方"
+    assert review_cache_key("第一条 甲方\n\n", "m", "1", "kb") == review_cache_key("第一条   甲方", "m", "1", "kb")
+    assert review_cache_key("第一条", "m", "1", "kb") != review_cache_key("第一条", "m", "2", "kb")
+
+
+def test_hits_are_buffered_and_flushed_in_batch(session_factory):
+    cache = ReviewCache(ttl_hours=1, max_entries=100, hit_flush_seconds=3600)
+    cache.put("k", {"issues": [], "compliance_score": 90.0}, elapsed_ms=1000, total_tokens=500)
+
+    assert cache.get("k")["compliance_score"] == 90.0
+    assert cache.get("k") is not None
+    assert hit_count(session_factory, "k") == 0  # 命中时不写数据库
+
+    cache.flush()
+    assert hit_count(session_factory, "k") == 2
+    cache.flush()
+    assert hit_count(session_factory, "k") == 2
+
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["process"]["hits"] == 2 and stats["process"]["misses"] == 1
+    assert stats["total"]["hits"] == 2 and stats["total"]["saved_tokens"] == 1000
+
+
+def test_flushes_when_interval_elapsed(session_factory):
+    cache = ReviewCache(ttl_hours=1, max_entries=100, hit_flush_seconds=0)
+    cache.put("k", {"issues": []}, elapsed_ms=10, total_tokens=10)
+    cache.get("k")
+    assert hit_count(session_factory, "k") == 1
+
+
+def test_error_results_are_not_cached(session_factory):
+    cache = ReviewCache(ttl_hours=1, max_entries=100)
+    cache.put("k", {"issues": [], "error": "boom"}, elapsed_ms=10, total_tokens=10)
+    assert cache.get("k") is None
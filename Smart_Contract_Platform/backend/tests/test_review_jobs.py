@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+import app.models  # noqa: F401
+from app.models import AIReviewBatch, AIReviewJob
+from app.crud.crud_ai_review import review_jobs_fail_stale
+from app.services.review_jobs import _finished_job_fields, group_identical_clauses
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()  # SQLite 默认不检查外键，任务不需要真实的合同
+    yield session
+    session.close()
+
+
+def add_job(db, status, age_seconds, heartbeat_age=None, batch_id=None):
+    now = datetime.utcnow()
+    job = AIReviewJob(
+        contract_id=1, batch_id=batch_id, status=status, created_by="tester",
+        created_at=now - timedelta(seconds=age_seconds),
+        heartbeat_at=None if heartbeat_age is None else now - timedelta(seconds=heartbeat_age),
+    )
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_fails_only_unfinished_jobs_without_recent_heartbeat(db):
+    stale = add_job(db, "RUNNING", 600)
+    queued = add_job(db, "PENDING", 600)
+    alive = add_job(db, "RUNNING", 600, heartbeat_age=10)
+    fresh = add_job(db, "PENDING", 10)
+    done = add_job(db, "SUCCEEDED", 600)
+
+    failed = review_jobs_fail_stale(db, datetime.utcnow() - timedelta(seconds=180))
+
+    assert failed == 2
+    status = {job.id: job.status for job in db.query(AIReviewJob)}
+    assert status == {stale: "FAILED", queued: "FAILED", alive: "RUNNING", fresh: "PENDING", done: "SUCCEEDED"}
+    assert db.get(AIReviewJob, stale).error
+
+
+def test_single_job_filter(db):
+    first = add_job(db, "RUNNING", 600)
+    second = add_job(db, "RUNNING", 600)
+
+    assert review_jobs_fail_stale(db, datetime.utcnow() - timedelta(seconds=180), job_id=first) == 1
+    assert db.get(AIReviewJob, second).status == "RUNNING"
+
+
+def test_finishes_batch_when_no_jobs_left(db):
+    batch = AIReviewBatch(status="RUNNING", total=3, unique_clauses=3, succeeded=1, created_by="tester")
+    db.add(batch)
+    db.commit()
+    add_job(db, "SUCCEEDED", 600, batch_id=batch.id)
+    add_job(db, "RUNNING", 600, batch_id=batch.id)
+    add_job(db, "PENDING", 600, batch_id=batch.id)
+
+    assert review_jobs_fail_stale(db, datetime.utcnow() - timedelta(seconds=180), batch_id=batch.id) == 2
+
+    db.refresh(batch)
+    assert (batch.status, batch.succeeded, batch.failed) == ("FINISHED", 1, 2)
+    assert batch.finished_at is not None
+
+
+def test_group_identical_clauses_ignores_whitespace_and_keeps_order():
+    groups = group_identical_clauses([
+        (1, "第一条 甲方付款"),
+        (2, "第一条 乙方施工"),
+        (3, "第一条   甲方付款\r\n\r\n"),
+        (4, "第一条 乙方施工"),
+        (5, "第二条 其他"),
+    ])
+    assert [ids for _, ids in groups] == [[1, 3], [2, 4], [5]]
+    assert groups[0][0] == "第一条 甲方付款"  # 保留首次出现的原文
+
+
+def test_finished_job_fields():
+    ok = _finished_job_fields({"issues": [], "compliance_score": 90.0})
+    assert ok["status"] == "SUCCEEDED" and ok["error"] is None and ok["progress"] == 100
+    failed = _finished_job_fields({"issues": [], "error": "x" * 2000})
+    assert failed["status"] == "FAILED" and len(failed["error"]) == 1000
+
+
+def test_stream_review_takes_a_runner_slot(monkeypatch):
+    import asyncio
+    import app.services.ai_review as ai_review
+    from app.services.review_jobs import ReviewJobRunner
+
+    running = peak = 0
+
+    class FakeService:
+        async def astream_review(self, clauses, use_cache=True, chunked=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            try:
+                yield "delta", {"text": clauses}
+                await asyncio.sleep(0.05)
+                yield "result", {"issues": [], "compliance_score": 90.0}
+            finally:
+                running -= 1
+
+    monkeypatch.setattr(ai_review, "get_ai_review_service", lambda: FakeService())
+    runner = ReviewJobRunner(max_workers=1)
+
+    async def collect(clauses):
+        return [event async for event in runner.stream_review(clauses)]
+
+    async def main():
+        return await asyncio.gather(collect("A"), collect("B"))
+
+    try:
+        first, second = asyncio.run(main())
+    finally:
+        runner.shutdown()
+    assert peak == 1
+    assert first[-1] == ("result", {"issues": [], "compliance_score": 90.0})
+    assert ("status", {"stage": "排队等待审查"}) in first + second
+    assert [e for e in first + second if e[0] == "delta"] == [("delta", {"text": "A"}), ("delta", {"text": "B"})]
+
+
+def test_stream_review_cancels_when_caller_stops(monkeypatch):
+    import asyncio
+    import app.services.ai_review as ai_review
+    from app.services.review_jobs import ReviewJobRunner
+
+    closed = []
+
+    class FakeService:
+        async def astream_review(self, clauses, use_cache=True, chunked=None):
+            try:
+                yield "delta", {"text": "..."}
+                await asyncio.sleep(5)
+                yield "result", {}
+            finally:
+                closed.append(True)
+
+    monkeypatch.setattr(ai_review, "get_ai_review_service", lambda: FakeService())
+    runner = ReviewJobRunner(max_workers=1)
+
+    async def main():
+        stream = runner.stream_review("A")
+        assert (await stream.__anext__())[0] == "delta"
+        await stream.aclose()  # 客户端断开
+        for _ in range(50):
+            if closed:
+                return
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(main())
+    finally:
+        runner.shutdown()
+    assert closed == [True]
+
+
+def test_shutdown_cancels_reviews_and_runs_closers():
+    import asyncio
+    import threading
+    from app.services.review_jobs import ReviewJobRunner
+
+    runner = ReviewJobRunner(max_workers=1)
+    events = []
+    started = threading.Event()
+
+    async def review():
+        started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+
+    async def close():
+        events.append("closed")
+
+    runner.on_shutdown(close)
+    future = runner.run_coroutine(review())
+    assert started.wait(5)
+    loop = runner._loop
+    runner.shutdown()
+    assert events == ["cancelled", "closed"]  # 先取消进行中的审查，再关闭连接池
+    assert future.cancelled() and loop.is_closed()
@@ -0,0 +1,46 @@
+import json
+
+from app.services.stream_parser import IssueStreamParser
+
+RESULT = {
+    "issues": [
+        {"type": "风险", "severity": "高", "location": "第3条", "description": "违约金 {过高} 且含\"引号\"", "suggestion": "调整"},
+        {"type": "不完善", "severity": "低", "location": "第5条", "description": "缺少 [附件] 说明", "detail": {"refs": [1, 2]}},
+    ],
+    "suggestions": ["补充 {争议解决} 条款"],
+    "compliance_score": 72.5,
+}
+TEXT = "```json\n" + json.dumps(RESULT, ensure_ascii=False, indent=2) + "\n```"
+
+
+def feed_in_chunks(size):
+    parser = IssueStreamParser()
+    issues = []
+    for i in range(0, len(TEXT), size):
+        issues.extend(parser.feed(TEXT[i:i + size]))
+    return parser, issues
+
+
+def test_emits_each_issue_once_regardless_of_chunking():
+    for size in (1, 2, 7, 64, len(TEXT)):
+        parser, issues = feed_in_chunks(size)
+        assert issues == RESULT["issues"], size
+        assert parser.buffer == TEXT
+
+
+def test_issue_emitted_as_soon_as_it_closes():
+    parser = IssueStreamParser()
+    first = json.dumps(RESULT["issues"][0], ensure_ascii=False)
+    assert parser.feed('{"issues": [' + first[:-1]) == []
+    assert parser.feed("}") == [RESULT["issues"][0]]
+    assert parser.feed(", {") == []
+
+
+def test_ignores_objects_after_issues_array():
+    parser = IssueStreamParser()
+    assert parser.feed('{"issues": [], "extra": {"a": 1}}') == []
+
+
+def test_skips_malformed_issue_and_non_objects():
+    parser = IssueStreamParser()
+    assert parser.feed('{"issues": ["text", {"a": }, {"b": 2}]}') == [{"b": 2}]
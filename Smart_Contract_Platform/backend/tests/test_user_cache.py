@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+import app.models  # noqa: F401
+from app.crud import crud_user
+from app.crud.crud_user import user_create, user_get_active_cached, user_get_by_username
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    crud_user.user_cache_invalidate()
+    yield session
+    session.close()
+    crud_user.user_cache_invalidate()
+
+
+def test_cache_is_invalidated_on_commit_not_on_flush(db):
+    user_create(db, "alice", "hash", "LEGAL")
+    assert user_get_active_cached(db, "alice").role == "LEGAL"
+
+    user = user_get_by_username(db, "alice")
+    user.role = "FINANCE"
+    db.flush()
+    assert crud_user._active_user_cache.get("alice").role == "LEGAL"  # 提交前仍是旧数据
+    db.commit()
+    assert crud_user._active_user_cache.get("alice") is None
+    assert user_get_active_cached(db, "alice").role == "FINANCE"
+
+
+def test_rolled_back_change_keeps_cache(db):
+    user_create(db, "bob", "hash", "LEGAL")
+    cached = user_get_active_cached(db, "bob")
+
+    user_get_by_username(db, "bob").role = "FINANCE"
+    db.flush()
+    db.rollback()
+    assert crud_user._active_user_cache.get("bob") is cached
+    db.commit()  # 回滚时记录的变更已丢弃，之后的提交不会误清缓存
+    assert crud_user._active_user_cache.get("bob") is cached
+
+
+def test_renamed_user_invalidates_old_name(db):
+    user_create(db, "carol", "hash", "LEGAL")
+    assert user_get_active_cached(db, "carol") is not None
+
+    user_get_by_username(db, "carol").username = "carol2"
+    db.commit()
+    assert crud_user._active_user_cache.get("carol") is None
+    assert user_get_active_cached(db, "carol") is None
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.services.vector_index import NumpyVectorStore  # noqa: E402
+
+
+def add_rows(store, start, count, dim=8):
+    ids = [f"doc_{i}" for i in range(start, start + count)]
+    vectors = np.eye(dim)[[i % dim for i in range(start, start + count)]] + 0.01
+    store.upsert(ids, [f"文本{i}" for i in range(start, start + count)], [{"n": i} for i in range(start, start + count)], vectors.tolist())
+    return ids
+
+
+def test_query_returns_nearest_rows(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    add_rows(store, 0, 16)
+    result = store.query([np.eye(8)[3].tolist()], n_results=2)
+    assert set(result["ids"][0]) == {"doc_3", "doc_11"}
+    assert result["documents"][0][0].startswith("文本")
+    empty = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+    assert store.query([np.eye(8)[3].tolist()], n_results=0) == empty
+    assert store.query([np.eye(8)[3].tolist()], n_results=-1) == empty
+
+
+def test_snapshot_opened_before_compaction_stays_readable(tmp_path):
+    writer = NumpyVectorStore(str(tmp_path))
+    reader = NumpyVectorStore(str(tmp_path))
+    ids = add_rows(writer, 0, 1024)
+    snap = reader._snap()
+    first = snap.directory
+
+    writer.delete(ids=ids[:600])  # 无效行超过一半，自动压缩到 gen-1
+    assert writer._current_dir() != first
+    assert first.exists()  # 上一代目录保留到下一次压缩
+    assert snap.read_records([700])[0]["id"] == "doc_700"
+
+    more = add_rows(writer, 2000, 1024)
+    writer.delete(ids=more)  # 再次压缩到 gen-2，删除 gen-0
+    assert not first.exists()
+    assert snap.read_records([700])[0]["id"] == "doc_700"  # 持有句柄，仍能读取
+
+    assert reader.count() == 424
+    assert reader.get(ids=["doc_700"])["documents"] == ["文本700"]